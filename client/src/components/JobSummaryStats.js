@@ -1,7 +1,15 @@
 import React from 'react';
 import './JobSummaryStats.css'; // Создадим этот файл для стилей
 
-function JobSummaryStats({ stats, status }) {
+// Секунды -> "1d 02:03:04" / "02:03:04"
+const formatDuration = (seconds) => {
+    const total = Math.round(seconds);
+    const days = Math.floor(total / 86400);
+    const hms = new Date((total % 86400) * 1000).toISOString().substring(11, 19);
+    return days > 0 ? `${days}d ${hms}` : hms;
+};
+
+function JobSummaryStats({ stats, status, telemetry, truncation }) {
 
     // Проверка на наличие данных
     if (!stats) {
@@ -57,6 +65,39 @@ function JobSummaryStats({ stats, status }) {
                     {formatNumber(stats.error)}
                 </span>
             </div>
+            {/* Скорость и прогноз окончания от мастера (telemetry); ETA - пока задача идет */}
+            {telemetry && telemetry.models_per_second != null && (
+                <div className="stat-item">
+                    <span className="stat-label">Rate:</span>
+                    <span className="stat-value">{formatNumber(Math.round(telemetry.models_per_second))} models/s</span>
+                </div>
+            )}
+            {telemetry && telemetry.elapsed_seconds != null && (
+                <div className="stat-item">
+                    <span className="stat-label">Elapsed:</span>
+                    <span className="stat-value">{formatDuration(telemetry.elapsed_seconds)}</span>
+                </div>
+            )}
+            {telemetry && status === 'running' && (
+                <div className="stat-item">
+                    <span className="stat-label">ETA:</span>
+                    <span className="stat-value">
+                        {telemetry.eta_seconds != null
+                            ? `${formatDuration(telemetry.eta_seconds)} (${new Date(telemetry.finish_at).toLocaleString()})`
+                            : 'estimating...'}
+                    </span>
+                </div>
+            )}
+            {/* Перебор остановлен лимитом (timeBudgetSeconds / maxModels / stopAfterValid): какая доля посчитана */}
+            {truncation && (
+                <div className="stat-item">
+                    <span className="stat-label">Coverage:</span>
+                    <span className="stat-value">
+                        {(truncation.coverage * 100).toFixed(2)}%
+                        {truncation.limits && truncation.limits.stop_reason ? ` (${truncation.limits.stop_reason.replace(/_/g, ' ')})` : ''}
+                    </span>
+                </div>
+            )}
         </div>
     );
 }
@@ -37,13 +37,34 @@ function ModelDashboard({ progressData, totalRuns }) {
     const [decompositionData, setDecompositionData] = useState(null);
     const [isDecompLoading, setIsDecompLoading] = useState(false);
     const [decompError, setDecompError] = useState(null);
+    const [selectedTarget, setSelectedTarget] = useState(null);
+
+    // --- Задача с несколькими Y: результаты, сводка и телеметрия - по имени Y, показываем одну цель ---
+    const targetNames = progressData?.targets || null;
+    const activeTarget = targetNames ? (targetNames.includes(selectedTarget) ? selectedTarget : targetNames[0]) : null;
+    const targetResults = useMemo(() => {
+        if (!progressData || !progressData.results) return null;
+        return activeTarget ? (progressData.results[activeTarget] || {}) : progressData.results;
+    }, [progressData, activeTarget]);
+    const targetSummary = activeTarget ? progressData?.summary?.[activeTarget] : progressData?.summary;
+    const targetTelemetry = activeTarget ? progressData?.telemetry?.[activeTarget] : progressData?.telemetry;
 
     // --- Расчет сводной статистики ---
     const summaryStats = useMemo(() => {
-        if (!progressData || !progressData.results) {
+        if (!targetResults) {
             return { processed: 0, total: totalRuns || 0, valid: 0, invalidStats: 0, invalidConstraints: 0, skipped: 0, error: 0 };
         }
-        const results = progressData.results;
+        // config.summary: счетчики уже посчитаны мастером (SUMMARY) - без прохода по всем результатам
+        const summary = targetSummary;
+        if (summary && summary.counts) {
+            return {
+                processed: progressData.progress || 0,
+                total: totalRuns || progressData.totalModels || 0,
+                valid: summary.counts.valid, invalidStats: summary.counts.invalid, invalidConstraints: 0,
+                skipped: summary.counts.skipped, error: summary.counts.error,
+            };
+        }
+        const results = targetResults;
         const modelIds = Object.keys(results);
         let validCount = 0, invalidStatsCount = 0, skippedCount = 0, errorCount = 0;
         modelIds.forEach(id => {
@@ -65,14 +86,14 @@ function ModelDashboard({ progressData, totalRuns }) {
             valid: validCount, invalidStats: invalidStatsCount, invalidConstraints: 0,
             skipped: skippedCount, error: errorCount,
         };
-    }, [progressData, totalRuns]);
+    }, [progressData, targetResults, targetSummary, totalRuns]);
 
     // --- Подготовка и фильтрация данных для графика и таблицы ---
     const filteredModelData = useMemo(() => {
-        if (!progressData || !progressData.results) {
+        if (!targetResults) {
              return {};
         }
-        const results = progressData.results;
+        const results = targetResults;
         const filtered = {};
         Object.entries(results).forEach(([id, result]) => {
             if (result?.status !== 'completed') return;
@@ -80,7 +101,7 @@ function ModelDashboard({ progressData, totalRuns }) {
             filtered[id] = result;
         });
         return filtered;
-    }, [progressData, filters]);
+    }, [targetResults, filters]);
 
     // --- Обработчики ---
     const handleXAxisChange = (event) => setScatterXAxis(event.target.value);
@@ -89,11 +110,20 @@ function ModelDashboard({ progressData, totalRuns }) {
         const { name, type, checked, value } = event.target;
         setFilters(prevFilters => ({ ...prevFilters, [name]: type === 'checkbox' ? checked : value }));
     };
+    // Смена Y: выбранная модель и ее декомпозиция относятся к прежней цели - сбрасываем
+    const handleTargetChange = (event) => {
+        setSelectedTarget(event.target.value);
+        setSelectedModelDetails(null);
+        setIsDetailsVisible(false);
+        setDecompositionData(null);
+        setDecompError(null);
+        setIsDecompLoading(false);
+    };
 
     // Обработчик клика на точку графика или строку таблицы
     const handleModelSelect = useCallback((modelId) => {
         console.log(`[handleModelSelect] Clicked model: ${modelId}`); // <<< LOG
-        const result = progressData?.results?.[modelId];
+        const result = targetResults?.[modelId];
         if (modelId && result && result.status === 'completed') {
             if (selectedModelDetails?.id === modelId) {
                 console.log(`[handleModelSelect] Toggling visibility for ${modelId}`); // <<< LOG
@@ -105,7 +135,7 @@ function ModelDashboard({ progressData, totalRuns }) {
                 }
             } else {
                 console.log(`[handleModelSelect] Selecting new model: ${modelId}`); // <<< LOG
-                setSelectedModelDetails({ id: modelId, ...result.data });
+                setSelectedModelDetails({ id: modelId, ...(activeTarget ? { target: activeTarget } : {}), ...result.data });
                 setIsDetailsVisible(true);
                 // Сбрасываем предыдущие данные/ошибки декомпозиции
                 setDecompositionData(null);
@@ -120,7 +150,7 @@ function ModelDashboard({ progressData, totalRuns }) {
             setDecompError(null);
             setIsDecompLoading(false); // <<< Убедимся, что сброшен флаг загрузки
         }
-    }, [progressData, selectedModelDetails, isDetailsVisible]); // Добавили isDetailsVisible в зависимости
+    }, [targetResults, activeTarget, selectedModelDetails, isDetailsVisible]); // Добавили isDetailsVisible в зависимости
 
     // Обработчик кнопки для сворачивания/разворачивания деталей
     const toggleDetailsVisibility = () => {
@@ -198,7 +228,9 @@ function ModelDashboard({ progressData, totalRuns }) {
 
                 // Выполнение запроса
                 try {
-                    const response = await axios.post(apiUrl, { modelSpecification });
+                    // Задача с несколькими Y: декомпозиция считается по Y выбранной цели
+                    const target = selectedModelDetails.target;
+                    const response = await axios.post(apiUrl, { modelSpecification, ...(target ? { target } : {}) });
                     console.log("[fetchDecomposition] Received response status:", response.status); // <<< LOG
                     // console.log("[fetchDecomposition] Received response data:", response.data); // <<< LOG (можно раскомментировать для детального просмотра)
 
@@ -246,13 +278,23 @@ function ModelDashboard({ progressData, totalRuns }) {
 
             {/* 1. Сводная Статистика */}
             <div className="dashboard-section summary-stats-section">
-                {summaryStats ? <JobSummaryStats stats={summaryStats} status={progressData.status} /> : <div>Calculating stats...</div>}
+                {summaryStats ? <JobSummaryStats stats={summaryStats} status={progressData.status}
+                                                  telemetry={targetTelemetry}
+                                                  truncation={progressData.truncated ? { coverage: progressData.coverage, limits: progressData.limits } : null} /> : <div>Calculating stats...</div>}
             </div>
 
             {/* 2. Фильтры */}
             <div className="dashboard-section filter-section">
                  <h4>Filters & Options</h4>
                  <div className="filter-controls">
+                     {targetNames && (
+                         <label>
+                             Dependent Variable:{' '}
+                             <select name="target" value={activeTarget} onChange={handleTargetChange}>
+                                 {targetNames.map(name => (<option key={name} value={name}>{name}</option>))}
+                             </select>
+                         </label>
+                     )}
                      <label>
                          <input type="checkbox" name="showOnlyValid" checked={filters.showOnlyValid} onChange={handleFilterChange} />
                          Show Only Valid Models
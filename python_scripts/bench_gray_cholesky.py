@@ -0,0 +1,98 @@
+# python_scripts/bench_gray_cholesky.py
+"""
+Бенчмарк: решение каждой спецификации с нуля (разложение Холецкого O(p^3)) против порядка
+перебора по коду Грея с инкрементальным обновлением фактора (O(p^2) на модель).
+
+Данные синтетические, сетка k/N задается аргументами. Время меряется только для движка
+(sample + fit), без тестов и сериализации результатов.
+
+Пример: python bench_gray_cholesky.py --k 4 6 8 --N 1 2 3 --rows 200
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from lag_matrix import LagMatrix
+from ols_engine import SufficientStatsOLS
+from spec_enumerator import iter_model_specs
+
+
+def make_data(rows, k, seed):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2000-01-31", periods=rows, freq="ME")
+    X = rng.normal(size=(rows, k)).cumsum(axis=0) * 0.3 + rng.normal(size=(rows, k))
+    y = 1.0 + X @ rng.normal(size=k) + rng.normal(size=rows)
+    all_x_df = pd.DataFrame(X, index=index, columns=[f"X{j}" for j in range(k)])
+    return pd.Series(y, index=index), all_x_df
+
+
+def fit_all(engine, specs):
+    fits = {}
+    start = time.perf_counter()
+    for spec in specs:
+        sample = engine.sample(spec["regressors"])
+        fit = engine.fit(sample, spec["include_constant"])
+        fits[spec["model_id"]] = None if fit is None else fit.params
+    return time.perf_counter() - start, fits
+
+
+def max_param_diff(a, b):
+    diff = 0.0
+    for model_id, params in a.items():
+        other = b[model_id]
+        if params is None or other is None:
+            continue
+        scale = np.maximum(np.abs(params), 1.0)
+        diff = max(diff, float(np.max(np.abs(params - other) / scale)))
+    return diff
+
+
+def run_case(rows, k, N, constant_status, seed, repeat):
+    y_series, all_x_df = make_data(rows, k, seed)
+    lag_matrix = LagMatrix(all_x_df, N)
+    names = list(all_x_df.columns)
+    canonical = list(iter_model_specs(names, N, constant_status))
+    gray = list(iter_model_specs(names, N, constant_status, order="gray"))
+
+    # Прогоны чередуются, берется лучшее время (свежий движок на каждый прогон - кэш Z'Z тоже заново)
+    plain_time = gray_time = float("inf")
+    for _ in range(repeat):
+        elapsed, plain_fits = fit_all(SufficientStatsOLS(y_series, lag_matrix), canonical)
+        plain_time = min(plain_time, elapsed)
+        engine = SufficientStatsOLS(y_series, lag_matrix, incremental=True)
+        elapsed, gray_fits = fit_all(engine, gray)
+        gray_time = min(gray_time, elapsed)
+    return {
+        "k": k, "N": N, "models": len(canonical),
+        "plain_s": plain_time, "gray_s": gray_time,
+        "speedup": plain_time / gray_time if gray_time > 0 else float("nan"),
+        "max_param_diff": max_param_diff(plain_fits, gray_fits),
+        **engine.factor_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, nargs="+", default=[4, 6, 8], help="число регрессоров")
+    parser.add_argument("--N", type=int, nargs="+", default=[1, 2, 3], help="максимальный лаг")
+    parser.add_argument("--rows", type=int, default=200, help="длина рядов")
+    parser.add_argument("--constant", default="include", choices=["include", "exclude", "test"])
+    parser.add_argument("--max-models", type=int, default=200000, help="пропускать точки сетки с большим числом моделей")
+    parser.add_argument("--repeat", type=int, default=3, help="прогонов на точку сетки (берется лучший)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    columns = ["k", "N", "models", "plain_s", "gray_s", "speedup", "rebuilds", "appends", "drops", "max_param_diff"]
+    print(" ".join(f"{c:>14}" for c in columns))
+    for k in args.k:
+        for N in args.N:
+            if (N + 2) ** k > args.max_models:
+                continue
+            row = run_case(args.rows, k, N, args.constant, args.seed, args.repeat)
+            print(" ".join(f"{row[c]:>14.4g}" if isinstance(row[c], float) else f"{row[c]:>14}" for c in columns), flush=True)
+
+
+if __name__ == "__main__":
+    main()
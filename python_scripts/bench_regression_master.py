@@ -0,0 +1,357 @@
+# python_scripts/bench_regression_master.py
+"""
+Бенчмарк step3_run_regression_master.py на синтетических данных: пропускная способность перебора
+и регрессии производительности между версиями.
+
+Сетка: T (длина рядов) x k (регрессоров) x N (maxLagDepth) x constantStatus x набор тестов (--tests).
+Каждая точка - отдельный процесс мастера, как из server.js (payload в stdin), с config.profile:
+  models_per_s        - модели / wall time процесса (вместе со стартом интерпретатора и импортами);
+  search_models_per_s - модели / время от разбора payload до конца перебора (итоговая запись PROFILE);
+  peak_rss_mb         - пиковый RSS мастера (и воркеров пула при numWorkers > 1);
+  bytes_per_model     - байт строк результатов в stdout (PROGRESS_UPDATE / PROGRESS_FRAME) на модель.
+--config добавляет ключи config во все запуски (specOrder, numWorkers, resultFormat, ...).
+
+--check сверяет быстрый путь (движок достаточных статистик и ключи --config) с эталонным run_single_ols
+через statsmodels (olsEngine = 'statsmodels') на одной и той же случайной выборке из --check-models
+спецификаций: статусы, коэффициенты, p-values, R2, AIC/BIC, метрики и тесты - в пределах --rtol/--atol.
+--check-multi-target сверяет задачу с несколькими Y (payload.dependentVariables) с отдельными задачами по
+каждой Y на той же выборке спецификаций; у Y разные даты начала и конца, поэтому лаги и выборки каждой
+цели должны считаться по ее собственным датам.
+--check-decomposition запускает перебор с config.screening и config.commonSample и пересчитывает часть валидных
+моделей через step4_calculate_decomposition.py с тем же payload, что собирает server.js: число наблюдений
+и RMSE декомпозиции должны совпасть с моделью из перебора (общая выборка - по отобранным колонкам). Заодно
+ID моделей сверяются с полным пространством (все признаки, лаги до N), а регрессоры - с отобранными колонками.
+При расхождениях код выхода 1.
+
+Результат - JSON (--out): версия (git), платформа, параметры и строки сетки - для сравнения версий.
+
+Пример: python bench_regression_master.py --T 120 400 --k 4 6 --N 1 2 --constant include test
+        --tests none all --check --out bench.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from result_frames import FRAME_PREFIX, MODEL_ID_PATTERN, decode_frame
+from screening import SCREENING_PREFIX
+from spec_enumerator import SpecSpace
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+MASTER_SCRIPT = os.path.join(SCRIPTS_DIR, "step3_run_regression_master.py")
+DECOMPOSITION_SCRIPT = os.path.join(SCRIPTS_DIR, "step4_calculate_decomposition.py")
+DECOMPOSITION_CHECK_MODELS = 10 # Моделей в --check-decomposition (отдельный процесс на модель)
+# Наборы config.tests (--tests)
+TEST_PRESETS = {
+    "none": {},
+    "pvalue": {"pValue": True},
+    "vif": {"vif": True},
+    "bp": {"heteroskedasticity": True},
+    "all": {"pValue": True, "vif": True, "heteroskedasticity": True},
+}
+ALL_METRICS = {"mae": True, "mape": True, "rmse": True, "rSquared": True}
+RESULT_PREFIXES = ("PROGRESS_UPDATE:", FRAME_PREFIX)
+
+
+# --- Синтетические данные ---
+def make_payload(T, k, N, constant_status, tests, seed, extra_config=None):
+    """
+    Payload мастера: Y и k регрессоров по T месяцам. X - случайные блуждания с шумом, у части рядов
+    пропуски в начале (разные даты начала, как в реальных данных); Y зависит от лагов нескольких X.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2000-01-31", periods=T, freq="ME").strftime("%Y-%m-%d").tolist()
+    X = rng.normal(size=(T, k)).cumsum(axis=0) * 0.3 + rng.normal(size=(T, k))
+    y = 1.0 + rng.normal(size=T)
+    for j in range(min(k, 3)):
+        lag = j % (N + 1)
+        y[lag:] += rng.normal() * X[:T - lag, j]
+    regressors = {}
+    for j in range(k):
+        start = int(rng.integers(0, T // 10 + 1)) if j % 2 else 0
+        regressors[f"X{j}"] = [[date, float(value)] for date, value in zip(dates[start:], X[start:, j])]
+    config = {"maxLagDepth": N, "constantStatus": constant_status, "tests": dict(tests), "metrics": dict(ALL_METRICS),
+              **(extra_config or {})}
+    return {"dependentVariable": {"name": "Y", "data": [[date, float(value)] for date, value in zip(dates, y)]},
+            "regressors": regressors, "config": config}
+
+
+# --- Запуск мастера ---
+def run_master(payload, records=None):
+    """
+    Запуск мастера на payload: (результаты {model_id: результат}, итог, итоговый PROFILE, байт результатов, wall time).
+    При нескольких Y результаты - {имя Y: {model_id: результат}}. В records (словарь) - запись SCREENING.
+    """
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, MASTER_SCRIPT], input=json.dumps(payload), cwd=SCRIPTS_DIR,
+                             capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    results, final, profile, result_bytes = {}, None, None, 0
+    for line in process.stdout.splitlines():
+        if line.startswith(RESULT_PREFIXES):
+            result_bytes += len(line) + 1
+            update = decode_frame(line[len(FRAME_PREFIX):]) if line.startswith(FRAME_PREFIX) \
+                else json.loads(line[len("PROGRESS_UPDATE:"):])
+            target_results = results.setdefault(update["target"], {}) if "target" in update else results
+            target_results.update(update.get("processed_batch", {}))
+            for model_id in update.get("evicted", ()):
+                target_results.pop(model_id, None)
+        elif line.startswith(SCREENING_PREFIX) and records is not None:
+            records["screening"] = json.loads(line[len(SCREENING_PREFIX):])
+        elif line.startswith("PROFILE:"):
+            profile = json.loads(line[len("PROFILE:"):])
+        elif line.startswith("FINAL_RESULT:"):
+            final = json.loads(line[len("FINAL_RESULT:"):])
+    if final is None or final.get("status") != "finished":
+        error = (final or {}).get("error") or process.stderr.strip().splitlines()[-1:]
+        raise RuntimeError(f"Master run failed: {error}")
+    return results, final, profile, result_bytes, wall
+
+
+def run_case(T, k, N, constant_status, tests_name, seed, extra_config):
+    payload = make_payload(T, k, N, constant_status, TEST_PRESETS[tests_name], seed,
+                           {**extra_config, "profile": True})
+    results, final, profile, result_bytes, wall = run_master(payload)
+    models = final["total_models_calculated"]
+    memory = profile["memory"]
+    return {
+        "T": T, "k": k, "N": N, "constant": constant_status, "tests": tests_name, "models": models,
+        "wall_s": round(wall, 3),
+        "models_per_s": round(models / wall, 1),
+        "search_models_per_s": profile["models_per_second"],
+        "peak_rss_mb": memory["peak_rss_mb"],
+        "worker_peak_rss_mb": memory["worker_peak_rss_mb"],
+        "bytes_per_model": round(result_bytes / models, 1) if models else None,
+        "stages_s": {name: stage["seconds"] for name, stage in profile["stages"].items()},
+    }
+
+
+# --- Сверка быстрого пути с эталоном statsmodels ---
+def compare_values(fast, reference, rtol, atol, path, diffs):
+    """Рекурсивное сравнение результатов; diffs - [(поле, быстрый, эталон, масштабированная разница)]."""
+    if isinstance(reference, dict) and isinstance(fast, dict):
+        for key in sorted(set(fast) | set(reference)):
+            if key not in fast or key not in reference:
+                diffs.append((f"{path}.{key}", fast.get(key, "<missing>"), reference.get(key, "<missing>"), math.inf))
+            else:
+                compare_values(fast[key], reference[key], rtol, atol, f"{path}.{key}", diffs)
+    elif isinstance(reference, float) and isinstance(fast, (int, float)) and not isinstance(fast, bool):
+        if not math.isclose(fast, reference, rel_tol=rtol, abs_tol=atol):
+            diffs.append((path, fast, reference, abs(fast - reference) / max(abs(reference), 1.0)))
+    elif fast != reference:
+        diffs.append((path, fast, reference, math.inf))
+
+
+def check_case(T, k, N, constant_status, tests_name, seed, extra_config, check_models, rtol, atol):
+    """Одна и та же выборка спецификаций быстрым путем и через statsmodels; расхождения по моделям."""
+    sample_config = {"searchMode": "sample", "sampleSize": check_models, "sampleSeed": seed}
+    fast_config = {**extra_config, **sample_config}
+    reference_config = {**sample_config, "olsEngine": "statsmodels"}
+    fast, _, _, _, _ = run_master(make_payload(T, k, N, constant_status, TEST_PRESETS[tests_name], seed, fast_config))
+    reference, _, _, _, _ = run_master(make_payload(T, k, N, constant_status, TEST_PRESETS[tests_name], seed, reference_config))
+    mismatches = []
+    max_diff = 0.0
+    for model_id, reference_result in reference.items():
+        diffs = []
+        compare_values(fast.get(model_id), reference_result, rtol, atol, model_id, diffs)
+        finite = [diff for _, _, _, diff in diffs if diff != math.inf]
+        max_diff = max([max_diff, *finite])
+        mismatches.extend(diffs)
+    missing = sorted(set(fast) - set(reference))
+    return {"models": len(reference), "mismatches": len(mismatches) + len(missing), "max_scaled_diff": max_diff,
+            "examples": [{"field": field, "fast": value, "reference": expected} for field, value, expected, _ in mismatches[:5]]
+                        + [{"field": model_id, "fast": "<extra>", "reference": "<missing>"} for model_id in missing[:5]]}
+
+
+def check_multi_target_case(T, k, N, constant_status, tests_name, seed, extra_config, check_models, rtol, atol):
+    """Одна задача по трем Y с разными датами против трех задач по одной Y; расхождения по моделям."""
+    sample_config = {**extra_config, "searchMode": "sample", "sampleSize": check_models, "sampleSeed": seed}
+    payload = make_payload(T, k, N, constant_status, TEST_PRESETS[tests_name], seed, sample_config)
+    y_data = [make_payload(T, k, N, constant_status, {}, seed + j)["dependentVariable"]["data"] for j in range(3)]
+    # Первая Y - на всех датах, вторая начинается позже, третья заканчивается раньше
+    targets = [{"name": "Y", "data": y_data[0]},
+               {"name": "Y_late", "data": y_data[1][T // 8:]},
+               {"name": "Y_short", "data": y_data[2][:T - T // 10]}]
+    multi_payload = {key: value for key, value in payload.items() if key != "dependentVariable"}
+    multi, _, _, _, _ = run_master({**multi_payload, "dependentVariables": targets})
+    mismatches = []
+    max_diff = 0.0
+    models = 0
+    for target in targets:
+        single, _, _, _, _ = run_master({**payload, "dependentVariable": target})
+        models += len(single)
+        diffs = []
+        compare_values(multi.get(target["name"], {}), single, rtol, atol, target["name"], diffs)
+        max_diff = max([max_diff, *(diff for _, _, _, diff in diffs if diff != math.inf)])
+        mismatches.extend(diffs)
+    return {"models": models, "mismatches": len(mismatches), "max_scaled_diff": max_diff,
+            "examples": [{"field": field, "multi": value, "single": expected} for field, value, expected, _ in mismatches[:5]]}
+
+
+def decomposition_payload(payload, model_id, data, screening):
+    """Payload step4 для модели задачи с config.commonSample - как в /api/get_model_decomposition (server.js)."""
+    regressors_with_lags = {}
+    for name in data["coefficients"]:
+        if name != "const":
+            feature, lag = name.rsplit("_L", 1)
+            regressors_with_lags[feature] = int(lag)
+    decomposition = {"model_id": model_id, "dependentVariable": payload["dependentVariable"],
+                     "regressors": payload["regressors"],
+                     "modelSpecification": {"regressors_with_lags": regressors_with_lags,
+                                            "include_constant": "const" in data["coefficients"]}}
+    if screening:
+        decomposition.update(commonSampleLags=screening["lags"], commonSampleMaxLag=screening["max_lag"])
+    else:
+        decomposition["commonSampleMaxLag"] = payload["config"]["maxLagDepth"]
+    return decomposition
+
+
+def check_decomposition_case(T, k, N, constant_status, tests_name, seed, extra_config, check_models, rtol, atol):
+    """Перебор с отбором колонок и общей выборкой, затем декомпозиция нескольких моделей; расхождения по моделям."""
+    config = {"screening": {"maxColumns": 1}, **extra_config, "commonSample": True,
+              "searchMode": "sample", "sampleSize": check_models, "sampleSeed": seed}
+    payload = make_payload(T, k, N, constant_status, TEST_PRESETS[tests_name], seed, config)
+    records = {}
+    results, _, _, _, _ = run_master(payload, records)
+    mismatches = []
+    # ID суженного перебора - номера тех же спецификаций в полном пространстве
+    space = SpecSpace(list(payload["regressors"]), N, constant_status)
+    selected = {(column["feature"], column["lag"]) for column in records["screening"]["selected"]}
+    for model_id, result in results.items():
+        data = result.get("data") or {}
+        regressors = {tuple(name.rsplit("_L", 1)) for name in data.get("coefficients", {}) if name != "const"}
+        spec = space.unrank(int(MODEL_ID_PATTERN.match(model_id).group(1)) - 1)
+        if spec["model_id"] != model_id or (result.get("status") == "completed" and
+                                            regressors != {(f, str(lag)) for f, lag in spec["regressors"].items()}):
+            mismatches.append(("model_id", model_id, spec["model_id"], math.inf))
+        if not {(f, lag) for f, lag in spec["regressors"].items()} <= selected:
+            mismatches.append(("regressors", model_id, sorted(selected), math.inf))
+    completed = [(model_id, result["data"]) for model_id, result in sorted(results.items())
+                 if result.get("status") == "completed"][:DECOMPOSITION_CHECK_MODELS]
+    max_diff = 0.0
+    for model_id, data in completed:
+        process = subprocess.run([sys.executable, DECOMPOSITION_SCRIPT], cwd=SCRIPTS_DIR, capture_output=True, text=True,
+                                 input=json.dumps(decomposition_payload(payload, model_id, data, records.get("screening"))))
+        output = json.loads(process.stdout)
+        if "error" in output:
+            mismatches.append((model_id, output["error"], None, math.inf))
+            continue
+        actual = np.array([value for _, value in output["actual_y"]])
+        predicted = np.array([value for _, value in output["predicted_y"]])
+        rmse = float(np.sqrt(np.mean((actual - predicted) ** 2)))
+        diffs = []
+        compare_values({"n_obs": len(actual), "rmse": rmse}, {"n_obs": data["n_obs"], "rmse": data["metrics"]["rmse"]},
+                       rtol, atol, model_id, diffs)
+        max_diff = max([max_diff, *(diff for _, _, _, diff in diffs if diff != math.inf)])
+        mismatches.extend(diffs)
+    return {"models": len(completed), "mismatches": len(mismatches), "max_scaled_diff": max_diff,
+            "screening": {key: records["screening"][key] for key in ("lags", "models_after")} if "screening" in records else None,
+            "examples": [{"field": field, "decomposition": value, "search": expected}
+                         for field, value, expected, _ in mismatches[:5]]}
+
+
+def git_version():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPTS_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=SCRIPTS_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--T", type=int, nargs="+", default=[120, 400], help="длина рядов (наблюдений)")
+    parser.add_argument("--k", type=int, nargs="+", default=[4, 6], help="число регрессоров")
+    parser.add_argument("--N", type=int, nargs="+", default=[1, 2], help="maxLagDepth")
+    parser.add_argument("--constant", nargs="+", default=["include"], choices=["include", "exclude", "test"])
+    parser.add_argument("--tests", nargs="+", default=["none", "all"], choices=list(TEST_PRESETS))
+    parser.add_argument("--config", default="{}", help="JSON с ключами config для всех запусков")
+    parser.add_argument("--max-models", type=int, default=200000, help="пропускать точки сетки с большим числом моделей")
+    parser.add_argument("--check", action="store_true", help="сверить быстрый путь с statsmodels")
+    parser.add_argument("--check-multi-target", action="store_true",
+                        help="сверить задачу с несколькими Y (разные даты) с задачами по одной Y")
+    parser.add_argument("--check-decomposition", action="store_true",
+                        help="сверить декомпозицию (step4) с перебором при screening + commonSample")
+    parser.add_argument("--check-models", type=int, default=300, help="спецификаций в сверке на точку сетки")
+    parser.add_argument("--rtol", type=float, default=1e-6)
+    parser.add_argument("--atol", type=float, default=1e-8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="путь JSON с результатами")
+    args = parser.parse_args()
+    extra_config = json.loads(args.config)
+
+    columns = ["T", "k", "N", "constant", "tests", "models", "models_per_s", "search_models_per_s", "peak_rss_mb",
+               "bytes_per_model"]
+    if args.check:
+        columns += ["check_mismatches", "check_max_diff"]
+    if args.check_multi_target:
+        columns += ["multi_mismatches"]
+    if args.check_decomposition:
+        columns += ["decomp_mismatches"]
+    print(" ".join(f"{c:>12}" for c in columns))
+    rows = []
+    for T in args.T:
+        for k in args.k:
+            for N in args.N:
+                for constant_status in args.constant:
+                    if SpecSpace(range(k), N, constant_status).count() > args.max_models:
+                        continue
+                    for tests_name in args.tests:
+                        row = run_case(T, k, N, constant_status, tests_name, args.seed, extra_config)
+                        if args.check:
+                            row["check"] = check_case(T, k, N, constant_status, tests_name, args.seed, extra_config,
+                                                      args.check_models, args.rtol, args.atol)
+                            row["check_mismatches"] = row["check"]["mismatches"]
+                            row["check_max_diff"] = row["check"]["max_scaled_diff"]
+                        if args.check_multi_target:
+                            row["multi_target_check"] = check_multi_target_case(
+                                T, k, N, constant_status, tests_name, args.seed, extra_config, args.check_models,
+                                args.rtol, args.atol)
+                            row["multi_mismatches"] = row["multi_target_check"]["mismatches"]
+                        if args.check_decomposition:
+                            row["decomposition_check"] = check_decomposition_case(
+                                T, k, N, constant_status, tests_name, args.seed, extra_config, args.check_models,
+                                args.rtol, args.atol)
+                            row["decomp_mismatches"] = row["decomposition_check"]["mismatches"]
+                        rows.append(row)
+                        print(" ".join(f"{row[c]:>12.4g}" if isinstance(row[c], float) else f"{str(row[c]):>12}"
+                                       for c in columns), flush=True)
+
+    report = {
+        "version": git_version(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": extra_config,
+        "seed": args.seed,
+        "rows": rows,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        print(f"Wrote {args.out}")
+    failed = sum(row.get("check_mismatches", 0) for row in rows)
+    if failed:
+        print(f"Fast path differs from statsmodels: {failed} mismatches", file=sys.stderr)
+    multi_failed = sum(row.get("multi_mismatches", 0) for row in rows)
+    if multi_failed:
+        print(f"Multi-Y job differs from single-Y jobs: {multi_failed} mismatches", file=sys.stderr)
+    decomposition_failed = sum(row.get("decomp_mismatches", 0) for row in rows)
+    if decomposition_failed:
+        print(f"Decomposition differs from the search: {decomposition_failed} mismatches", file=sys.stderr)
+    return 1 if failed or multi_failed or decomposition_failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
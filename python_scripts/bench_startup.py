@@ -0,0 +1,88 @@
+# python_scripts/bench_startup.py
+"""
+Бенчмарк холодного старта скриптов python_scripts: каждый запрос server.js (без python_worker.py)
+запускает новый интерпретатор, и импорт pandas/statsmodels стоит дороже самой работы.
+
+Для каждого скрипта:
+  - wall time `python -c "import <скрипт>"` (медиана по --repeat запускам) и он же за вычетом
+    пустого интерпретатора (`python -c pass`);
+  - разбор `-X importtime`: прямые импорты модуля скрипта с наибольшим накопленным временем.
+С --xlsx get_sheets.py дополнительно запускается целиком на этой книге.
+
+Пример: python bench_startup.py --repeat 5 --top 6 --xlsx "../Z1 Div and Corp Loans+levels.xlsx"
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SCRIPTS = ("get_sheets", "step1_load_data", "step1b_aggregate_data", "step2_diff_abs", "step2_diff_pct",
+                   "step2_normalize", "step3_run_regression_master", "step4_calculate_decomposition")
+# import time:   self [us] | cumulative | <отступ по 2 пробела на уровень>имя
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def wall_time(argv, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(argv, cwd=SCRIPTS_DIR, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def import_breakdown(module):
+    """(накопленное время импорта модуля, [(прямой импорт, накопленное время)]) в секундах."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=SCRIPTS_DIR,
+                            check=True, capture_output=True, text=True).stderr
+    # Строки вложенных импортов идут перед строкой родителя; модули, уже импортированные
+    # раньше (в том числе при старте интерпретатора), -X importtime не повторяет
+    pending = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        cumulative, depth, name = int(match.group(2)) / 1e6, len(match.group(3)) // 2, match.group(4)
+        if depth == 1:
+            pending.append((name, cumulative))
+        elif depth == 0:
+            if name == module:
+                return cumulative, sorted(pending, key=lambda item: -item[1])
+            pending = []
+    return 0.0, []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scripts", nargs="+", default=list(DEFAULT_SCRIPTS), help="имена модулей без .py")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=6, help="сколько прямых импортов показывать")
+    parser.add_argument("--xlsx", help="книга для полного запуска get_sheets.py")
+    args = parser.parse_args()
+
+    baseline = wall_time([sys.executable, "-c", "pass"], args.repeat)
+    print(f"python -c pass: {baseline * 1000:.0f} ms (median of {args.repeat})")
+    print(f"{'script':<32} {'wall ms':>8} {'- base':>8} {'import ms':>10}")
+    breakdowns = {}
+    for module in args.scripts:
+        wall = wall_time([sys.executable, "-c", f"import {module}"], args.repeat)
+        total, children = import_breakdown(module)
+        breakdowns[module] = children
+        print(f"{module:<32} {wall * 1000:>8.0f} {(wall - baseline) * 1000:>8.0f} {total * 1000:>10.0f}")
+
+    if args.xlsx:
+        wall = wall_time([sys.executable, "get_sheets.py", os.path.abspath(args.xlsx)], args.repeat)
+        print(f"{'get_sheets.py <xlsx> (full run)':<32} {wall * 1000:>8.0f} {(wall - baseline) * 1000:>8.0f}")
+
+    print(f"\n-X importtime: top {args.top} direct imports by cumulative time (ms)")
+    for module, children in breakdowns.items():
+        top = ", ".join(f"{name} {seconds * 1000:.0f}" for name, seconds in children[:args.top])
+        print(f"  {module}: {top or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# python_scripts/best_subset.py
+"""
+Режим config.searchMode = 'leaps_and_bounds' для step3_run_regression_master.py:
+лучшие M спецификаций каждого размера без полного перебора подмножеств x лагов.
+
+Дерево поиска: на глубине i решается судьба регрессора i - исключен или входит с одним из своих лагов (0..N).
+Нижняя граница RSS для узла - RSS модели со всеми уже выбранными колонками и всеми лагами
+еще не решенных регрессоров (добавление колонок RSS не увеличивает). Если граница не лучше
+M-го результата ни для одного достижимого размера, ветка отсекается целиком.
+
+Граница корректна только на общей выборке, поэтому поиск идет по строкам, где определены
+все колонки матрицы лагов. При фиксированных n и числе параметров AIC, BIC и adj-R2 монотонны
+по RSS, так что лучшие по RSS в каждом размере - лучшие и по любому из критериев.
+Отобранные спецификации потом считаются обычным run_single_ols на той же общей выборке
+(мастер включает для этого режима config.commonSample), поэтому их AIC/BIC ранжируются как best_per_size.
+"""
+import heapq
+import math
+
+import numpy as np
+
+from ols_engine import FIRST_X_COL, Y_COL, SpecSample
+
+RANK_CRITERIA = ("aic", "bic", "adj_r2")
+# Запас на округление при сравнении границы с порогом: отсекаем, только если граница хуже наверняка
+BOUND_RTOL = 1e-9
+# Отсечение малых сингулярных чисел масштабированной матрицы (колонки лагов одного ряда бывают почти коллинеарны)
+LSTSQ_RCOND = 1e-12
+
+
+class LeapsAndBounds:
+    def __init__(self, engine, best_per_size, rank_by="aic"):
+        if rank_by not in RANK_CRITERIA:
+            raise ValueError(f"Unknown rankBy '{rank_by}', expected one of {RANK_CRITERIA}")
+        self.lags = engine.lags
+        self.best_per_size = max(1, int(best_per_size))
+        self.rank_by = rank_by
+        lag_columns = list(range(self.lags.values.shape[1]))
+        mask = engine.y_valid & self.lags.valid.all(axis=1)
+        self.sample = SpecSample(list(self.lags.column_names), lag_columns, [], mask)
+        self.n = self.sample.n_obs
+        self.nodes_visited = 0
+        self.leaves_evaluated = 0
+        self.branches_pruned = 0
+        self._grams = {}
+        if self.n > 0:
+            means, C = engine.cross_products(self.sample)
+            # С константой - центрированная матрица, без константы - сырая X'X = C + n*mu*mu'
+            self._grams[True] = self._scaled(C)
+            self._grams[False] = self._scaled(C + self.n * np.outer(means, means))
+
+    @staticmethod
+    def _scaled(G):
+        d = np.sqrt(np.diag(G)).copy()
+        d[~(d > 0)] = 1.0 # Колонка без вариации ничего не объясняет, масштаб не важен
+        return G / np.outer(d, d), G[Y_COL, Y_COL]
+
+    def rss(self, lag_columns, include_constant):
+        """RSS на общей выборке для набора колонок (псевдообратная - колонки могут быть линейно зависимы)."""
+        Gs, tss = self._grams[include_constant]
+        if not lag_columns:
+            return tss
+        idx = FIRST_X_COL + np.asarray(lag_columns)
+        # В масштабированных координатах TSS = 1, RSS = 1 - r'A^+r
+        r = Gs[idx, Y_COL]
+        beta = np.linalg.lstsq(Gs[np.ix_(idx, idx)], r, rcond=LSTSQ_RCOND)[0]
+        return tss * max(1.0 - r @ beta, 0.0)
+
+    # --- Поиск по дереву для одного варианта константы ---
+    def _search(self, include_constant, allowed_sizes):
+        features = self.lags.feature_names
+        k = len(features)
+        # Признак -> {лаг: колонка}; после config.screening у каждого признака свои лаги
+        feature_columns = [{lag: self.lags.column_index[(f, lag)] for lag in self.lags.feature_lags[f]} for f in features]
+        heaps = {m: [] for m in allowed_sizes} # max-heap по RSS: (-rss, порядковый номер, выбор)
+        counter = 0
+
+        def threshold(m):
+            heap = heaps[m]
+            return -heap[0][0] if len(heap) >= self.best_per_size else math.inf
+
+        def visit(depth, chosen, bound):
+            nonlocal counter
+            self.nodes_visited += 1
+            remaining = k - depth
+            reachable = [m for m in range(len(chosen), len(chosen) + remaining + 1) if m in heaps]
+            if not reachable or bound * (1 - BOUND_RTOL) >= max(threshold(m) for m in reachable):
+                self.branches_pruned += 1
+                return
+            if remaining == 0:
+                # Лист: граница совпадает с точным RSS спецификации
+                self.leaves_evaluated += 1
+                heap = heaps[len(chosen)]
+                counter += 1
+                if len(heap) < self.best_per_size:
+                    heapq.heappush(heap, (-bound, counter, chosen))
+                else:
+                    heapq.heapreplace(heap, (-bound, counter, chosen))
+                return
+            base = [feature_columns[i][lag] for i, lag in chosen]
+            rest = [col for j in range(depth + 1, k) for col in feature_columns[j].values()]
+            children = [(self.rss(base + rest, include_constant), chosen)]
+            for lag, col in feature_columns[depth].items():
+                children.append((self.rss(base + [col] + rest, include_constant), chosen + [(depth, lag)]))
+            # Сначала самые многообещающие ветки - пороги быстрее становятся жесткими
+            children.sort(key=lambda child: child[0])
+            for child_bound, child in children:
+                visit(depth + 1, child, child_bound)
+
+        all_columns = [col for cols in feature_columns for col in cols.values()]
+        visit(0, [], self.rss(all_columns, include_constant))
+        return {m: [(-neg_rss, chosen) for neg_rss, _, chosen in heap] for m, heap in heaps.items()}
+
+    def criterion(self, rss, size, include_constant):
+        """Критерий на общей выборке (константы, одинаковые для всех моделей, опущены). Меньше - лучше."""
+        n = self.n
+        p = size + (1 if include_constant else 0)
+        if self.rank_by == "adj_r2":
+            tss = self._grams[include_constant][1]
+            return (n - (1 if include_constant else 0)) / (n - p) * rss / tss if tss > 0 else math.inf
+        log_term = n * math.log(rss / n) if rss > 0 else -math.inf
+        return log_term + (2 if self.rank_by == "aic" else math.log(n)) * p
+
+    def run(self, constant_variants):
+        """
+        constant_variants - список include_constant (True/False) для перебора.
+        Возвращает {размер: [(subset_indices, lags, include_constant, значение критерия), ...]}
+        - лучшие M по критерию, по возрастанию (для adj_r2 хранится 1 - adj_r2).
+        """
+        k = len(self.lags.feature_names)
+        candidates = {}
+        for include_constant in constant_variants:
+            p_const = 1 if include_constant else 0
+            # Как в run_single_ols: нужно хотя бы на 2 наблюдения больше, чем регрессоров
+            allowed = [m for m in range(k + 1)
+                       if (m > 0 or include_constant) and self.n >= m + 2 and self.n - m - p_const > 0]
+            if not allowed:
+                continue
+            for m, entries in self._search(include_constant, allowed).items():
+                for rss, chosen in entries:
+                    subset = tuple(i for i, _ in chosen)
+                    lags = tuple(lag for _, lag in chosen)
+                    candidates.setdefault(m, []).append(
+                        (self.criterion(rss, m, include_constant), subset, lags, include_constant))
+        best = {}
+        for m, entries in sorted(candidates.items()):
+            entries.sort(key=lambda entry: entry[0])
+            best[m] = [(subset, lags, include_constant, value)
+                       for value, subset, lags, include_constant in entries[:self.best_per_size]]
+        return best
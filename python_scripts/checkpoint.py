@@ -0,0 +1,157 @@
+# python_scripts/checkpoint.py
+"""
+Контрольные точки длинного перебора step3_run_regression_master.py.
+
+config.checkpointDir включает периодическую запись (раз в config.checkpointIntervalSeconds):
+  checkpoint.json - сигнатура задачи, курсор (все спецификации с позицией < cursor в порядке
+                    перебора посчитаны и учтены), счетчики и состояние режима topK;
+  results.jsonl   - при config.checkpointResults: компактные результаты до курсора, чтобы при
+                    продолжении заново отправить их в Node.
+payload.resume = true (или путь к каталогу) продолжает с курсора; ID моделей те же, так как
+перечисление спецификаций детерминировано.
+"""
+import hashlib
+import json
+import os
+import time
+
+CHECKPOINT_FILE = "checkpoint.json"
+RESULTS_FILE = "results.jsonl"
+DEFAULT_INTERVAL_SECONDS = 30
+# Параметры, которые не меняют ни набор, ни порядок спецификаций, ни результаты
+SIGNATURE_IGNORED_CONFIG_KEYS = ("checkpointDir", "checkpointIntervalSeconds", "checkpointResults", "numWorkers",
+                                 "resultStore", "modelCache", "modelCacheMaxMB", "profile", "summary",
+                                 "timeBudgetSeconds", "maxModels", "stopAfterValid")
+
+
+def job_signature(payload, spec_order=None):
+    """
+    Хэш данных и конфигурации задачи: продолжать можно только ту же самую задачу.
+    spec_order - фактический порядок перебора: без config.specOrder он зависит от лимитов, а они в хэш не входят.
+    """
+    config = {key: value for key, value in payload.get('config', {}).items()
+              if key not in SIGNATURE_IGNORED_CONFIG_KEYS}
+    if spec_order is not None and spec_order != config.get('specOrder', 'canonical'):
+        config['specOrder'] = spec_order
+    y = payload.get('dependentVariables') or payload.get('dependentVariable')
+    blob = json.dumps({"y": y, "x": payload.get('regressors'), "config": config},
+                      sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class Checkpointer:
+    def __init__(self, directory, signature, interval_seconds=DEFAULT_INTERVAL_SECONDS, store_results=False):
+        self.directory = directory
+        self.signature = signature
+        self.interval_seconds = interval_seconds
+        self.store_results = store_results
+        self.cursor = 0
+        self._pending_lines = []
+        self._last_save = time.time()
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def checkpoint_path(self):
+        return os.path.join(self.directory, CHECKPOINT_FILE)
+
+    @property
+    def results_path(self):
+        return os.path.join(self.directory, RESULTS_FILE)
+
+    # --- Продолжение ---
+    def load(self):
+        """Состояние последней контрольной точки или None, если ее нет."""
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("signature") != self.signature:
+            raise ValueError(f"Checkpoint in '{self.directory}' belongs to a different job (data or config changed).")
+        self.cursor = state["cursor"]
+        return state
+
+    def stored_results(self):
+        """
+        Сохраненные результаты до курсора: [(model_id, result), ...] в порядке перебора.
+        Файл переписывается без записей за курсором (могли быть дописаны перед аварийной остановкой).
+        """
+        if not self.store_results or not os.path.exists(self.results_path):
+            return []
+        kept_lines, results = [], []
+        with open(self.results_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break # Недописанная последняя строка
+                if record["pos"] >= self.cursor:
+                    break
+                kept_lines.append(line if line.endswith("\n") else line + "\n")
+                results.append((record["id"], record["result"]))
+        self._replace_file(self.results_path, "".join(kept_lines))
+        return results
+
+    def start_fresh(self, cursor=0):
+        """
+        Новая задача в каталоге: старые контрольная точка и результаты больше не нужны.
+        cursor - первая позиция (начало части перебора при config.shard).
+        """
+        self.cursor = cursor
+        for path in (self.checkpoint_path, self.results_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    # --- Запись ---
+    def advance(self, position, model_id, result):
+        """Результат спецификации с позицией position учтен (позиции приходят строго по порядку)."""
+        if position != self.cursor:
+            raise ValueError(f"Checkpoint cursor is at {self.cursor}, got position {position}.")
+        self.cursor += 1
+        if self.store_results:
+            self._pending_lines.append(
+                json.dumps({"pos": position, "id": model_id, "result": result}, separators=(",", ":")) + "\n")
+
+    def maybe_save(self, get_state, force=False):
+        """
+        Пишет контрольную точку, если прошел интервал (или force). get_state() - счетчики мастера;
+        вызывается, только когда точка пишется (проверка интервала идет на каждой модели).
+        """
+        now = time.time()
+        if not force and now - self._last_save < self.interval_seconds:
+            return False
+        # Сначала результаты, потом курсор: после сбоя между шагами лишние строки отрежет stored_results()
+        if self._pending_lines:
+            with open(self.results_path, "a", encoding="utf-8") as f:
+                f.writelines(self._pending_lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending_lines = []
+        checkpoint = {"signature": self.signature, "cursor": self.cursor, "saved_at": now, **get_state()}
+        self._replace_file(self.checkpoint_path, json.dumps(checkpoint))
+        self._last_save = now
+        return True
+
+    @staticmethod
+    def _replace_file(path, content):
+        # Атомарная замена: читатель видит либо старый, либо новый файл целиком
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+def iter_in_order(results, start):
+    """
+    Переупорядочивает (position, model_id, result) по позиции: пул отдает шарды не по порядку,
+    а курсор контрольной точки должен покрывать только непрерывный префикс.
+    """
+    waiting = {}
+    expected = start
+    for position, model_id, result in results:
+        waiting[position] = (model_id, result)
+        while expected in waiting:
+            model_id, result = waiting.pop(expected)
+            yield expected, model_id, result
+            expected += 1
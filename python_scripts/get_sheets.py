@@ -1,12 +1,62 @@
-import pandas as pd
 import sys
 import json
 import io
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
 
 log_buffer = io.StringIO()
 def log_debug(message):
     print(f"DEBUG_GET_SHEETS: {message}", file=log_buffer)
 
+# Пространства имен OOXML для workbook.xml и файлов связей
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+RELS_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+DOC_RELS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+OFFICE_DOCUMENT_REL = f"{DOC_RELS}/officeDocument"
+WORKSHEET_REL = f"{DOC_RELS}/worksheet"
+
+def read_rels(archive, rels_path):
+    # Файл связей -> {Id: Type}
+    if rels_path not in archive.namelist():
+        return {}
+    return {rel.get("Id"): rel.get("Type") for rel in ET.fromstring(archive.read(rels_path)).iter(f"{RELS_NS}Relationship")}
+
+def xlsx_sheet_names(file_path):
+    """
+    Имена листов .xlsx/.xlsm прямо из workbook.xml внутри zip - без pandas и openpyxl.
+    None - файл не такого формата (xls, xlsb, ods, поврежденный zip), читать через pandas.
+    """
+    try:
+        archive = zipfile.ZipFile(file_path)
+    except zipfile.BadZipFile:
+        return None
+    with archive:
+        # Путь к книге берем из _rels/.rels, как openpyxl; обычно это xl/workbook.xml
+        workbook_path = "xl/workbook.xml"
+        if "_rels/.rels" in archive.namelist():
+            for rel in ET.fromstring(archive.read("_rels/.rels")).iter(f"{RELS_NS}Relationship"):
+                if rel.get("Type") == OFFICE_DOCUMENT_REL:
+                    workbook_path = posixpath.normpath(rel.get("Target", "").lstrip("/"))
+                    break
+        if not workbook_path.endswith(".xml") or workbook_path not in archive.namelist():
+            return None
+        workbook = ET.fromstring(archive.read(workbook_path))
+        folder, name = posixpath.split(workbook_path)
+        sheet_types = read_rels(archive, posixpath.join(folder, "_rels", f"{name}.rels"))
+        # pandas (openpyxl) отдает только рабочие листы: листы-диаграммы и прочее пропускаем
+        sheet_names = [sheet.get("name") for sheet in workbook.iter(f"{MAIN_NS}sheet")
+                       if sheet_types.get(sheet.get(f"{{{DOC_RELS}}}id")) == WORKSHEET_REL]
+        return sheet_names or None # Ничего не нашли (другие пространства имен) - пусть разбирается pandas
+
+def list_sheet_names(file_path):
+    sheet_names = xlsx_sheet_names(file_path)
+    if sheet_names is not None:
+        return sheet_names
+    log_debug("Not an xlsx workbook, falling back to pandas.ExcelFile")
+    import pandas as pd # Тяжелый импорт - только для форматов, которые не разобрать напрямую
+    return pd.ExcelFile(file_path).sheet_names
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         # Выводим ошибку в stderr, чтобы основной вывод был чистым JSON или отсутствовал
@@ -17,9 +67,7 @@ if __name__ == "__main__":
     log_debug(f"Attempting to read sheet names from: {file_path}")
 
     try:
-        # Используем pandas.ExcelFile для эффективного получения имен листов
-        xls = pd.ExcelFile(file_path)
-        sheet_names = xls.sheet_names
+        sheet_names = list_sheet_names(file_path)
         log_debug(f"Successfully read sheet names: {sheet_names}")
         # Выводим результат (список имен) в stdout как JSON
         print(json.dumps(sheet_names))
@@ -35,4 +83,4 @@ if __name__ == "__main__":
         sys.exit(1)
     finally:
         # Выводим весь лог в stderr в любом случае
-        sys.stderr.write(log_buffer.getvalue())
\ No newline at end of file
+        sys.stderr.write(log_buffer.getvalue())
@@ -0,0 +1,96 @@
+# python_scripts/json_encoding.py
+"""
+JSON для stdout скриптов (step3, step4): NaN/inf -> null, numpy-скаляры -> числа Python,
+даты -> ISO-строки.
+
+Массивы numpy и pandas Series переводятся целиком: NaN/inf заменяются на уровне массива,
+затем один tolist(). Очищенная копия всего объекта не строится: сначала кодирует быстрый
+C-кодировщик (allow_nan=False), а если в обычных float встретился NaN/inf - заново
+кодируются только ветви, в которых он есть, с null вместо него.
+"""
+import json
+import math
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+
+def array_to_list(values):
+    """Массив любой формы -> вложенные списки; NaN/inf -> None, даты -> ISO-строки."""
+    array = np.asarray(values)
+    if array.dtype.kind == "f":
+        finite = np.isfinite(array)
+        if finite.all():
+            return array.tolist()
+        result = array.astype(object) # Элементы - float Python
+        result[~finite] = None
+        return result.tolist()
+    if array.dtype.kind == "M":
+        return [None if pd.isna(ts) else ts.isoformat() for ts in pd.DatetimeIndex(array.ravel())]
+    return array.tolist() # Целые, bool, object (NaN внутри object дочистит кодировщик)
+
+
+def index_to_iso(index):
+    """DatetimeIndex -> список ISO-строк (как Timestamp.isoformat())."""
+    index = pd.DatetimeIndex(index)
+    # Доли секунды и часовой пояс isoformat() пишет только если они есть - тогда поэлементно
+    if index.tz is None and not index.hasnans and not (index.microsecond.any() or index.nanosecond.any()):
+        return index.strftime("%Y-%m-%dT%H:%M:%S").tolist()
+    return [ts.isoformat() for ts in index]
+
+
+def series_pairs(series):
+    """Series с DatetimeIndex -> [[timestamp_iso, value], ...], NaN/inf -> None."""
+    values = array_to_list(series.to_numpy(dtype=float, na_value=np.nan))
+    return [[ts, value] for ts, value in zip(index_to_iso(series.index), values)]
+
+
+class SafeJSONEncoder(json.JSONEncoder):
+    def default(self, o):
+        if isinstance(o, (pd.Series, pd.Index)):
+            return array_to_list(o.to_numpy())
+        if isinstance(o, pd.DataFrame):
+            return {str(column): array_to_list(o[column].to_numpy()) for column in o.columns}
+        if isinstance(o, np.ndarray):
+            return array_to_list(o)
+        if isinstance(o, (datetime, date)): # В том числе pd.Timestamp
+            return o.isoformat()
+        if isinstance(o, np.generic):
+            return o.item() # NaN в np.float32 станет float NaN, dumps заменит его на null
+        return super().default(o)
+
+
+def key_to_str(key):
+    """Ключ словаря -> строка, как ее пишет json: True -> "true", None -> "null", 1.0 -> "1.0", NaN -> "NaN"."""
+    if isinstance(key, str):
+        return key
+    if key is True or key is False:
+        return "true" if key else "false"
+    if key is None:
+        return "null"
+    if isinstance(key, float):
+        if math.isnan(key):
+            return "NaN"
+        if math.isinf(key):
+            return "Infinity" if key > 0 else "-Infinity"
+        return float.__repr__(key)
+    if isinstance(key, int):
+        return int.__repr__(key)
+    raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+
+
+def dumps(data):
+    """JSON-строка без NaN/Infinity (их нет в стандарте JSON и не понимает JSON.parse)."""
+    try:
+        return json.dumps(data, allow_nan=False, cls=SafeJSONEncoder)
+    except ValueError:
+        pass
+    # Где-то есть NaN/inf: ветви без них снова кодирует C-кодировщик, разбирается только путь до них
+    if isinstance(data, dict):
+        return "{" + ", ".join(f"{json.dumps(key_to_str(key))}: {dumps(value)}" for key, value in data.items()) + "}"
+    if isinstance(data, (list, tuple)):
+        return "[" + ", ".join(dumps(item) for item in data) + "]"
+    if isinstance(data, float):
+        return "null"
+    return dumps(SafeJSONEncoder().default(data)) # numpy/pandas: сначала перевод в типы Python
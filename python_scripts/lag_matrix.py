@@ -0,0 +1,69 @@
+# python_scripts/lag_matrix.py
+"""
+Матрица лагированных регрессоров, общая для всех спецификаций задачи.
+
+Строится один раз: непрерывная float64-матрица (T x k*(N+1)) со всеми колонками feature x lag
+и индексом (feature, lag) -> номер колонки. Спецификации берут срезы по номерам колонок
+вместо того, чтобы заново собирать DataFrame и вызывать .shift(lag) для каждой модели.
+После config.screening матрица строится только из отобранных колонок (feature_lags - лаги каждого признака).
+"""
+import numpy as np
+import pandas as pd
+
+
+class LagMatrix:
+    def __init__(self, all_x_df, max_lag, feature_lags=None):
+        """feature_lags - {признак: лаги} (по умолчанию 0..max_lag у всех признаков)."""
+        self.index = all_x_df.index
+        self.feature_names = list(all_x_df.columns)
+        self.max_lag = max_lag
+        self.feature_lags = {feature: list(range(max_lag + 1)) if feature_lags is None else sorted(feature_lags[feature])
+                             for feature in self.feature_names}
+        n_rows = len(all_x_df)
+        self.values = np.empty((n_rows, sum(map(len, self.feature_lags.values()))), dtype=np.float64)
+        self.column_index = {}
+        self.column_names = []
+        col = 0
+        for feature in self.feature_names:
+            x = all_x_df[feature].to_numpy(dtype=np.float64)
+            for lag in self.feature_lags[feature]:
+                # Эквивалент Series.shift(lag) по позиции
+                shift = min(lag, n_rows)
+                self.values[:shift, col] = np.nan
+                self.values[shift:, col] = x[:n_rows - shift]
+                self.column_index[(feature, lag)] = col
+                self.column_names.append(self.column_name(feature, lag))
+                col += 1
+        self.valid = ~np.isnan(self.values)
+
+    @staticmethod
+    def column_name(feature, lag):
+        return f"{feature}_L{lag}"
+
+    def select(self, features_with_lags):
+        """
+        Возвращает (имена колонок, номера колонок, пропущенные) в порядке спецификации.
+        Пропущенные - список (feature, lag, причина): 'missing_feature' или 'invalid_lag'.
+        """
+        names, columns, skipped = [], [], []
+        for feature, lag in features_with_lags.items():
+            col = self.column_index.get((feature, lag))
+            if col is not None:
+                names.append(self.column_names[col])
+                columns.append(col)
+            elif feature not in self.feature_names:
+                skipped.append((feature, lag, 'missing_feature'))
+            else:
+                skipped.append((feature, lag, 'invalid_lag'))
+        return names, columns, skipped
+
+    def common_sample_mask(self, y_series):
+        """
+        Общая выборка config.commonSample: строки, где определены Y и все колонки матрицы
+        (все регрессоры на всех своих лагах).
+        """
+        return y_series.notna().to_numpy() & self.valid.all(axis=1)
+
+    def frame(self, columns, names):
+        """DataFrame из выбранных колонок (для statsmodels и декомпозиции)."""
+        return pd.DataFrame(self.values[:, columns], index=self.index, columns=names)
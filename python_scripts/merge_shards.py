@@ -0,0 +1,213 @@
+# python_scripts/merge_shards.py
+"""
+Объединение частей перебора (step3_run_regression_master.py --shard i/n или config.shard) в один
+набор результатов с теми же ID моделей, что и при запуске целиком на одной машине.
+
+Входы - в любом сочетании:
+  *.sqlite - хранилища результатов частей (config.resultStore; при нескольких Y - файл на каждую Y);
+  остальные файлы - сохраненный stdout мастера (PROGRESS_UPDATE / PROGRESS_FRAME / FINAL_RESULT).
+Части проверяются на совместимость (то же пространство спецификаций и то же n) и полноту (есть все
+части 1..n, каждая закончилась со статусом finished). В режиме topK топ пересчитывается по объединению
+топов частей: K лучших моделей всего перебора входят в K лучших своей части.
+
+Выход: --store (хранилище result_store.py, при нескольких Y - файл на каждую Y) и/или --json
+({"results": ..., "final": ...}); без них - только проверка. Сводка печатается в stdout,
+код выхода 1 - не хватает частей или какая-то часть не закончилась.
+
+Пример (общий NFS, по процессу на машину, без планировщика):
+  python step3_run_regression_master.py --shard 3/8 < payload.json > /nfs/job/shard3.log
+  python merge_shards.py /nfs/job/shard*.log --store /nfs/job/merged.sqlite
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from urllib.parse import quote
+
+from result_frames import FRAME_PREFIX, decode_frame
+from result_store import MODEL_ID_PATTERN, ResultStore, target_store_path
+from spec_enumerator import SpecSpace
+from top_k import TopKResults
+
+# Поля сведений о части, которые должны совпадать у всех частей одной задачи
+SHARD_JOB_KEYS = ("count", "job_models", "features", "max_lag", "constant_status", "targets")
+TOP_K_COUNT_KEYS = ("offered", "completed", "valid", "skipped", "error", "discarded")
+WRITE_BATCH_SIZE = 5000
+
+
+def log_warn(message): print(f"WARN_MERGE: {message}", file=sys.stderr)
+def log_info(message): print(f"INFO_MERGE: {message}", file=sys.stderr)
+
+
+# --- Чтение частей: (итог части, {цель: {model_id: результат}}) ---
+def read_store(path):
+    """Хранилище части; цель - meta.target (None, если Y одна)."""
+    connection = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True)
+    try:
+        meta = {key: json.loads(value) for key, value in connection.execute("SELECT key, value FROM meta")}
+        results = {model_id: json.loads(result) for model_id, result in connection.execute("SELECT model_id, result FROM models")}
+    finally:
+        connection.close()
+    # В meta итог задачи лежит без type, а счетчик - под именем total_calculated
+    final = {**meta, "total_models_calculated": meta.get("total_calculated", 0)}
+    return final, {meta.get("target"): results}
+
+
+def read_log(path):
+    """Сохраненный stdout мастера: апдейты (JSON или колоночные кадры) и FINAL_RESULT."""
+    results, final = {}, None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("PROGRESS_UPDATE:"):
+                update = json.loads(line[len("PROGRESS_UPDATE:"):])
+            elif line.startswith(FRAME_PREFIX):
+                update = decode_frame(line[len(FRAME_PREFIX):])
+            elif line.startswith("FINAL_RESULT:"):
+                final = json.loads(line[len("FINAL_RESULT:"):])
+                continue
+            else:
+                continue
+            target_results = results.setdefault(update.get("target"), {})
+            target_results.update(update.get("processed_batch", {}))
+            for model_id in update.get("evicted", ()):
+                target_results.pop(model_id, None)
+    if final is None:
+        final = {"status": "incomplete", "total_models_calculated": 0}
+    return final, results
+
+
+def read_part(path):
+    return read_store(path) if path.endswith(".sqlite") else read_log(path)
+
+
+# --- Объединение ---
+def _model_number(model_id):
+    match = MODEL_ID_PATTERN.match(model_id)
+    return int(match.group(1)) if match else 0
+
+
+def merge_top_k(results, summaries, top_k_total):
+    """Топ всего перебора из топов частей; счетчики - сумма счетчиков частей."""
+    first = summaries[0]
+    top_k = TopKResults(first["k"], first["criterion"], first["valid_first"])
+    # Порядок номеров моделей - порядок перебора: при равных значениях остается более ранняя модель
+    for model_id in sorted(results, key=_model_number):
+        top_k.offer(model_id, results[model_id])
+    ranking = top_k.ranking()
+    summary = {"k": top_k.k, "criterion": top_k.criterion, "valid_first": top_k.valid_first, "retained": len(ranking),
+               **{key: sum(s.get(key, 0) for s in summaries) for key in TOP_K_COUNT_KEYS}}
+    summary["ranking"] = ranking
+    if summary["offered"] != top_k_total:
+        log_warn(f"Top-K counters cover {summary['offered']} of {top_k_total} models")
+    return {model_id: results[model_id] for model_id in ranking}, summary
+
+
+def merge_parts(parts):
+    """parts - [(путь, итог части, результаты)] -> (итог объединения, {цель: {model_id: результат}})."""
+    shards = {} # Номер части -> итог (части с несколькими Y приходят несколькими файлами)
+    job = None
+    merged = {}
+    for path, final, results in parts:
+        shard = final.get("shard")
+        if shard is None:
+            raise ValueError(f"{path}: not a shard output (status '{final.get('status')}'); run the master with --shard i/n")
+        shard_job = {key: shard.get(key) for key in SHARD_JOB_KEYS}
+        if job is None:
+            job = shard_job
+        elif shard_job != job:
+            differing = [key for key in SHARD_JOB_KEYS if shard_job[key] != job[key]]
+            raise ValueError(f"{path}: shard of a different job (differs in {differing})")
+        if shard["index"] in shards and shards[shard["index"]].get("status") != final.get("status"):
+            log_warn(f"{path}: shard {shard['index']} seen before with status '{shards[shard['index']].get('status')}'")
+        shards.setdefault(shard["index"], final)
+        for target, target_results in results.items():
+            merged_target = merged.setdefault(target, {})
+            for model_id, result in target_results.items():
+                merged_target.setdefault(model_id, result)
+    if job is None:
+        raise ValueError("No shard outputs given")
+
+    missing = sorted(set(range(1, job["count"] + 1)) - set(shards))
+    not_finished = sorted(index for index, final in shards.items() if final.get("status") != "finished")
+    if missing:
+        log_warn(f"Missing shards: {missing} of {job['count']}")
+    if not_finished:
+        log_warn(f"Shards not finished: {not_finished}")
+    complete = not missing and not not_finished
+    first = shards[min(shards)]
+    summary = {
+        "type": "final",
+        "status": "finished" if complete else "partial",
+        "total_models_calculated": sum(final.get("total_models_calculated", 0) for final in shards.values()),
+        "total_models": job["job_models"],
+        "shards": {"count": job["count"], "merged": sorted(shards), "missing": missing, "not_finished": not_finished},
+    }
+    for key in ("search", "common_sample"):
+        if first.get(key) is not None:
+            summary[key] = first[key]
+
+    multi_target = set(merged) != {None}
+    if multi_target:
+        summary["targets"] = job["targets"]
+    if first.get("top_k"):
+        top_k_summaries = {}
+        for target in merged:
+            summaries = [final["top_k"][target] if multi_target else final["top_k"] for final in shards.values()]
+            merged[target], top_k_summaries[target] = merge_top_k(merged[target], summaries, summary["total_models_calculated"])
+        summary["top_k"] = top_k_summaries if multi_target else top_k_summaries[None]
+    elif complete:
+        for target, target_results in merged.items():
+            if len(target_results) != job["job_models"]:
+                log_warn(f"{target or 'Results'}: {len(target_results)} models, expected {job['job_models']}")
+    summary["results"] = {target: len(target_results) for target, target_results in merged.items()} if multi_target \
+        else len(merged.get(None, {}))
+    return summary, merged, job
+
+
+# --- Запись ---
+def write_store(path, job, summary, merged):
+    space = SpecSpace(job["features"], job["max_lag"], job["constant_status"])
+    job_state = {key: value for key, value in summary.items() if key not in ("type", "total_models_calculated")}
+    for target, results in merged.items():
+        if target is None:
+            store = ResultStore(path, space)
+            target_path = path
+        else:
+            target_path = target_store_path(path, job["targets"].index(target))
+            store = ResultStore(target_path, space, target=target)
+        items = list(results.items())
+        for i in range(0, len(items), WRITE_BATCH_SIZE):
+            store.write_batch(dict(items[i:i + WRITE_BATCH_SIZE]))
+        store.finish(total_calculated=summary["total_models_calculated"], **job_state)
+        log_info(f"Wrote {len(items)} models to {target_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="хранилища (*.sqlite) и/или сохраненный stdout частей")
+    parser.add_argument("--store", help="путь объединенного хранилища результатов")
+    parser.add_argument("--json", help="путь JSON {results, final}")
+    args = parser.parse_args()
+
+    parts = []
+    for path in args.inputs:
+        final, results = read_part(path)
+        parts.append((path, final, results))
+        log_info(f"{path}: shard {(final.get('shard') or {}).get('index')}, status '{final.get('status')}', "
+                 f"{sum(len(r) for r in results.values())} results")
+    summary, merged, job = merge_parts(parts)
+    if args.store:
+        write_store(args.store, job, summary, merged)
+    if args.json:
+        results = merged.get(None, {}) if set(merged) == {None} else merged
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"results": results, "final": summary}, f)
+        log_info(f"Wrote {args.json}")
+    print(json.dumps(summary))
+    return 0 if summary["status"] == "finished" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
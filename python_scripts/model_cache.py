@@ -0,0 +1,171 @@
+# python_scripts/model_cache.py
+"""
+Кэш результатов моделей между задачами (config.modelCache = путь к файлу SQLite).
+
+Ключ - SHA-256 от содержимого, а не от ID модели: данных Y, точных лагированных колонок X
+спецификации (имя + значения, выровненные по индексу Y), флага константы и параметров
+config, от которых зависит результат одной модели (тесты, метрики, порог p-value, движок).
+Поэтому повторный поиск с лишним регрессором или другим maxLagDepth считает заново только
+новые спецификации: остальные колонки и выборки совпадают байт в байт.
+
+Хэши Y и всех колонок матрицы лагов считаются один раз на процесс, ключ спецификации - хэш
+от них. При нескольких зависимых переменных у каждой свой хэш Y и своя матрица лагов (хэши колонок
+общие у целей с одинаковыми датами), поэтому ключи совпадают с задачей по одной Y.
+Размер файла ограничен config.modelCacheMaxMB: при превышении удаляются давно не
+использованные записи (LRU по времени последнего обращения).
+Читают кэш все процессы (мастер и воркеры пула), пишет только мастер: воркеры возвращают
+новые записи и попадания вместе с шардом (drain/absorb).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from json_encoding import SafeJSONEncoder
+
+CACHE_VERSION = 1 # Увеличить при изменении формата результата run_single_ols
+DEFAULT_MAX_MB = 256
+EVICT_CHUNK = 1000
+# Параметры config, от которых зависит результат одной модели
+RESULT_CONFIG_KEYS = ("tests", "pValueThreshold", "metrics", "skipTestsAfterFailure", "olsEngine")
+# Статусы, которые можно кэшировать: 'error' может быть случайным сбоем
+CACHEABLE_STATUSES = ("completed", "skipped")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (key BLOB PRIMARY KEY, result TEXT NOT NULL, last_used REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used);
+"""
+
+
+def _digest(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.digest()
+
+
+class ModelCache:
+    def __init__(self, path, y_series, lag_matrix, config, writer=True):
+        """y_series - Series или список Series (несколько зависимых переменных), lag_matrix - матрица лагов или список по целям."""
+        self.path = path
+        self.writer = writer
+        self.max_bytes = int(config.get('modelCacheMaxMB', DEFAULT_MAX_MB) * 1024 * 1024)
+        result_config = {key: config.get(key) for key in RESULT_CONFIG_KEYS}
+        # Общая часть ключа: версия, параметры результата и данные Y (своя для каждой зависимой переменной)
+        y_list = y_series if isinstance(y_series, (list, tuple)) else [y_series]
+        self._prefixes = [_digest(CACHE_VERSION, json.dumps(result_config, sort_keys=True),
+                                  np.ascontiguousarray(y.to_numpy(dtype=np.float64)).tobytes())
+                          for y in y_list]
+        self._lag_matrices = lag_matrix if isinstance(lag_matrix, (list, tuple)) else [lag_matrix] * len(y_list)
+        digests = {} # Хэши колонок считаются один раз на матрицу
+        for matrix in self._lag_matrices:
+            if id(matrix) not in digests:
+                digests[id(matrix)] = [_digest(name, np.ascontiguousarray(matrix.values[:, col]).tobytes())
+                                       for col, name in enumerate(matrix.column_names)]
+        self._column_digests = [digests[id(matrix)] for matrix in self._lag_matrices]
+        self._connection = None
+        self._pending_puts = {}
+        self._pending_touches = set()
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+        if writer:
+            self.connection # Файл и схему создает мастер, до запуска воркеров
+
+    @property
+    def connection(self):
+        # Соединение открывается в том процессе, где используется (воркеры получают кэш через _init_worker)
+        if self._connection is None:
+            if self.writer:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=30)
+            self._connection.execute("PRAGMA journal_mode=WAL") # Несколько задач и воркеров читают параллельно
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            with self._connection:
+                self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def key(self, spec, target=0):
+        """Ключ спецификации {"regressors": {признак: лаг}, "include_constant": ...} для зависимой переменной target."""
+        _, columns, _ = self._lag_matrices[target].select(spec.get('regressors', {}))
+        column_digests = self._column_digests[target]
+        return _digest(self._prefixes[target], bool(spec.get('include_constant', True)),
+                       *(column_digests[col] for col in columns))
+
+    def get(self, key):
+        """Результат из кэша или None (промах)."""
+        row = self.connection.execute("SELECT result FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        self._pending_touches.add(key)
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        if result.get("status") in CACHEABLE_STATUSES:
+            # NaN/inf пишутся как есть (NaN/Infinity в JSON Python), чтобы результат из кэша совпадал с посчитанным
+            self._pending_puts[key] = json.dumps(result, cls=SafeJSONEncoder)
+
+    # --- Передача записей от воркеров пула мастеру ---
+    def drain(self):
+        """Новые записи, попадания и счетчики с прошлого вызова (воркер отдает их вместе с шардом)."""
+        pending = {"puts": self._pending_puts, "touches": list(self._pending_touches),
+                   "hits": self.stats["hits"], "misses": self.stats["misses"]}
+        self._pending_puts, self._pending_touches = {}, set()
+        self.stats["hits"] = self.stats["misses"] = 0
+        return pending
+
+    def absorb(self, pending):
+        self._pending_puts.update(pending["puts"])
+        self._pending_touches.update(pending["touches"])
+        self.stats["hits"] += pending["hits"]
+        self.stats["misses"] += pending["misses"]
+
+    # --- Запись (только мастер) ---
+    def flush(self):
+        """Пишет накопленные записи и время обращений одной транзакцией, затем ограничивает размер файла."""
+        if not self.writer or not (self._pending_puts or self._pending_touches):
+            return
+        now = time.time()
+        with self.connection:
+            if self._pending_puts:
+                cursor = self.connection.executemany(
+                    "INSERT OR IGNORE INTO entries (key, result, last_used) VALUES (?, ?, ?)",
+                    [(key, result, now) for key, result in self._pending_puts.items()])
+                self.stats["stored"] += cursor.rowcount
+            if self._pending_touches:
+                self.connection.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                            [(now, key) for key in self._pending_touches])
+        self._pending_puts, self._pending_touches = {}, set()
+        self._evict()
+
+    def _used_bytes(self):
+        # Занятые страницы файла (освобожденные при удалении страницы переиспользуются, файл не растет)
+        page_size, page_count, free_pages = (self.connection.execute(f"PRAGMA {pragma}").fetchone()[0]
+                                             for pragma in ("page_size", "page_count", "freelist_count"))
+        return page_size * (page_count - free_pages)
+
+    def _evict(self):
+        while self._used_bytes() > self.max_bytes:
+            with self.connection:
+                cursor = self.connection.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_used LIMIT ?)", (EVICT_CHUNK,))
+            if cursor.rowcount == 0:
+                break
+            self.stats["evicted"] += cursor.rowcount
+
+    def close(self):
+        self.flush()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __getstate__(self):
+        # В воркер пула уходит кэш без соединения и накопленных записей, только для чтения
+        state = self.__dict__.copy()
+        state.update(_connection=None, _pending_puts={}, _pending_touches=set(), writer=False,
+                     stats={key: 0 for key in self.stats})
+        return state
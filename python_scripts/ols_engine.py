@@ -0,0 +1,480 @@
+# python_scripts/ols_engine.py
+"""
+OLS на достаточных статистиках для перебора спецификаций в step3_run_regression_master.py.
+
+Матрица лагов строится один раз на задачу (lag_matrix.LagMatrix), к ней добавляются const и Y.
+Для каждой выборки (набора строк без NaN) один раз считаются средние и центрированная
+матрица перекрестных произведений, а каждая спецификация решается по своему под-блоку
+через разложение Холецкого. В режиме incremental фактор не строится заново, а обновляется
+добавлением/удалением колонок (IncrementalCholesky) - для порядка перебора по коду Грея.
+Зависимых переменных может быть несколько (payload.dependentVariables): колонки целей с одинаковыми
+датами входят в ту же Z'Z, и у целей с одинаковыми пропусками выборка, Z'Z и фактор спецификации
+общие - на каждую цель остаются только решения треугольных систем. Цели с разными датами считаются
+по своим матрицам лагов (TargetGroupsOLS).
+Результаты совпадают с sm.OLS(...).fit() (коэффициенты, p-values, R2, adj-R2, AIC/BIC).
+"""
+import math
+
+import numpy as np
+from scipy.linalg import solve_triangular
+from scipy.special import stdtr
+
+CONST_COL = 0
+Y_COL = 1 # Первая (или единственная) зависимая переменная; остальные - после колонок матрицы лагов
+FIRST_X_COL = 2
+
+# Порог для диагонали фактора Холецкого масштабированной матрицы:
+# ниже него спецификация считается почти вырожденной и решается через statsmodels (pinv)
+MIN_CHOLESKY_PIVOT = 1e-10
+# Для моделей без константы: предел 1 + n*mu'C^{-1}mu (во сколько раз средние "весят" больше разброса)
+MAX_NOCONST_MEAN_RATIO = 1e4
+# Если RSS меньше этой доли TSS, пересчитываем его по остаткам (потеря точности при вычитании)
+RSS_RECOMPUTE_RATIO = 1e-8
+# Сколько матриц Z'Z (по разным выборкам) держим в кэше
+MAX_CACHED_GRAMS = 256
+# Порог диагонали фактора для VIF: ниже него VIF считается вспомогательными регрессиями (statsmodels)
+MIN_VIF_PIVOT = 1e-8
+# Через сколько инкрементальных обновлений фактор строится заново (ограничивает накопление ошибок округления)
+REFACTOR_EVERY = 64
+
+
+def cholesky_factor(C, cols):
+    """
+    Разложение масштабированного блока C[cols, cols] = D A D, A = R'R (R - верхнетреугольная).
+    Возвращает (d, R, R^{-1}) или None, если блок почти вырожден.
+    """
+    A = C[np.ix_(cols, cols)]
+    # Масштабируем к единичной диагонали, чтобы порог вырожденности не зависел от единиц измерения
+    d = np.sqrt(np.diag(A))
+    if not np.all(d > 0):
+        return None
+    try:
+        L = np.linalg.cholesky(A / np.outer(d, d))
+    except np.linalg.LinAlgError:
+        return None
+    if np.min(np.diag(L)) ** 2 < MIN_CHOLESKY_PIVOT:
+        return None
+    R = L.T
+    return d, R, solve_triangular(R, np.eye(len(cols)), lower=False)
+
+
+def vif_from_gram(G):
+    """
+    VIF всех регрессоров по их нецентрированной матрице G = X'X (константа не входит):
+    VIF_i = G_ii * (G^{-1})_ii - диагональ обратной к масштабированной G, как у
+    variance_inflation_factor (вспомогательные регрессии без константы). Одно разложение на модель.
+    None - матрица почти вырождена, VIF надежнее считать вспомогательными регрессиями.
+    """
+    d = np.sqrt(np.diag(G))
+    if not np.all(d > 0):
+        return None
+    try:
+        L = np.linalg.cholesky(G / np.outer(d, d))
+    except np.linalg.LinAlgError:
+        return None
+    if np.min(np.diag(L)) ** 2 < MIN_VIF_PIVOT:
+        return None
+    L_inv = solve_triangular(L, np.eye(len(d)), lower=True)
+    return np.einsum("ij,ij->j", L_inv, L_inv)
+
+
+class IncrementalCholesky:
+    """
+    Фактор масштабированной C[cols, cols] = R'R вместе с R^{-1}, который переносится между спецификациями.
+    Добавление колонки - окаймление фактора, удаление - сдвиг колонок и вращения Гивенса
+    (те же вращения применяются к R^{-1}); оба шага O(p^2) вместо O(p^3).
+    При смене выборки (другая маска строк - другая C) фактор строится заново.
+    R и R^{-1} живут в буферах с запасом, чтобы обновления не выделяли память.
+    """
+
+    def __init__(self):
+        self.rebuilds = self.appends = self.drops = 0
+        self.key = None
+        self.C = None
+        self.cols = []
+        self.singular = False
+        self.updates = 0
+        self._allocate(8)
+
+    def _allocate(self, capacity):
+        self._R = np.zeros((capacity, capacity))
+        self._R_inv = np.zeros((capacity, capacity))
+        self._d = np.zeros(capacity)
+
+    @property
+    def R(self):
+        p = len(self.cols)
+        return self._R[:p, :p]
+
+    @property
+    def R_inv(self):
+        p = len(self.cols)
+        return self._R_inv[:p, :p]
+
+    @property
+    def d(self):
+        return self._d[:len(self.cols)]
+
+    def sync(self, key, C, cols):
+        """Приводит фактор к набору колонок cols на выборке key. False - блок почти вырожден."""
+        if key != self.key or self.singular or self.updates >= REFACTOR_EVERY:
+            self._rebuild(key, C, cols)
+            return not self.singular
+        if len(cols) > len(self._d):
+            self._grow(len(cols))
+        current = set(self.cols)
+        target = set(cols)
+        for col in [col for col in self.cols if col not in target]:
+            self._drop(self.cols.index(col))
+        for col in cols:
+            if col not in current and not self._append(col):
+                return False
+        return True
+
+    def _grow(self, size):
+        p = len(self.cols)
+        R, R_inv, d = self.R.copy(), self.R_inv.copy(), self.d.copy()
+        self._allocate(max(size, 2 * len(self._d)))
+        self._R[:p, :p] = R
+        self._R_inv[:p, :p] = R_inv
+        self._d[:p] = d
+
+    def _rebuild(self, key, C, cols):
+        self.key = key
+        self.C = C
+        self.cols = []
+        self.updates = 0
+        self.rebuilds += 1
+        factor = cholesky_factor(C, cols)
+        self.singular = factor is None
+        if self.singular:
+            return
+        p = len(cols)
+        if p > len(self._d):
+            self._allocate(2 * p)
+        d, R, R_inv = factor
+        self._R[:p, :p] = R
+        self._R_inv[:p, :p] = R_inv
+        self._d[:p] = d
+        self.cols = list(cols)
+
+    def _append(self, col):
+        """Окаймление: R_new = [[R, q], [0, rho]], R'q = a, rho^2 = 1 - q'q."""
+        dc = np.sqrt(self.C[col, col])
+        if not dc > 0:
+            self.singular = True
+            return False
+        p = len(self.cols)
+        R_inv = self._R_inv[:p, :p]
+        q = R_inv.T @ (self.C[self.cols, col] / (self._d[:p] * dc))
+        rho2 = 1.0 - q @ q
+        if rho2 < MIN_CHOLESKY_PIVOT:
+            self.singular = True
+            return False
+        rho = np.sqrt(rho2)
+        self._R_inv[:p, p] = -(R_inv @ q) / rho
+        self._R_inv[p, :p] = 0.0
+        self._R_inv[p, p] = 1.0 / rho
+        self._R[:p, p] = q
+        self._R[p, :p] = 0.0
+        self._R[p, p] = rho
+        self._d[p] = dc
+        self.cols.append(col)
+        self.appends += 1
+        self.updates += 1
+        return True
+
+    def _drop(self, j):
+        """
+        Удаление j-й колонки. Без нее R - верхняя Хессенберга, вращения Q обнуляют поддиагональ;
+        новый R^{-1} - ведущий блок P'R^{-1}Q' (P переносит j-ю колонку в конец).
+        """
+        p = len(self.cols)
+        R, R_inv = self._R, self._R_inv
+        if j < p - 1:
+            R[:p, j:p - 1] = R[:p, j + 1:p]
+            R_inv[j:p - 1, :p] = R_inv[j + 1:p, :p]
+            self._d[j:p - 1] = self._d[j + 1:p]
+            for i in range(j, p - 1):
+                a, b = R[i, i], R[i + 1, i]
+                h = math.hypot(a, b)
+                G = np.array(((a / h, b / h), (-b / h, a / h)))
+                R[i:i + 2, i:p - 1] = G @ R[i:i + 2, i:p - 1]
+                R[i + 1, i] = 0.0
+                R_inv[:p - 1, i:i + 2] = R_inv[:p - 1, i:i + 2] @ G.T
+        del self.cols[j]
+        self.drops += 1
+        self.updates += 1
+
+
+class SpecSample:
+    """Выборка одной спецификации: колонки (в нумерации Z'Z и матрицы лагов), маска строк и число наблюдений."""
+    __slots__ = ("names", "columns", "lag_columns", "skipped", "mask", "key", "n_obs", "target", "engine")
+
+    def __init__(self, names, lag_columns, skipped, mask, target=0, engine=None):
+        self.names = names
+        self.target = target # Номер зависимой переменной в движке, который построил выборку
+        self.engine = engine
+        self.lag_columns = lag_columns
+        self.columns = [FIRST_X_COL + col for col in lag_columns]
+        self.skipped = skipped
+        self.mask = mask
+        self.key = mask.tobytes()
+        self.n_obs = int(mask.sum())
+
+
+class OLSFit:
+    """Результат одной регрессии в виде numpy-массивов (аналог нужных полей RegressionResults)."""
+
+    def __init__(self, engine, sample, include_constant, params):
+        self._engine = engine
+        self._sample = sample
+        self.include_constant = include_constant
+        self.names = (["const"] if include_constant else []) + sample.names
+        self.params = params
+        self.nobs = sample.n_obs
+        self.pvalues = None
+        self.rsquared = self.rsquared_adj = self.aic = self.bic = self.ssr = None
+        self._exog = None
+        self._endog = None
+        self._resid = None
+
+    def set_statistics(self, pvalues, rsquared, rsquared_adj, aic, bic, ssr):
+        self.pvalues = pvalues
+        self.rsquared = rsquared
+        self.rsquared_adj = rsquared_adj
+        self.aic = aic
+        self.bic = bic
+        self.ssr = ssr
+
+    @property
+    def exog(self):
+        if self._exog is None:
+            self._exog = self._engine.exog(self._sample, self.include_constant)
+        return self._exog
+
+    @property
+    def endog(self):
+        if self._endog is None:
+            self._endog = self._engine.targets[self._sample.mask, self._sample.target]
+        return self._endog
+
+    @property
+    def resid(self):
+        if self._resid is None:
+            self._resid = self.endog - self.exog @ self.params
+        return self._resid
+
+    def regressor_gram(self):
+        """Нецентрированная X'X регрессоров (без константы) из кэша перекрестных произведений выборки."""
+        return self._engine.regressor_gram(self._sample)
+
+
+class SufficientStatsOLS:
+    """
+    Движок OLS на матрицах перекрестных произведений поверх общей матрицы лагов (lag_matrix.LagMatrix).
+    y_series - Series или список Series (несколько зависимых переменных), выровненные по тому же
+    индексу, что и матрица лагов.
+    """
+
+    def __init__(self, y_series, lag_matrix, incremental=False):
+        self.lags = lag_matrix
+        y_list = y_series if isinstance(y_series, (list, tuple)) else [y_series]
+        self.targets = np.column_stack([y.to_numpy(dtype=np.float64) for y in y_list])
+        self.targets_valid = ~np.isnan(self.targets)
+        self.y = self.targets[:, 0]
+        self.y_valid = self.targets_valid[:, 0]
+        self._grams = {}
+        # incremental=True: фактор Холецкого переносится между соседними спецификациями
+        # (выгодно при порядке перебора, где соседние модели отличаются одной колонкой)
+        self._factor = IncrementalCholesky() if incremental else None
+        # Без incremental - последний фактор: следующая цель той же спецификации берет его без разложения.
+        # Так же переиспользуются колонки спецификации с маской X и матрица регрессоров (exog)
+        self._last_factor = (None, None)
+        self._last_selection = (None, None)
+        self._last_exog = (None, None)
+
+    @property
+    def factor_stats(self):
+        """Счетчики инкрементального фактора: {'rebuilds', 'appends', 'drops'} или None."""
+        if self._factor is None:
+            return None
+        return {"rebuilds": self._factor.rebuilds, "appends": self._factor.appends, "drops": self._factor.drops}
+
+    def y_column(self, target):
+        """Номер колонки зависимой переменной target в Z'Z."""
+        return Y_COL if target == 0 else FIRST_X_COL + self.lags.values.shape[1] + target - 1
+
+    # --- Выборка и матрица Z'Z для нее ---
+    def sample(self, features_with_lags, target=0):
+        key = tuple(features_with_lags.items())
+        if self._last_selection[0] != key:
+            names, lag_columns, skipped = self.lags.select(features_with_lags)
+            self._last_selection = (key, (names, lag_columns, skipped, self.lags.valid[:, lag_columns].all(axis=1)))
+        names, lag_columns, skipped, x_valid = self._last_selection[1]
+        return SpecSample(names, lag_columns, skipped, self.targets_valid[:, target] & x_valid, target, self)
+
+    def exog(self, sample, include_constant):
+        """Матрица регрессоров спецификации по строкам выборки (с константой - первой колонкой)."""
+        key = (sample.key, tuple(sample.lag_columns), include_constant)
+        if self._last_exog[0] != key:
+            X = self.lags.values[sample.mask][:, sample.lag_columns]
+            if include_constant:
+                X = np.column_stack((np.ones(len(X)), X))
+            self._last_exog = (key, X)
+        return self._last_exog[1]
+
+    def cross_products(self, sample):
+        """
+        Возвращает (средние, центрированная Z'Z) по строкам выборки.
+        Сырая Z'Z не хранится: на рядах-уровнях (значения ~1e6 с малой вариацией)
+        она теряет точность, поэтому модели без константы тоже решаются через
+        центрированную матрицу и средние (X'X = C + n * mu * mu').
+        """
+        stats = self._grams.get(sample.key)
+        if stats is None:
+            if len(self._grams) >= MAX_CACHED_GRAMS:
+                self._grams.clear()
+            # Z = [const, Y, все колонки матрицы лагов, остальные Y]; NaN (в неиспользуемых колонках) -> 0
+            n_lag_columns = self.lags.values.shape[1]
+            Zm = np.empty((sample.n_obs, FIRST_X_COL + n_lag_columns + self.targets.shape[1] - 1))
+            Zm[:, CONST_COL] = 1.0
+            Zm[:, Y_COL] = np.nan_to_num(self.y[sample.mask], nan=0.0)
+            Zm[:, FIRST_X_COL:FIRST_X_COL + n_lag_columns] = np.nan_to_num(self.lags.values[sample.mask], nan=0.0)
+            Zm[:, FIRST_X_COL + n_lag_columns:] = np.nan_to_num(self.targets[sample.mask, 1:], nan=0.0)
+            means = Zm.mean(axis=0)
+            Zc = Zm - means
+            stats = (means, Zc.T @ Zc)
+            self._grams[sample.key] = stats
+        return stats
+
+    def regressor_gram(self, sample):
+        """X'X колонок спецификации по ее выборке: C + n * mu * mu' из кэша, без прохода по данным."""
+        means, C = self.cross_products(sample)
+        cols = sample.columns
+        mu = means[cols]
+        return C[np.ix_(cols, cols)] + sample.n_obs * np.outer(mu, mu)
+
+    # --- Решение одной спецификации ---
+    def _factorize(self, sample, C):
+        """(порядок колонок, масштабы, R, R^{-1}) для под-блока спецификации или None при вырожденности."""
+        if self._factor is None:
+            key = (sample.key, tuple(sample.columns))
+            if self._last_factor[0] != key:
+                self._last_factor = (key, cholesky_factor(C, sample.columns))
+            factor = self._last_factor[1]
+            return None if factor is None else (sample.columns,) + factor
+        if not self._factor.sync(sample.key, C, sample.columns):
+            return None
+        return self._factor.cols, self._factor.d, self._factor.R, self._factor.R_inv
+
+    def fit(self, sample, include_constant):
+        """
+        Возвращает OLSFit или None, если спецификацию надежнее посчитать через statsmodels
+        (нулевая дисперсия колонки, почти вырожденная матрица, идеальная подгонка).
+        """
+        means, C = self.cross_products(sample)
+        cols = sample.columns
+        n = sample.n_obs
+        p = len(cols) + (1 if include_constant else 0)
+        y_col = self.y_column(sample.target)
+        y_mean = means[y_col]
+        centered_tss = C[y_col, y_col]
+        # Как в statsmodels: без константы R2 нецентрированный
+        tss = centered_tss if include_constant else centered_tss + n * y_mean ** 2
+        if not tss > 0:
+            return None
+
+        if cols:
+            factor = self._factorize(sample, C)
+            if factor is None:
+                return None
+            # order - порядок колонок внутри фактора (при инкрементальных обновлениях отличается от cols)
+            order, d, R, R_inv = factor
+            r = C[order, y_col] / d
+            m = means[order] / d
+        else:
+            order = cols
+            d = np.empty(0)
+            R = R_inv = np.empty((0, 0))
+            r = m = np.empty(0)
+
+        # Масштабированная C[order, order] = R'R, ее обратная = R_inv R_inv'
+        if include_constant:
+            z = R_inv.T @ r
+            params_s = R_inv @ z
+            cov_s = np.einsum("ij,ij->i", R_inv, R_inv)
+            ssr = centered_tss - z @ z
+            # Константа восстанавливается из средних: b0 = mean(y) - mean(x)'b
+            v = R_inv.T @ m
+            const = y_mean - m @ params_s
+            const_var = 1.0 / n + v @ v
+        else:
+            # X'X = C + n*m*m' (в масштабированных координатах), обращаем по Шерману-Моррисону
+            u = R_inv @ (R_inv.T @ m)
+            w = R_inv @ (R_inv.T @ (r + n * y_mean * m))
+            s = 1.0 + n * (m @ u)
+            if s > MAX_NOCONST_MEAN_RATIO:
+                # Средние много больше разброса (уровни без константы): точность теряется
+                # порядка eps * s, такие спецификации считаем через statsmodels
+                return None
+            params_s = w - n * u * (m @ w) / s
+            cov_s = np.einsum("ij,ij->i", R_inv, R_inv) - n * u * u / s
+            R_params = R @ params_s
+            ssr = centered_tss - 2 * (params_s @ r) + R_params @ R_params + n * (y_mean - m @ params_s) ** 2
+
+        params = params_s / d
+        cov_diag = cov_s / (d * d)
+        if order != cols:
+            # Возвращаем порядок спецификации
+            position = {col: i for i, col in enumerate(order)}
+            perm = [position[col] for col in cols]
+            params = params[perm]
+            cov_diag = cov_diag[perm]
+        if include_constant:
+            params = np.concatenate(([const], params))
+            cov_diag = np.concatenate(([const_var], cov_diag))
+
+        fit = OLSFit(self, sample, include_constant, params)
+        if ssr <= RSS_RECOMPUTE_RATIO * tss:
+            # Почти идеальная подгонка: разность в формуле RSS неточна, считаем его по остаткам
+            ssr = float(fit.resid @ fit.resid)
+            if not ssr > 0:
+                return None
+
+        df_resid = n - p
+        bse = np.sqrt(ssr / df_resid * cov_diag)
+        pvalues = 2 * stdtr(df_resid, -np.abs(params / bse))
+
+        rsquared = 1 - ssr / tss
+        rsquared_adj = 1 - (n - (1 if include_constant else 0)) / df_resid * (1 - rsquared)
+        llf = -n / 2 * (np.log(2 * np.pi) + np.log(ssr / n) + 1)
+        fit.set_statistics(pvalues, rsquared, rsquared_adj,
+                           aic=-2 * llf + 2 * p, bic=-2 * llf + np.log(n) * p, ssr=ssr)
+        return fit
+
+
+class TargetGroupsOLS:
+    """
+    Несколько зависимых переменных с разными датами: у каждой группы целей с одинаковым индексом своя
+    матрица лагов и свой SufficientStatsOLS - лаги и выборки те же, что в задаче с одной Y.
+    groups - список (движок, номера целей задачи в порядке колонок движка).
+    """
+
+    def __init__(self, groups):
+        self.engines = [engine for engine, _ in groups]
+        self._routes = {target: (engine, local) for engine, targets in groups for local, target in enumerate(targets)}
+
+    @property
+    def factor_stats(self):
+        stats = [engine.factor_stats for engine in self.engines]
+        if stats[0] is None:
+            return None
+        return {key: sum(item[key] for item in stats) for key in stats[0]}
+
+    def sample(self, features_with_lags, target=0):
+        engine, local = self._routes[target]
+        return engine.sample(features_with_lags, local)
+
+    def fit(self, sample, include_constant):
+        return sample.engine.fit(sample, include_constant)
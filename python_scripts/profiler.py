@@ -0,0 +1,151 @@
+# python_scripts/profiler.py
+"""
+Профилирование перебора step3_run_regression_master.py (config.profile).
+
+По стадиям (подготовка данных, матрица лагов, общая выборка, подгонка, метрики, каждый тест, кэш, топ,
+кодирование и запись в stdout, контрольные точки) копятся суммарное время и число вызовов.
+Вместе с пиковым RSS (и tracemalloc по желанию) они уходят в stdout строкой PROFILE:{json}
+раз в intervalSeconds и один раз в конце (final: true), перед FINAL_RESULT.
+
+config.profile = true или словарь:
+  intervalSeconds - как часто отправлять PROFILE (по умолчанию 10 с);
+  tracemalloc     - true или число: снимок tracemalloc, топ мест выделения памяти (по умолчанию 10).
+                    Заметно замедляет перебор и видит только память мастера;
+  cprofile        - путь: cProfile мастера, .prof-файл для pstats/snakeviz.
+Воркеры пула копят время стадий у себя и возвращают его вместе с шардом (drain/absorb) вместе
+со своим пиковым RSS: в записи - максимум по воркерам (worker_peak_rss_mb).
+Без config.profile стадии - общий пустой контекст, перебор не замедляется.
+"""
+import contextlib
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+DEFAULT_INTERVAL_SECONDS = 10
+DEFAULT_TRACEMALLOC_TOP = 10
+PROFILE_PREFIX = "PROFILE:"
+NULL_STAGE = contextlib.nullcontext()
+
+
+def parse_profile_config(value):
+    """config.profile -> словарь настроек или None (профилирование выключено)."""
+    if not value:
+        return None
+    options = value if isinstance(value, dict) else {}
+    tracemalloc_top = options.get('tracemalloc')
+    if tracemalloc_top is True:
+        tracemalloc_top = DEFAULT_TRACEMALLOC_TOP
+    return {"interval_seconds": options.get('intervalSeconds', DEFAULT_INTERVAL_SECONDS),
+            "tracemalloc_top": int(tracemalloc_top or 0),
+            "cprofile": options.get('cprofile')}
+
+
+def peak_rss_mb():
+    # ru_maxrss: килобайты в Linux, байты в macOS; без модуля resource (Windows) - None
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class _Stage:
+    """Контекст одной стадии: переиспользуется для всех вызовов стадии (стадия не вкладывается сама в себя)."""
+    __slots__ = ("totals", "started")
+
+    def __init__(self, totals):
+        self.totals = totals # [секунды, вызовы]
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.totals[0] += time.perf_counter() - self.started
+        self.totals[1] += 1
+
+
+class StageProfiler:
+    def __init__(self, options):
+        self.options = options
+        self.started = time.perf_counter()
+        self.last_emit = self.started
+        self._stages = {} # Имя стадии -> _Stage
+        self._cprofile = None
+        self.worker_peak_rss_mb = None
+
+    def stage(self, name):
+        stage = self._stages.get(name)
+        if stage is None:
+            stage = self._stages[name] = _Stage([0.0, 0])
+        return stage
+
+    def add(self, name, seconds, calls=1):
+        totals = self.stage(name).totals
+        totals[0] += seconds
+        totals[1] += calls
+
+    # --- Передача времени стадий от воркеров пула мастеру ---
+    def drain(self):
+        """Время стадий с прошлого вызова и пиковый RSS процесса (воркер отдает их вместе с шардом)."""
+        stages = {name: tuple(stage.totals) for name, stage in self._stages.items() if stage.totals[1]}
+        for stage in self._stages.values():
+            stage.totals[:] = [0.0, 0]
+        return {"stages": stages, "peak_rss_mb": peak_rss_mb()}
+
+    def absorb(self, pending):
+        for name, (seconds, calls) in pending["stages"].items():
+            self.add(name, seconds, calls)
+        if pending["peak_rss_mb"] is not None:
+            self.worker_peak_rss_mb = max(self.worker_peak_rss_mb or 0, pending["peak_rss_mb"])
+
+    # --- Только мастер ---
+    def start(self):
+        if self.options["tracemalloc_top"] and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.options["cprofile"]:
+            import cProfile
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def due(self):
+        return time.perf_counter() - self.last_emit >= self.options["interval_seconds"]
+
+    def record(self, models_calculated, final=False):
+        """Запись PROFILE: время и доля стадий от прошедшего времени, память."""
+        elapsed = time.perf_counter() - self.started
+        stages = {} # По убыванию времени
+        for name, stage in sorted(self._stages.items(), key=lambda item: -item[1].totals[0]):
+            seconds, calls = stage.totals
+            if calls:
+                stages[name] = {"seconds": round(seconds, 6), "calls": calls,
+                                "share": round(seconds / elapsed, 4) if elapsed > 0 else None}
+        memory = {"peak_rss_mb": peak_rss_mb(), "worker_peak_rss_mb": self.worker_peak_rss_mb}
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            memory["tracemalloc"] = {
+                "current_mb": round(current / 2**20, 2),
+                "peak_mb": round(peak / 2**20, 2),
+                "top": [{"where": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                         "size_mb": round(stat.size / 2**20, 3), "count": stat.count}
+                        for stat in snapshot.statistics("lineno")[:self.options["tracemalloc_top"]]],
+            }
+        self.last_emit = time.perf_counter() # Снимок tracemalloc долгий: интервал отсчитывается от конца записи
+        return {"type": "profile", "final": final, "elapsed_seconds": round(elapsed, 3),
+                "models_calculated": models_calculated,
+                "models_per_second": round(models_calculated / elapsed, 2) if elapsed > 0 else None,
+                "stages": stages, "memory": memory}
+
+    def stop(self):
+        """Выключает tracemalloc и cProfile, .prof-файл пишется по пути config.profile.cprofile."""
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.options["cprofile"])
+            self._cprofile = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
@@ -0,0 +1,94 @@
+# python_scripts/python_worker.py
+"""
+Долгоживущий Python-процесс для server.js: pandas/numpy/statsmodels импортируются один раз,
+а не при каждом запуске get_sheets, step1, step1b, step2_* и step4.
+
+Протокол - строки JSON через stdin/stdout:
+  запрос:  {"id": ..., "script": "<путь к скрипту в python_scripts>", "args": [...], "input": "<stdin скрипта>" | null}
+  ответ:   {"id": ..., "code": <код выхода>, "stdout": "...", "stderr": "..."}
+Скрипт выполняется как __main__ со своими sys.argv/stdin/stdout/stderr - тем же путем, что и при
+отдельном запуске, поэтому вывод совпадает байт в байт. Модуль скрипта каждый раз исполняется
+заново (свежий log_buffer и прочее состояние уровня модуля), кэшируется только скомпилированный код.
+"""
+import io
+import json
+import os
+import sys
+import traceback
+import warnings
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+# Тяжелые зависимости скриптов: импортируются при старте воркера, дальше берутся из sys.modules
+WARM_IMPORTS = ("numpy", "pandas", "statsmodels.api", "openpyxl")
+
+_code_cache = {} # путь -> (mtime, code)
+
+
+def warm_up():
+    for module_name in WARM_IMPORTS:
+        try:
+            __import__(module_name)
+        except ImportError:
+            pass # Не установлен - скрипт, которому он нужен, сообщит об ошибке сам
+
+
+def _compiled(script_path):
+    mtime = os.path.getmtime(script_path)
+    cached = _code_cache.get(script_path)
+    if cached is None or cached[0] != mtime:
+        with open(script_path, encoding="utf-8") as f:
+            cached = (mtime, compile(f.read(), script_path, "exec"))
+        _code_cache[script_path] = cached
+    return cached[1]
+
+
+def run_script(script_path, args, input_text):
+    """Выполняет скрипт как `python script args < input`; возвращает (код выхода, stdout, stderr)."""
+    script_path = os.path.abspath(script_path)
+    if os.path.dirname(script_path) != SCRIPTS_DIR or not script_path.endswith(".py"):
+        return 2, "", f"python_worker: refusing to run '{script_path}' (not in {SCRIPTS_DIR})\n"
+    stdout, stderr = io.StringIO(), io.StringIO()
+    saved = sys.argv, sys.stdin, sys.stdout, sys.stderr
+    saved_filters = warnings.filters[:] # Скрипт может поменять фильтры предупреждений (filterwarnings)
+    sys.argv = [script_path, *[str(arg) for arg in args]]
+    sys.stdin, sys.stdout, sys.stderr = io.StringIO(input_text or ""), stdout, stderr
+    code = 0
+    try:
+        exec(_compiled(script_path), {"__name__": "__main__", "__file__": script_path, "__builtins__": __builtins__})
+    except SystemExit as e:
+        # Как интерпретатор: None -> 0, число -> код, иначе текст в stderr и код 1
+        if e.code is None or isinstance(e.code, int):
+            code = e.code or 0
+        else:
+            print(e.code, file=stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc(file=stderr)
+        code = 1
+    finally:
+        sys.argv, sys.stdin, sys.stdout, sys.stderr = saved
+        warnings.filters[:] = saved_filters
+        warnings._filters_mutated()
+    return code, stdout.getvalue(), stderr.getvalue()
+
+
+def serve(requests, responses):
+    for line in requests:
+        if not line.strip():
+            continue
+        request = {}
+        try:
+            request = json.loads(line)
+            code, out, err = run_script(request["script"], request.get("args", []), request.get("input"))
+            response = {"id": request.get("id"), "code": code, "stdout": out, "stderr": err}
+        except Exception as e:
+            request_id = request.get("id") if isinstance(request, dict) else None
+            response = {"id": request_id, "code": 2, "stdout": "", "stderr": f"python_worker: bad request: {e}\n"}
+        responses.write(json.dumps(response) + "\n")
+        responses.flush()
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, SCRIPTS_DIR) # Скрипты импортируют соседние модули (lag_matrix, json_encoding)
+    warm_up()
+    serve(sys.stdin, sys.stdout)
@@ -0,0 +1,225 @@
+# python_scripts/result_frames.py
+"""
+Колоночный бинарный формат батчей результатов (config.resultFormat = 'columnar').
+
+Вместо PROGRESS_UPDATE:<JSON> мастер печатает PROGRESS_FRAME:<base64 кадра>. Кадр (little-endian):
+  u32 длина заголовка | заголовок JSON | выравнивание до 8 байт | колонки подряд:
+  f64 model_number[n]          - номер из ID m_<номер>[_c|_nc]
+  f64 stats[n, 4]              - rsquared, rsquared_adj, aic, bic
+  f64 metrics[n, M]            - metrics в порядке заголовка
+  f64 coefficients[n, 1 + k]   - const, затем признаки features; NaN - коэффициента нет в модели
+  f64 p_values[n, 1 + k]
+  f64 vif_values[n, k]         - test_results.vif_values по признакам (флаг 4)
+  f64 bp_pvalue[n]             - test_results.bp_pvalue (флаг 5)
+  i32 n_obs[n]
+  u32 regressor_mask[n, W]     - бит j - признак features[j] входит в модель, W = ceil(k / 32)
+  u8  flags[n]                 - биты 0-1 суффикс ID (0 '', 1 '_c', 2 '_nc'), бит 2 константа, бит 3 is_valid,
+                                 бит 4 есть vif_values, бит 5 есть bp_pvalue
+  u8  metric_mask[n]           - бит i - метрика metrics[i] посчитана
+  u8  tests[n, T]              - 0 false, 1 true, 2 null (пропущен при skipTestsAfterFailure), 3 нет ключа
+  u8  lags[n, k]               - лаг признака (если бит маски установлен)
+NaN и inf хранятся как есть; при декодировании становятся null, как в JSON-пути.
+Заголовок: n, features, metrics, tests, служебные поля апдейта (total_calculated, evicted, ...) и
+"other" - результаты, которые в колонки не укладываются (skipped, error, нестандартные ID), как JSON.
+"""
+import base64
+import json
+import re
+import struct
+
+import numpy as np
+
+from json_encoding import dumps
+
+FRAME_PREFIX = "PROGRESS_FRAME:"
+STAT_KEYS = ("rsquared", "rsquared_adj", "aic", "bic")
+ID_SUFFIXES = ("", "_c", "_nc")
+TEST_CODES = {False: 0, True: 1, None: 2} # 3 - ключа нет
+MODEL_ID_PATTERN = re.compile(r"m_(\d+)(_c|_nc)?$")
+MAX_EXACT_MODEL_NUMBER = 2 ** 53 # float64 хранит целые номера точно до 2^53
+VIF_FLAG, BP_FLAG = 16, 32
+
+
+class ResultFrameEncoder:
+    def __init__(self, feature_names, max_lag, metric_keys, test_keys):
+        self.features = list(feature_names)
+        self.k = len(self.features)
+        self.metric_keys = list(metric_keys)
+        self.test_keys = list(test_keys)
+        self.mask_words = max(1, (self.k + 31) // 32)
+        # Имя коэффициента -> (индекс признака, лаг); имена как в LagMatrix.column_name
+        self._columns = {f"{feature}_L{lag}": (j, lag)
+                         for j, feature in enumerate(self.features) for lag in range(max_lag + 1)}
+        self.encodable = self.k > 0 and max_lag <= 255 and len(self.metric_keys) <= 8
+
+    def _row(self, model_id, result):
+        # Разбор одного результата; None - в колонки не укладывается, пойдет в "other"
+        if not self.encodable or result.get("status") != "completed":
+            return None
+        match = MODEL_ID_PATTERN.match(model_id)
+        if match is None or int(match.group(1)) >= MAX_EXACT_MODEL_NUMBER:
+            return None
+        data = result["data"]
+        coefficients, p_values = data["coefficients"], data["p_values"]
+        names = list(coefficients)
+        include_constant = bool(names) and names[0] == "const"
+        regressors = []
+        for name in names[1:] if include_constant else names:
+            if name not in self._columns:
+                return None
+            regressors.append(self._columns[name])
+        # Декодер восстанавливает порядок: const, затем признаки по возрастанию индекса
+        if [j for j, _ in regressors] != sorted({j for j, _ in regressors}) or list(p_values) != names:
+            return None
+        test_results = data.get("test_results", {})
+        skipped = [key for key in self.test_keys if test_results.get(key, False) is None]
+        if set(test_results) - set(self.test_keys) - {"skipped_tests", "vif_values", "bp_pvalue"} \
+                or test_results.get("skipped_tests", []) != skipped:
+            return None
+        if "vif_values" in test_results and list(test_results["vif_values"]) != (names[1:] if include_constant else names):
+            return None
+        if set(data.get("metrics", {})) - set(self.metric_keys):
+            return None
+        return match, include_constant, regressors
+
+    def encode(self, batch_results, header_extra=None):
+        """Кадр батча {model_id: результат} в base64 (без префикса)."""
+        rows, other = [], {}
+        for model_id, result in batch_results.items():
+            parsed = self._row(model_id, result)
+            if parsed is None:
+                other[model_id] = result
+            else:
+                rows.append((parsed, result["data"]))
+        n, k, M, T, W = len(rows), self.k, len(self.metric_keys), len(self.test_keys), self.mask_words
+        model_number = np.empty(n)
+        stats = np.empty((n, len(STAT_KEYS)))
+        metrics = np.full((n, M), np.nan)
+        coefficients = np.full((n, 1 + k), np.nan)
+        p_values = np.full((n, 1 + k), np.nan)
+        vif_values = np.full((n, k), np.nan)
+        bp_pvalue = np.full(n, np.nan)
+        n_obs = np.empty(n, dtype="<i4")
+        regressor_mask = np.zeros((n, W), dtype="<u4")
+        flags = np.zeros(n, dtype=np.uint8)
+        metric_mask = np.zeros(n, dtype=np.uint8)
+        tests = np.full((n, T), 3, dtype=np.uint8)
+        lags = np.zeros((n, k), dtype=np.uint8)
+        for i, ((match, include_constant, regressors), data) in enumerate(rows):
+            model_number[i] = int(match.group(1))
+            flags[i] = ID_SUFFIXES.index(match.group(2) or "") | (include_constant << 2) | (bool(data.get("is_valid")) << 3)
+            stats[i] = [np.nan if data.get(key) is None else data[key] for key in STAT_KEYS]
+            values = list(data["coefficients"].values())
+            pvals = list(data["p_values"].values())
+            if include_constant:
+                coefficients[i, 0], p_values[i, 0] = values[0], pvals[0]
+                values, pvals = values[1:], pvals[1:]
+            for (j, lag), value, pvalue in zip(regressors, values, pvals):
+                coefficients[i, 1 + j] = value
+                p_values[i, 1 + j] = pvalue
+                lags[i, j] = lag
+                regressor_mask[i, j // 32] |= np.uint32(1 << (j % 32))
+            n_obs[i] = data["n_obs"]
+            for m, key in enumerate(self.metric_keys):
+                if key in data.get("metrics", {}):
+                    value = data["metrics"][key]
+                    metrics[i, m] = np.nan if value is None else value
+                    metric_mask[i] |= 1 << m
+            test_results = data.get("test_results", {})
+            for t, key in enumerate(self.test_keys):
+                if key in test_results:
+                    tests[i, t] = TEST_CODES[test_results[key]]
+            if "vif_values" in test_results:
+                flags[i] |= VIF_FLAG
+                for (j, _), value in zip(regressors, test_results["vif_values"].values()):
+                    vif_values[i, j] = np.nan if value is None else value
+            if "bp_pvalue" in test_results:
+                flags[i] |= BP_FLAG
+                bp_pvalue[i] = np.nan if test_results["bp_pvalue"] is None else test_results["bp_pvalue"]
+        header = {"n": n, "features": self.features, "metrics": self.metric_keys, "tests": self.test_keys,
+                  "other": other, **(header_extra or {})}
+        header_bytes = dumps(header).encode("utf-8")
+        padding = b"\0" * (-(4 + len(header_bytes)) % 8)
+        columns = [model_number, stats, metrics, coefficients, p_values, vif_values, bp_pvalue, n_obs, regressor_mask,
+                   flags, metric_mask, tests, lags]
+        frame = b"".join([struct.pack("<I", len(header_bytes)), header_bytes, padding]
+                         + [np.ascontiguousarray(column).astype(column.dtype.newbyteorder("<"), copy=False).tobytes()
+                            for column in columns])
+        return base64.b64encode(frame).decode("ascii")
+
+
+def _json_value(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def decode_frame(encoded):
+    """Кадр (base64) -> апдейт в том же виде, что и PROGRESS_UPDATE: {"processed_batch": {...}, ...}."""
+    frame = base64.b64decode(encoded)
+    header_len = struct.unpack_from("<I", frame)[0]
+    header = json.loads(frame[4:4 + header_len].decode("utf-8"))
+    offset = 4 + header_len
+    offset += -offset % 8
+    n, features, metric_keys, test_keys = header["n"], header["features"], header["metrics"], header["tests"]
+    k = len(features)
+    W = max(1, (k + 31) // 32)
+
+    def take(dtype, *shape):
+        nonlocal offset
+        array = np.frombuffer(frame, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+        offset += array.nbytes
+        return array
+
+    model_number = take("<f8", n)
+    stats = take("<f8", n, len(STAT_KEYS))
+    metrics = take("<f8", n, len(metric_keys))
+    coefficients = take("<f8", n, 1 + k)
+    p_values = take("<f8", n, 1 + k)
+    vif_values = take("<f8", n, k)
+    bp_pvalue = take("<f8", n)
+    n_obs = take("<i4", n)
+    regressor_mask = take("<u4", n, W)
+    flags = take("u1", n)
+    metric_mask = take("u1", n)
+    tests = take("u1", n, len(test_keys))
+    lags = take("u1", n, k)
+
+    test_values = {0: False, 1: True, 2: None}
+    batch = {}
+    for i in range(n):
+        names, columns, features_in = [], [], []
+        if flags[i] & 4:
+            names.append("const")
+            columns.append(0)
+        for j in range(k):
+            if regressor_mask[i, j // 32] >> (j % 32) & 1:
+                names.append(f"{features[j]}_L{lags[i, j]}")
+                columns.append(1 + j)
+                features_in.append(j)
+        data = {
+            "coefficients": {name: _json_value(coefficients[i, c]) for name, c in zip(names, columns)},
+            "p_values": {name: _json_value(p_values[i, c]) for name, c in zip(names, columns)},
+            "n_obs": int(n_obs[i]),
+            **{key: _json_value(stats[i, s]) for s, key in enumerate(STAT_KEYS)},
+            "metrics": {key: _json_value(metrics[i, m]) for m, key in enumerate(metric_keys) if metric_mask[i] >> m & 1},
+            "test_results": {},
+            "is_valid": bool(flags[i] & 8),
+        }
+        test_results = data["test_results"]
+        for t, key in enumerate(test_keys):
+            if tests[i, t] != 3:
+                test_results[key] = test_values[tests[i, t]]
+            # Детали теста идут сразу за его флагом, как в run_single_ols
+            if key == "vif_ok" and flags[i] & VIF_FLAG:
+                regressor_names = names[1:] if flags[i] & 4 else names
+                test_results["vif_values"] = {name: _json_value(vif_values[i, j]) for name, j in zip(regressor_names, features_in)}
+            if key == "heteroskedasticity_ok" and flags[i] & BP_FLAG:
+                test_results["bp_pvalue"] = _json_value(bp_pvalue[i])
+        skipped = [key for t, key in enumerate(test_keys) if tests[i, t] == 2]
+        if skipped:
+            data["test_results"]["skipped_tests"] = skipped
+        batch[f"m_{int(model_number[i])}{ID_SUFFIXES[flags[i] & 3]}"] = {"status": "completed", "data": data}
+    batch.update(header.pop("other"))
+    for key in ("n", "features", "metrics", "tests"):
+        header.pop(key)
+    return {**header, "processed_batch": batch}
@@ -0,0 +1,233 @@
+# python_scripts/result_store.py
+"""
+Хранилище результатов перебора на диске (SQLite) с запросами по страницам.
+
+config.resultStore = путь к файлу базы: step3_run_regression_master.py пишет туда каждый батч
+результатов одной транзакцией и не отправляет сами результаты в Node (в PROGRESS_UPDATE только
+счетчики). Node получает нужную страницу через query_results() - этот же скрипт, запущенный с JSON
+запроса на stdin, - поэтому опрос стоит O(страницы), а результаты переживают перезапуск сервера.
+
+Таблица models: одна строка на модель, ключ - номер модели из ID m_<номер>[_c|_nc] (номер в
+каноническом порядке SpecSpace, по нему же восстанавливаются регрессоры и лаги). Индексы - по
+статусу, валидности, константе, набору регрессоров и всем колонкам сортировки.
+Таблица meta: сведения о задаче (признаки, статус, счетчики, сводки top_k/search), значения в JSON.
+При нескольких зависимых переменных у каждой свой файл (target_store_path), имя цели - в meta.target.
+"""
+import io
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+import traceback
+from urllib.parse import quote
+
+log_buffer = io.StringIO()
+def log_error(message): print(f"ERROR_STORE: {message}", file=log_buffer)
+def log_info(message): print(f"INFO_STORE: {message}", file=log_buffer)
+
+MODEL_ID_PATTERN = re.compile(r"m_(\d+)(_c|_nc)?$")
+STAT_COLUMNS = ("n_obs", "rsquared", "rsquared_adj", "aic", "bic")
+METRIC_COLUMNS = ("mae", "mape", "rmse")
+# Колонки, по которым можно сортировать и задавать диапазоны (у каждой свой индекс)
+SORT_COLUMNS = ("model_number", "n_regressors") + STAT_COLUMNS + METRIC_COLUMNS
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    model_number     INTEGER PRIMARY KEY,
+    model_id         TEXT NOT NULL UNIQUE,
+    status           TEXT NOT NULL,
+    regressors       TEXT NOT NULL, -- JSON-список признаков в порядке features
+    n_regressors     INTEGER NOT NULL,
+    lags             TEXT NOT NULL, -- JSON {признак: лаг}
+    include_constant INTEGER NOT NULL,
+    is_valid         INTEGER,
+    n_obs INTEGER, rsquared REAL, rsquared_adj REAL, aic REAL, bic REAL,
+    mae REAL, mape REAL, rmse REAL,
+    result           TEXT NOT NULL  -- результат целиком, как в processed_batch
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_models_status ON models(status);
+CREATE INDEX IF NOT EXISTS idx_models_is_valid ON models(is_valid);
+CREATE INDEX IF NOT EXISTS idx_models_include_constant ON models(include_constant);
+CREATE INDEX IF NOT EXISTS idx_models_regressors ON models(regressors);
+""" + "".join(f"CREATE INDEX IF NOT EXISTS idx_models_{column} ON models({column});\n"
+              for column in SORT_COLUMNS if column != "model_number")
+
+
+def target_store_path(path, target_index):
+    """Файл хранилища зависимой переменной с номером target_index: <путь без расширения>.t<номер><расширение>."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.t{target_index}{ext}"
+
+
+def _dumps(value):
+    # json_encoding тянет numpy/pandas: нужен только при записи (мастер их уже импортировал), не в запросах
+    from json_encoding import dumps
+    return dumps(value)
+
+
+def _real(value):
+    # NaN -> NULL (в SQLite NaN не сравнивается); inf оставляем - при сортировке он в конце
+    return None if value is None or value != value else value
+
+
+class ResultStore:
+    """
+    Запись результатов одной задачи; space - полное SpecSpace перебора (ID -> регрессоры и лаги),
+    target - имя зависимой переменной, если их в задаче несколько.
+    """
+
+    def __init__(self, path, space, fresh=True, target=None):
+        self.path = path
+        self.space = space
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        # WAL: запросы Node читают базу параллельно с записью мастера
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            self._connection.executescript(SCHEMA)
+            if fresh:
+                self._connection.execute("DELETE FROM models")
+                self._connection.execute("DELETE FROM meta")
+            self._set_meta(features=space.regressor_names, max_lag=space.max_lag,
+                           constant_status=space.constant_status, status="running")
+            if target is not None:
+                self._set_meta(target=target)
+
+    def _row(self, model_id, result):
+        match = MODEL_ID_PATTERN.match(model_id)
+        if match is None:
+            raise ValueError(f"Cannot store model '{model_id}': not a canonical model ID")
+        model_number = int(match.group(1))
+        spec = self.space.unrank(model_number - 1)
+        if spec["model_id"] != model_id:
+            raise ValueError(f"Model ID '{model_id}' does not match the search space (expected '{spec['model_id']}')")
+        regressors = spec["regressors"]
+        data = result.get("data") or {}
+        metrics = data.get("metrics", {})
+        is_valid = data.get("is_valid")
+        return ((model_number, model_id, result.get("status", "error"), json.dumps(list(regressors)), len(regressors),
+                 json.dumps(regressors), int(spec["include_constant"]), None if is_valid is None else int(is_valid))
+                + tuple(_real(data.get(column)) for column in STAT_COLUMNS)
+                + tuple(_real(metrics.get(column)) for column in METRIC_COLUMNS)
+                + (_dumps(result),))
+
+    def _set_meta(self, **values):
+        self._connection.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                     [(key, _dumps(value)) for key, value in values.items()])
+
+    def write_batch(self, batch_results, evicted=(), **job_state):
+        """Батч {model_id: результат} и ID вытесненных из топа моделей - одной транзакцией, вместе со счетчиками."""
+        rows = [self._row(model_id, result) for model_id, result in batch_results.items()]
+        with self._connection:
+            # Повторная запись той же модели (продолжение с контрольной точки) просто заменяет строку
+            if rows:
+                self._connection.executemany(f"INSERT OR REPLACE INTO models VALUES ({', '.join('?' * len(rows[0]))})", rows)
+            if evicted:
+                self._connection.executemany("DELETE FROM models WHERE model_id = ?", [(model_id,) for model_id in evicted])
+            self._set_meta(updated_at=time.time(), **job_state)
+
+    def finish(self, **job_state):
+        """Итоговые статус и сводки задачи; соединение закрывается."""
+        with self._connection:
+            self._set_meta(updated_at=time.time(), **job_state)
+        self._connection.close()
+
+
+# --- Запросы ---
+def _build_where(filters):
+    clauses, params = [], []
+    if filters.get("status") is not None:
+        clauses.append("status = ?")
+        params.append(filters["status"])
+    for key, column in (("isValid", "is_valid"), ("includeConstant", "include_constant")):
+        if filters.get(key) is not None:
+            clauses.append(f"{column} = ?")
+            params.append(int(bool(filters[key])))
+    if filters.get("regressors") is not None:
+        # Точный набор: сравниваем с тем же JSON, что пишет ResultStore (порядок признаков - как в features)
+        clauses.append("regressors = ?")
+        params.append(json.dumps(filters["regressors"]))
+    for name in filters.get("includes", []):
+        clauses.append("EXISTS (SELECT 1 FROM json_each(models.regressors) WHERE value = ?)")
+        params.append(name)
+    for name in filters.get("excludes", []):
+        clauses.append("NOT EXISTS (SELECT 1 FROM json_each(models.regressors) WHERE value = ?)")
+        params.append(name)
+    for name, lag in filters.get("lags", {}).items():
+        clauses.append("EXISTS (SELECT 1 FROM json_each(models.lags) WHERE key = ? AND value = ?)")
+        params.extend([name, int(lag)])
+    for key, operator in (("minRegressors", ">="), ("maxRegressors", "<=")):
+        if filters.get(key) is not None:
+            clauses.append(f"n_regressors {operator} ?")
+            params.append(int(filters[key]))
+    for column, bounds in filters.get("ranges", {}).items():
+        if column not in SORT_COLUMNS:
+            raise ValueError(f"Unknown range column '{column}', expected one of {SORT_COLUMNS}")
+        for key, operator in (("min", ">="), ("max", "<=")):
+            if bounds.get(key) is not None:
+                clauses.append(f"{column} {operator} ?")
+                params.append(bounds[key])
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def query_results(path, filters=None, sort_by="model_number", descending=False, limit=DEFAULT_PAGE_SIZE, offset=0):
+    """
+    Страница результатов: {"total": число подходящих моделей, "results": {model_id: результат}, "job": meta}.
+    Модели без значения колонки сортировки (NULL) идут в конце при любом направлении.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Result store not found: {path}")
+    if sort_by not in SORT_COLUMNS:
+        raise ValueError(f"Unknown sortBy '{sort_by}', expected one of {SORT_COLUMNS}")
+    limit = min(max(0, int(limit)), MAX_PAGE_SIZE)
+    offset = max(0, int(offset))
+    where, params = _build_where(filters or {})
+    direction = "DESC" if descending else "ASC"
+    connection = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True)
+    try:
+        total = connection.execute(f"SELECT COUNT(*) FROM models{where}", params).fetchone()[0]
+        # Второй ключ - номер модели (rowid): индекс колонки уже упорядочен по нему, отдельной сортировки нет
+        rows = connection.execute(
+            f"SELECT model_id, result FROM models{where} ORDER BY {sort_by} {direction} NULLS LAST, model_number {direction} "
+            f"LIMIT ? OFFSET ?", params + [limit, offset]).fetchall()
+        meta = {key: json.loads(value) for key, value in connection.execute("SELECT key, value FROM meta")}
+    finally:
+        connection.close()
+    return {"total": total, "offset": offset, "limit": limit, "sortBy": sort_by, "descending": descending,
+            "results": {model_id: json.loads(result) for model_id, result in rows}, "job": meta}
+
+
+def run_query(input_json_str):
+    try:
+        request = json.loads(input_json_str)
+        if not request.get("store"):
+            return json.dumps({"error": "Invalid input: 'store' path missing."})
+        log_info(f"Querying {request['store']}: filters={request.get('filters')}, sortBy={request.get('sortBy')}")
+        page = query_results(request["store"], request.get("filters"), request.get("sortBy", "model_number"),
+                             bool(request.get("descending", False)), request.get("limit", DEFAULT_PAGE_SIZE),
+                             request.get("offset", 0))
+        log_info(f"Returned {len(page['results'])} of {page['total']} matching models")
+        # Результаты уже очищены от NaN при записи; meta тоже
+        return json.dumps(page)
+    except json.JSONDecodeError: return json.dumps({"error": "Invalid JSON input."})
+    except (ValueError, FileNotFoundError, sqlite3.Error) as e:
+        log_error(str(e))
+        return json.dumps({"error": str(e)})
+    except Exception as e:
+        log_error(f"Unexpected error: {str(e)}")
+        traceback.print_exc(file=log_buffer)
+        return json.dumps({"error": f"An unexpected error occurred: {str(e)}"})
+
+
+if __name__ == "__main__":
+    input_json = sys.stdin.read()
+    result = run_query(input_json)
+    sys.stderr.write(log_buffer.getvalue()) # Вывод логов в stderr
+    print(result) # Вывод результата (JSON) в stdout
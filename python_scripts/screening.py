@@ -0,0 +1,191 @@
+# python_scripts/screening.py
+"""
+Предварительный отбор колонок перед перебором (config.screening): путь elastic net (LASSO при
+l1Ratio = 1) координатным спуском по всей матрице лагов, в перебор идут только лучшие колонки.
+
+  - строки, где определена Y; колонки стандартизуются по своим наблюдениям, пропуски (начало рядов
+    и лаги) заменяются средним - нулем после стандартизации, поэтому выборка не сужается до общей;
+  - путь по lambda от lambda_max (все коэффициенты нулевые) вниз по геометрической сетке, с теплым
+    стартом; координатный спуск по матрице Грама (ковариационные обновления, как в glmnet) с активным
+    множеством. Путь останавливается, как только ненулевыми побывали maxColumns колонок;
+  - ранг колонки - lambda, при которой она вошла в модель (раньше - выше), при равенстве - |коэффициент|.
+При нескольких Y отбор по каждой цели (на ее матрице лагов), в перебор идет объединение.
+
+Перебор сужается до самих отобранных колонок: у каждого отобранного признака - только его отобранные
+лаги (SpecSpace.restrict), ID моделей - как в полном пространстве (все признаки, лаги до maxLagDepth).
+Отчет (отобранные колонки, путь, время) уходит в stdout строкой SCREENING:{json} до результатов.
+
+config.screening = true или словарь:
+  maxColumns     - сколько колонок (признак x лаг) оставить (по умолчанию 12);
+  l1Ratio        - доля L1 в штрафе, (0, 1] (по умолчанию 1 - LASSO);
+  nLambdas       - точек пути (по умолчанию 100), lambdaMinRatio - lambda_min / lambda_max (1e-3);
+  tol, maxIter   - сходимость координатного спуска на одной lambda.
+"""
+import time
+
+import numpy as np
+
+SCREENING_PREFIX = "SCREENING:"
+DEFAULT_MAX_COLUMNS = 12
+DEFAULT_N_LAMBDAS = 100
+DEFAULT_LAMBDA_MIN_RATIO = 1e-3
+DEFAULT_TOL = 1e-7
+DEFAULT_MAX_ITER = 1000
+
+
+def parse_screening_config(value):
+    """config.screening -> словарь настроек или None (отбор выключен)."""
+    if not value:
+        return None
+    options = value if isinstance(value, dict) else {}
+    parsed = {"max_columns": int(options.get('maxColumns', DEFAULT_MAX_COLUMNS)),
+              "l1_ratio": float(options.get('l1Ratio', 1.0)),
+              "n_lambdas": int(options.get('nLambdas', DEFAULT_N_LAMBDAS)),
+              "lambda_min_ratio": float(options.get('lambdaMinRatio', DEFAULT_LAMBDA_MIN_RATIO)),
+              "tol": float(options.get('tol', DEFAULT_TOL)),
+              "max_iter": int(options.get('maxIter', DEFAULT_MAX_ITER))}
+    if parsed["max_columns"] < 1:
+        raise ValueError(f"screening.maxColumns must be at least 1, got {parsed['max_columns']}")
+    if not 0 < parsed["l1_ratio"] <= 1:
+        raise ValueError(f"screening.l1Ratio must be in (0, 1], got {parsed['l1_ratio']}")
+    if parsed["n_lambdas"] < 2 or not 0 < parsed["lambda_min_ratio"] < 1:
+        raise ValueError("screening.nLambdas must be at least 2 and screening.lambdaMinRatio in (0, 1)")
+    return parsed
+
+
+def standardized_design(y_series, lag_matrix):
+    """(X, y) по строкам с Y: колонки с нулевым средним и единичной дисперсией по своим наблюдениям, пропуски - 0."""
+    y = y_series.to_numpy(dtype=np.float64)
+    rows = ~np.isnan(y)
+    X = lag_matrix.values[rows]
+    valid = lag_matrix.valid[rows]
+    n_valid = valid.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(valid, X, 0.0).sum(axis=0) / n_valid
+        centered = np.where(valid, X - mean, 0.0)
+        scale = np.sqrt((centered ** 2).sum(axis=0) / n_valid)
+        X = centered / scale
+    X[:, ~(scale > 0)] = 0.0 # Колонки без наблюдений или постоянные в отбор не попадут
+    y = y[rows]
+    y = (y - y.mean()) / (y.std() or 1.0)
+    return X, y
+
+
+def elastic_net_path(gram, xy, options):
+    """
+    Путь elastic net по матрице Грама gram = X'X/n и xy = X'y/n (стандартизованные данные).
+    Возвращает (точки пути, номер точки входа колонки или -1, |коэффициент| в точке входа).
+    """
+    alpha, max_columns, tol, max_iter = options["l1_ratio"], options["max_columns"], options["tol"], options["max_iter"]
+    p = len(xy)
+    diag = np.diag(gram).tolist()
+    usable = np.diag(gram) > 0
+    lambda_max = np.abs(xy).max() / alpha if p else 0.0
+    if lambda_max <= 0:
+        return [], np.full(p, -1), np.zeros(p)
+    lambdas = lambda_max * options["lambda_min_ratio"] ** (np.arange(options["n_lambdas"]) / (options["n_lambdas"] - 1))
+    beta = np.zeros(p)
+    gradient = xy.copy() # xy - gram @ beta
+    entered_at = np.full(p, -1)
+    entry_size = np.zeros(p)
+    path = []
+
+    def sweep(columns, lam):
+        max_change = 0.0
+        threshold, ridge = lam * alpha, lam * (1 - alpha)
+        for j in columns:
+            old = float(beta[j])
+            z = float(gradient[j]) + diag[j] * old
+            # Мягкий порог
+            new = (z - threshold if z > threshold else z + threshold if z < -threshold else 0.0) / (diag[j] + ridge)
+            if new != old:
+                gradient[:] -= gram[j] * (new - old) # gram симметрична: строка вместо колонки
+                beta[j] = new
+                max_change = max(max_change, abs(new - old))
+        return max_change
+
+    all_columns = np.flatnonzero(usable).tolist()
+    for point, lam in enumerate(lambdas):
+        sweeps = 0
+        converged = False
+        # Полный проход, затем проходы по активному множеству до сходимости, затем проверка полным проходом
+        while sweeps < max_iter:
+            sweeps += 1
+            if sweep(all_columns, lam) < tol:
+                converged = True
+                break
+            active = np.flatnonzero(beta).tolist()
+            while sweeps < max_iter:
+                sweeps += 1
+                if sweep(active, lam) < tol:
+                    break
+        entered = np.flatnonzero((beta != 0) & (entered_at < 0))
+        entered_at[entered] = point
+        entry_size[entered] = np.abs(beta[entered])
+        # converged = false: maxIter проходов не хватило (сильно коррелированные колонки при малых lambda)
+        path.append({"lambda": float(lam), "active": int(np.count_nonzero(beta)), "sweeps": sweeps,
+                     "converged": converged, "entered": entered.tolist()})
+        if np.count_nonzero(entered_at >= 0) >= max_columns:
+            break
+    return path, entered_at, entry_size
+
+
+def screen_target(y_series, lag_matrix, options):
+    """Отбор для одной Y: номера колонок по рангу (не больше maxColumns), путь и время стадий."""
+    started = time.perf_counter()
+    X, y = standardized_design(y_series, lag_matrix)
+    n_obs = len(y)
+    if n_obs < 3:
+        raise ValueError(f"Screening of '{y_series.name}': not enough observations ({n_obs}).")
+    gram = X.T @ X / n_obs
+    xy = X.T @ y / n_obs
+    prepared = time.perf_counter()
+    path, entered_at, entry_size = elastic_net_path(gram, xy, options)
+    finished = time.perf_counter()
+    candidates = np.flatnonzero(entered_at >= 0)
+    ranked = sorted(candidates.tolist(), key=lambda col: (entered_at[col], -entry_size[col]))[:options["max_columns"]]
+    names = lag_matrix.column_names
+    return {"n_obs": n_obs,
+            "columns": ranked,
+            "path": [{**point, "entered": [names[col] for col in point["entered"]]} for point in path],
+            "timings": {"prepare_seconds": round(prepared - started, 4), "path_seconds": round(finished - prepared, 4)}}
+
+
+def run_screening(y_targets, lag_matrices, options):
+    """
+    Отбор по всем Y (lag_matrices - матрицы лагов целей): отчет SCREENING (без полей пространства перебора -
+    их добавляет мастер) и отобранные лаги {признак: лаги} в порядке исходных данных.
+    """
+    lag_matrix = lag_matrices[0] # Колонки у матриц всех целей одни и те же
+    n_lags = lag_matrix.max_lag + 1
+    names = lag_matrix.column_names
+    per_target = [screen_target(y_series, matrix, options) for y_series, matrix in zip(y_targets, lag_matrices)]
+    selected = {} # Колонка -> цели, которые ее отобрали (порядок - по рангу у первой цели)
+    for y_series, target in zip(y_targets, per_target):
+        for col in target["columns"]:
+            selected.setdefault(col, []).append(y_series.name)
+    if not selected:
+        raise ValueError("Screening selected no columns: no regressor is correlated with the dependent variable.")
+    allowed_lags = {feature: sorted(col % n_lags for col in selected if col // n_lags == index)
+                    for index, feature in enumerate(lag_matrix.feature_names)}
+    allowed_lags = {feature: lags for feature, lags in allowed_lags.items() if lags}
+    report = {
+        "type": "screening",
+        "method": "lasso" if options["l1_ratio"] == 1 else "elastic_net",
+        "l1_ratio": options["l1_ratio"],
+        "max_columns": options["max_columns"],
+        "columns_total": len(names),
+        "selected": [{"column": names[col], "feature": lag_matrix.feature_names[col // n_lags], "lag": col % n_lags,
+                      **({"targets": targets} if len(y_targets) > 1 else {})} for col, targets in selected.items()],
+        "features": list(allowed_lags),
+        "lags": allowed_lags,
+        "max_lag": max(map(max, allowed_lags.values())),
+    }
+    if len(y_targets) > 1:
+        report["targets"] = {y_series.name: {"n_obs": target["n_obs"], "selected": [names[col] for col in target["columns"]],
+                                             "path": target["path"], "timings": target["timings"]}
+                             for y_series, target in zip(y_targets, per_target)}
+    else:
+        target = per_target[0]
+        report.update(n_obs=target["n_obs"], path=target["path"], timings=target["timings"])
+    return report, allowed_lags
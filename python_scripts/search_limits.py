@@ -0,0 +1,69 @@
+# python_scripts/search_limits.py
+"""
+Лимиты перебора step3_run_regression_master.py: мастер проверяет их между моделями и завершает
+перебор штатно - FINAL_RESULT со status 'finished', truncated: true и долей посчитанного (coverage).
+
+  config.timeBudgetSeconds - время работы мастера (с запуска процесса, отдельно для каждого запуска);
+  config.maxModels         - число посчитанных моделей (вместе с префиксом контрольной точки);
+  config.stopAfterValid    - число валидных моделей (при нескольких Y - у каждой цели).
+
+С лимитами порядок перебора по умолчанию - 'promising' (spec_priority.py). Лимиты не входят в сигнатуру
+контрольной точки: остановленный перебор можно продолжить (payload.resume) с большими лимитами, а без
+лимитов - с явным config.specOrder = 'promising' (иначе порядок по умолчанию другой).
+"""
+import time
+
+LIMIT_KEYS = ("timeBudgetSeconds", "maxModels", "stopAfterValid")
+
+
+def parse_search_limits(config):
+    """Лимиты из config или None, если ни один не задан."""
+    limits = {key: config.get(key) for key in LIMIT_KEYS if config.get(key) is not None}
+    if not limits:
+        return None
+    for key, value in limits.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+            raise ValueError(f"config.{key} must be a positive number, got {value!r}")
+    return limits
+
+
+class SearchBudget:
+    def __init__(self, limits, started, target_names):
+        self.limits = limits
+        time_budget = limits.get("timeBudgetSeconds")
+        self.deadline = started + time_budget if time_budget is not None else None
+        self.max_models = limits.get("maxModels")
+        self.stop_after_valid = limits.get("stopAfterValid")
+        self.target_names = list(target_names)
+        self.valid = [0] * len(self.target_names) # Валидных моделей по номеру цели
+        self.stop_reason = None
+
+    def count(self, results):
+        for target, result in enumerate(results):
+            if result.get("status") == "completed" and result["data"].get("is_valid"):
+                self.valid[target] += 1
+
+    def exhausted(self, total_calculated, total_models):
+        """Пора остановиться (причина - в stop_reason); после последней модели - нет, перебор и так закончен."""
+        if total_calculated >= total_models:
+            return False
+        if self.max_models is not None and total_calculated >= self.max_models:
+            self.stop_reason = "max_models"
+        elif self.stop_after_valid is not None and min(self.valid) >= self.stop_after_valid:
+            self.stop_reason = "stop_after_valid"
+        elif self.deadline is not None and time.time() >= self.deadline:
+            self.stop_reason = "time_budget"
+        return self.stop_reason is not None
+
+    def summary(self):
+        return {"time_budget_seconds": self.limits.get("timeBudgetSeconds"), "max_models": self.max_models,
+                "stop_after_valid": self.stop_after_valid, "stop_reason": self.stop_reason,
+                # При нескольких Y - {имя Y: число}
+                "valid_models": dict(zip(self.target_names, self.valid)) if len(self.valid) > 1 else self.valid[0]}
+
+    # --- Контрольные точки (checkpoint.py) ---
+    def state(self):
+        return {"valid": list(self.valid)}
+
+    def restore(self, state):
+        self.valid = list(state["valid"])
@@ -0,0 +1,253 @@
+# python_scripts/spec_enumerator.py
+"""
+Пространство спецификаций перебора step3_run_regression_master.py.
+
+Канонический порядок (от него зависят ID моделей m_<номер>[_c|_nc]):
+размер подмножества m = 0..k -> подмножества в порядке itertools.combinations ->
+кортежи лагов в порядке itertools.product(range(N+1), repeat=m) -> варианты константы.
+SpecSpace считает размер пространства в замкнутой форме, переводит номер спецификации
+в спецификацию и обратно (ранжирование) и выбирает случайные спецификации равномерно.
+
+SpecSpace.restrict (config.screening) сужает перебор до части признаков, у каждого - свой набор лагов.
+Суженный порядок - подпоследовательность канонического: позиции (перебор, части, выборка) идут по
+суженному пространству, а ID моделей - те же, что у этих спецификаций в полном пространстве.
+"""
+import itertools
+import random
+
+
+def constant_variants(constant_status, m):
+    # Варианты константы для одной комбинации лагов: (суффикс ID, include_constant)
+    if constant_status == 'include':
+        return [("", True)]
+    if constant_status == 'exclude':
+        return [("", False)] if m > 0 else [] # Не запускаем модель без регрессоров и без константы
+    # constant_status == 'test': модель без регрессоров тестировать на константу нет смысла
+    return [("_c", True), ("_nc", False)] if m > 0 else [("_c", True)]
+
+
+def gray_lag_tuples(lag_lists):
+    # Отраженный код Грея (смешанное основание - свои лаги у каждого регрессора): соседние кортежи лагов
+    # отличаются одной позицией на соседний лаг, т.е. соседние спецификации - заменой одной колонки матрицы лагов
+    if not lag_lists:
+        yield ()
+        return
+    forward = True
+    for prefix in gray_lag_tuples(lag_lists[:-1]):
+        for lag in (lag_lists[-1] if forward else reversed(lag_lists[-1])):
+            yield prefix + (lag,)
+        forward = not forward
+
+
+class SpecSpace:
+    def __init__(self, regressor_names, max_lag, constant_status, feature_lags=None, id_space=None):
+        """
+        feature_lags - лаги каждого регрессора (по умолчанию 0..max_lag у всех), id_space - полное
+        пространство, в котором считаются ID моделей (None - само это пространство; см. restrict).
+        """
+        self.regressor_names = list(regressor_names)
+        self.k = len(self.regressor_names)
+        self.max_lag = max_lag
+        self.n_lags = max_lag + 1
+        self.constant_status = constant_status
+        self.feature_lags = [list(range(self.n_lags))] * self.k if feature_lags is None else [sorted(lags) for lags in feature_lags]
+        self.id_space = self if id_space is None else id_space
+        # Номер признака в полном пространстве (для ID)
+        self._id_features = [self.id_space.regressor_names.index(name) for name in self.regressor_names]
+        self._lag_positions = [{lag: pos for pos, lag in enumerate(lags)} for lags in self.feature_lags]
+        self._weights = weights = [len(lags) for lags in self.feature_lags]
+        # _suffix_counts[j][r] - число пар (подмножество признаков j..k-1 размера r, кортеж их лагов):
+        # элементарный симметрический многочлен от числа лагов; при N+1 лагах у всех - C(k-j, r) (N+1)^r
+        self._suffix_counts = [[1] + [0] * self.k for _ in range(self.k + 1)]
+        for j in range(self.k - 1, -1, -1):
+            for r in range(1, self.k - j + 1):
+                self._suffix_counts[j][r] = self._suffix_counts[j + 1][r] + weights[j] * self._suffix_counts[j + 1][r - 1]
+        # Блок m - все спецификации с m регрессорами: _suffix_counts[0][m] * число вариантов константы
+        self._variants = [constant_variants(constant_status, m) for m in range(self.k + 1)]
+        self._block_starts = []
+        start = 0
+        for m in range(self.k + 1):
+            self._block_starts.append(start)
+            start += self._suffix_counts[0][m] * len(self._variants[m])
+
+    def restrict(self, allowed_lags):
+        """
+        Суженное пространство: только признаки allowed_lags ({имя: лаги}, в порядке этого пространства)
+        со своими лагами. ID моделей - как в этом (полном) пространстве.
+        """
+        names = [name for name in self.regressor_names if allowed_lags.get(name)]
+        return SpecSpace(names, max(max(allowed_lags[name]) for name in names), self.constant_status,
+                         [allowed_lags[name] for name in names], self.id_space)
+
+    def count(self):
+        """Число спецификаций: sum_m e_m = prod(1 + лагов признака) (при N+1 лагах - (N+2)^k), минус/плюс модели без регрессоров."""
+        total = 1
+        for weight in self._weights:
+            total *= 1 + weight
+        if self.constant_status == 'include':
+            return total
+        if self.constant_status == 'exclude':
+            return total - 1
+        return 2 * total - 1
+
+    def _spec(self, model_number, subset_indices, lags, suffix, include_constant):
+        return {"model_id": f"m_{model_number}{suffix}",
+                "regressors": {self.regressor_names[i]: lag for i, lag in zip(subset_indices, lags)},
+                "include_constant": include_constant}
+
+    def _first_id_number(self, subset_indices, lags, position):
+        # Номер ID первого варианта константы; position - его номер в этом пространстве (с 0)
+        if self.id_space is self:
+            return position + 1
+        variants = self._variants[len(subset_indices)]
+        return self.id_space.rank([self._id_features[i] for i in subset_indices], lags, variants[0][1]) + 1
+
+    # --- Перебор ---
+    def _iter_all(self, order):
+        # order='gray' меняет только порядок выдачи внутри подмножества регрессоров;
+        # номера моделей считаются по каноническому порядку (product лагов), поэтому ID те же
+        for m in range(self.k + 1): # Размер подмножества регрессоров
+            variants = self._variants[m]
+            if not variants:
+                continue
+            model_counter = self._block_starts[m] # Сколько номеров занято предыдущими подмножествами
+            for subset_indices in itertools.combinations(range(self.k), m):
+                # Генерируем комбинации лагов для этого подмножества
+                lag_lists = [self.feature_lags[i] for i in subset_indices]
+                lag_tuples = gray_lag_tuples(lag_lists) if order == 'gray' else itertools.product(*lag_lists)
+                subset_size = len(variants)
+                for lags in lag_tuples:
+                    position = 0 # Номер кортежа лагов в каноническом порядке
+                    for i, lag in zip(subset_indices, lags):
+                        position = position * self._weights[i] + self._lag_positions[i][lag]
+                    first = self._first_id_number(subset_indices, lags, model_counter + position * len(variants))
+                    for offset, (suffix, include_constant) in enumerate(variants):
+                        yield self._spec(first + offset, subset_indices, lags, suffix, include_constant)
+                for i in subset_indices:
+                    subset_size *= self._weights[i]
+                model_counter += subset_size
+
+    def iter_specs(self, order='canonical', start=0, stop=None):
+        """
+        Спецификации с позициями [start, stop) в порядке перебора.
+        В каноническом порядке начало диапазона находится через unrank, без прохода по префиксу.
+        """
+        if start > 0 and order == 'canonical':
+            stop = self.count() if stop is None else min(stop, self.count())
+            return (self.unrank(index) for index in range(start, stop))
+        return itertools.islice(self._iter_all(order), start, stop)
+
+    # --- Ранжирование ---
+    def rank(self, subset_indices, lags, include_constant):
+        """Номер спецификации (с 0) в каноническом порядке этого пространства; ID модели - model_id."""
+        m = len(subset_indices)
+        # Сколько пар (подмножество размера m, кортеж лагов) идет раньше: подмножества - в порядке
+        # itertools.combinations (лексикографическом), каждое со всеми кортежами своих лагов
+        subset_rank = 0
+        prefix_size = 1 # Кортежей лагов у уже выбранной части подмножества
+        previous = -1
+        for pos, index in enumerate(subset_indices):
+            for skipped in range(previous + 1, index):
+                subset_rank += prefix_size * self._weights[skipped] * self._suffix_counts[skipped + 1][m - pos - 1]
+            prefix_size *= self._weights[index]
+            previous = index
+        position = 0
+        for index, lag in zip(subset_indices, lags):
+            position = position * self._weights[index] + self._lag_positions[index][lag]
+        variants = self._variants[m]
+        offset = next(i for i, (_, const) in enumerate(variants) if const == include_constant)
+        return self._block_starts[m] + (subset_rank + position) * len(variants) + offset
+
+    def rank_spec(self, spec):
+        """Номер спецификации по словарю {"regressors": {имя: лаг}, "include_constant": ...}."""
+        indices = sorted((self.regressor_names.index(name), lag) for name, lag in spec["regressors"].items())
+        return self.rank([i for i, _ in indices], [lag for _, lag in indices], spec.get("include_constant", True))
+
+    def block_range(self, m):
+        """Позиции [start, stop) спецификаций с m регрессорами в каноническом порядке."""
+        start = self._block_starts[m]
+        return start, start + self._suffix_counts[0][m] * len(self._variants[m])
+
+    def lag_specs(self, subset_indices, lags):
+        """
+        Спецификации всех вариантов константы для подмножества с лагами (регрессоры в любом порядке);
+        ID и порядок регрессоров в спецификации - как в каноническом порядке.
+        """
+        pairs = sorted(zip(subset_indices, lags))
+        subset_indices, lags = [i for i, _ in pairs], [lag for _, lag in pairs]
+        variants = self._variants[len(subset_indices)]
+        if not variants:
+            return []
+        # Варианты константы идут подряд
+        first = self._first_id_number(subset_indices, lags, self.rank(subset_indices, lags, variants[0][1]))
+        return [self._spec(first + offset, subset_indices, lags, suffix, include_constant)
+                for offset, (suffix, include_constant) in enumerate(variants)]
+
+    def model_id(self, subset_indices, lags, include_constant):
+        if self.id_space is not self:
+            return self.id_space.model_id([self._id_features[i] for i in subset_indices], lags, include_constant)
+        m = len(subset_indices)
+        suffix = next(suffix for suffix, const in self._variants[m] if const == include_constant)
+        return f"m_{self.rank(subset_indices, lags, include_constant) + 1}{suffix}"
+
+    def unrank(self, index):
+        """Спецификация с номером index (с 0) в каноническом порядке этого пространства."""
+        if not 0 <= index < self.count():
+            raise IndexError(f"Spec index {index} out of range [0, {self.count()})")
+        m = max(m for m in range(self.k + 1) if self._block_starts[m] <= index and self._variants[m])
+        variants = self._variants[m]
+        subset_rank, offset = divmod(index - self._block_starts[m], len(variants))
+        # Подмножество по лексикографическому номеру; остаток - номер кортежа лагов внутри подмножества
+        subset_indices = []
+        prefix_size = 1
+        first = 0
+        for pos in range(m):
+            for candidate in range(first, self.k):
+                below = prefix_size * self._weights[candidate] * self._suffix_counts[candidate + 1][m - pos - 1]
+                if subset_rank < below:
+                    subset_indices.append(candidate)
+                    prefix_size *= self._weights[candidate]
+                    first = candidate + 1
+                    break
+                subset_rank -= below
+        # Остался номер кортежа лагов внутри подмножества (смешанное основание - числа лагов признаков)
+        position = subset_rank
+        lags = []
+        for i in reversed(subset_indices):
+            position, lag_pos = divmod(position, self._weights[i])
+            lags.append(self.feature_lags[i][lag_pos])
+        lags = lags[::-1]
+        suffix, include_constant = variants[offset]
+        first_number = self._first_id_number(subset_indices, lags, index - offset)
+        return self._spec(first_number + offset, subset_indices, lags, suffix, include_constant)
+
+    # --- Случайная выборка ---
+    def sample_indices(self, size, seed=None):
+        """size номеров без повторов, равномерно по всему пространству, по возрастанию (канонический порядок)."""
+        size = min(max(0, int(size)), self.count())
+        # random.sample по range не материализует диапазон - годится и для очень больших пространств
+        return sorted(random.Random(seed).sample(range(self.count()), size))
+
+    def sample(self, size, seed=None):
+        return (self.unrank(index) for index in self.sample_indices(size, seed))
+
+
+# --- Части перебора для нескольких машин (config.shard, --shard i/n) ---
+def parse_shard(value):
+    """'i/n' -> (i, n): i-я (с 1) из n частей."""
+    try:
+        index, count = (int(part) for part in str(value).split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}', expected 'i/n' (e.g. '2/8')") from None
+    if not 1 <= index <= count:
+        raise ValueError(f"Invalid shard '{value}': index must be in 1..{count}")
+    return index, count
+
+
+def shard_range(total, index, count):
+    """Позиции [start, stop) i-й из n частей перебора размера total: непрерывные, размеры отличаются не больше чем на 1."""
+    return (index - 1) * total // count, index * total // count
+
+
+def iter_model_specs(regressor_names, max_lag, constant_status, order='canonical'):
+    return SpecSpace(regressor_names, max_lag, constant_status).iter_specs(order)
@@ -0,0 +1,121 @@
+# python_scripts/spec_priority.py
+"""
+Порядок перебора config.specOrder = 'promising': сначала спецификации, которые скорее окажутся
+хорошими, - чтобы перебор с лимитами (search_limits.py) успел посчитать самое полезное.
+
+  - размер подмножества по возрастанию (как в каноническом порядке): маленькие модели раньше;
+  - внутри размера подмножества перебираются в лексикографическом порядке по рангу признаков, а лаги
+    каждого признака - по убыванию |corr(Y, X_лаг)| (при нескольких Y - максимум по целям);
+  - ранг признака = max_лаг |corr| + доля валидных моделей, в которые он входил. Доля пересчитывается
+    в начале каждого блока размера по уже посчитанным моделям, поэтому порядок блока m+1 зависит от
+    результатов блоков <= m (при numWorkers > 1 пул забирает спецификации вперед - только корреляции).
+
+Порядок детерминирован при тех же данных, ID моделей - канонические (SpecSpace.lag_specs),
+результаты не зависят от порядка. Ранги блоков сохраняются в контрольной точке.
+"""
+import itertools
+
+import numpy as np
+
+from spec_enumerator import constant_variants
+
+
+def lag_correlations(y_targets, lag_matrices):
+    """
+    |corr(Y, колонка)| по строкам, где определены обе, максимум по Y (у каждой своя матрица лагов) -
+    по признаку массив по его лагам (lag_matrix.feature_lags).
+    """
+    lag_matrix = lag_matrices[0]
+    best = np.zeros(len(lag_matrix.column_names))
+    for y_series, matrix in zip(y_targets, lag_matrices):
+        X = matrix.values
+        y = y_series.to_numpy(dtype=np.float64)
+        mask = matrix.valid & ~np.isnan(y)[:, None]
+        n = mask.sum(axis=0)
+        xs = np.where(mask, X, 0.0)
+        ys = np.where(mask, y[:, None], 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_x, mean_y = xs.sum(axis=0) / n, ys.sum(axis=0) / n
+            cov = (xs * ys).sum(axis=0) / n - mean_x * mean_y
+            var_x = (xs * xs).sum(axis=0) / n - mean_x ** 2
+            var_y = (ys * ys).sum(axis=0) / n - mean_y ** 2
+            corr = np.abs(cov / np.sqrt(var_x * var_y))
+        best = np.fmax(best, np.nan_to_num(np.clip(corr, 0.0, 1.0), nan=0.0))
+    return [best[[lag_matrix.column_index[(feature, lag)] for lag in lag_matrix.feature_lags[feature]]]
+            for feature in lag_matrix.feature_names]
+
+
+class PromisingOrder:
+    def __init__(self, space, y_targets, lag_matrices, adaptive=True):
+        self.space = space
+        self.adaptive = adaptive
+        self.correlations = lag_correlations(y_targets, lag_matrices)
+        lag_matrix = lag_matrices[0]
+        # Лаги каждого признака по убыванию корреляции (при равенстве - меньший лаг раньше)
+        self.lag_orders = [[lag_matrix.feature_lags[name][i] for i in np.argsort(-row, kind="stable")]
+                           for name, row in zip(lag_matrix.feature_names, self.correlations)]
+        self._feature_of_column = {lag_matrix.column_name(name, lag): feature
+                                   for feature, name in enumerate(lag_matrix.feature_names) for lag in lag_matrix.feature_lags[name]}
+        self.valid_models = 0
+        self.inclusion = [0] * space.k # Признак -> число валидных моделей с ним
+        self.block_orders = {} # Размер подмножества -> признаки по убыванию ранга
+
+    def feature_ranks(self):
+        prior = np.array([row.max() for row in self.correlations])
+        if not self.valid_models:
+            return prior
+        return prior + np.array(self.inclusion) / self.valid_models
+
+    def observe(self, results):
+        """Результаты спецификации по целям: признаки модели, валидной хотя бы для одной Y, учитываются."""
+        for result in results:
+            data = result.get("data") or {}
+            if result.get("status") == "completed" and data.get("is_valid"):
+                self.valid_models += 1
+                for name in data.get("coefficients", {}):
+                    feature = self._feature_of_column.get(name)
+                    if feature is not None:
+                        self.inclusion[feature] += 1
+                return
+
+    def _block_order(self, m):
+        if m not in self.block_orders:
+            self.block_orders[m] = np.argsort(-self.feature_ranks(), kind="stable").tolist()
+        return self.block_orders[m]
+
+    def iter_specs(self, start=0, stop=None):
+        """Спецификации с позициями [start, stop) в порядке 'promising' (блоки размеров - на тех же позициях, что в каноническом)."""
+        space = self.space
+        stop = space.count() if stop is None else min(stop, space.count())
+        for m in range(space.k + 1):
+            block_start, block_stop = space.block_range(m)
+            if block_stop <= start or block_start == block_stop:
+                continue
+            if block_start >= stop:
+                return
+            # Ранги признаков - на момент начала блока (генератор ленивый: все модели предыдущих блоков уже учтены)
+            feature_order = self._block_order(m)
+            n_variants = len(constant_variants(space.constant_status, m))
+            skipped = max(0, start - block_start) // n_variants # Кортежей лагов до start (при продолжении)
+            position = block_start + skipped * n_variants
+            tuples = ((ranks, lag_ranks) for ranks in itertools.combinations(range(space.k), m)
+                      for lag_ranks in itertools.product(*(range(len(self.lag_orders[feature_order[r]])) for r in ranks)))
+            for ranks, lag_ranks in itertools.islice(tuples, skipped, None):
+                subset = [feature_order[r] for r in ranks]
+                lags = [self.lag_orders[feature][lag_rank] for feature, lag_rank in zip(subset, lag_ranks)]
+                for spec in space.lag_specs(subset, lags):
+                    if position >= stop:
+                        return
+                    if position >= start:
+                        yield spec
+                    position += 1
+
+    # --- Контрольные точки (checkpoint.py) ---
+    def state(self):
+        return {"valid_models": self.valid_models, "inclusion": list(self.inclusion),
+                "block_orders": {str(m): order for m, order in self.block_orders.items()}}
+
+    def restore(self, state):
+        self.valid_models = state["valid_models"]
+        self.inclusion = list(state["inclusion"])
+        self.block_orders = {int(m): list(order) for m, order in state["block_orders"].items()}
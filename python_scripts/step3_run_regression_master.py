@@ -1,17 +1,36 @@
 # python_scripts/step3_run_regression_master.py
 import sys
+import argparse
 import json
 import traceback
 import pandas as pd
 import numpy as np
-import statsmodels.api as sm
-from statsmodels.stats.outliers_influence import variance_inflation_factor
-from statsmodels.stats.diagnostic import het_breuschpagan
 import io
+import os
+import signal
+import multiprocessing
 import warnings
 import itertools
 import time # Для периодической отправки
 import math # Для проверки на inf/nan
+from lag_matrix import LagMatrix
+from ols_engine import SufficientStatsOLS, TargetGroupsOLS, vif_from_gram
+from best_subset import LeapsAndBounds
+from top_k import TopKResults
+from checkpoint import Checkpointer, job_signature, iter_in_order, DEFAULT_INTERVAL_SECONDS
+from spec_enumerator import SpecSpace, parse_shard, shard_range
+from result_frames import ResultFrameEncoder, FRAME_PREFIX
+from json_encoding import dumps as dumps_json
+from result_store import ResultStore, target_store_path
+from model_cache import ModelCache
+from profiler import StageProfiler, parse_profile_config, NULL_STAGE, PROFILE_PREFIX
+from telemetry import ProgressTelemetry, StatusCounts
+from summary_stats import ModelSpaceSummary, parse_summary_config, SUMMARY_PREFIX
+from search_limits import SearchBudget, parse_search_limits
+from spec_priority import PromisingOrder
+from screening import run_screening, parse_screening_config, SCREENING_PREFIX
+# statsmodels (~1 с на импорт) импортируется внутри функций, которым он нужен: основной путь
+# считает OLS через ols_engine, а процессы пула ("spawn") заново импортируют этот модуль
 
 # Игнорируем предупреждения от statsmodels, если нужно
 warnings.filterwarnings("ignore")
@@ -23,310 +42,955 @@ def log_error(message): print(f"ERROR_MASTER: {message}", file=log_buffer)
 def log_info(message): print(f"INFO_MASTER: {message}", file=log_buffer)
 def log_warn(message): print(f"WARN_MASTER: {message}", file=log_buffer)
 
-# --- НОВАЯ Функция для очистки данных от невалидных JSON значений ---
-def sanitize_for_json(data):
-    """
-    Рекурсивно обходит словарь или список и заменяет inf, -inf, nan на None.
-    """
-    if isinstance(data, dict):
-        return {k: sanitize_for_json(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [sanitize_for_json(item) for item in data]
-    elif isinstance(data, float):
-        if math.isinf(data) or math.isnan(data):
-            return None # Заменяем на null в JSON
-        return data
-    # Обработка numpy типов (на всякий случай)
-    elif isinstance(data, (np.float_, np.float16, np.float32, np.float64)):
-        if np.isinf(data) or np.isnan(data):
-            return None
-        return float(data) # Преобразуем в стандартный float
-    elif isinstance(data, (np.int_, np.intc, np.intp, np.int8, np.int16, np.int32, np.int64, np.uint8, np.uint16, np.uint32, np.uint64)):
-         return int(data) # Преобразуем в стандартный int
-    return data
-# --- Конец новой функции ---
-
-# --- Функция для создания лагированных признаков (из старого скрипта) ---
-def create_lagged_features(df, features_with_lags):
-    lagged_df = pd.DataFrame(index=df.index)
-    original_feature_names = []
-    for feature, lag in features_with_lags.items():
-        if feature in df.columns:
-            if lag == 0:
-                lagged_df[f"{feature}_L0"] = df[feature]
-                original_feature_names.append(f"{feature}_L0")
-            elif lag > 0:
-                lagged_df[f"{feature}_L{lag}"] = df[feature].shift(lag)
-                original_feature_names.append(f"{feature}_L{lag}")
-            else:
-                 log_warn(f"Invalid lag {lag} for feature {feature}, skipping.")
-        else:
-            log_warn(f"Feature {feature} not found in input data, skipping.")
-    return lagged_df, original_feature_names
+# --- Результат statsmodels в том же виде, что и OLSFit из ols_engine ---
+class StatsmodelsFit:
+    def __init__(self, model_results, Y, X):
+        self.names = list(X.columns)
+        self.params = model_results.params.to_numpy()
+        self.pvalues = model_results.pvalues.to_numpy()
+        self.nobs = model_results.nobs
+        self.rsquared = model_results.rsquared
+        self.rsquared_adj = model_results.rsquared_adj
+        self.aic = model_results.aic
+        self.bic = model_results.bic
+        self.ssr = model_results.ssr
+        self.endog = Y.to_numpy()
+        self.exog = model_results.model.exog
+        self.resid = model_results.resid.to_numpy()
 
-# --- Функция для запуска ОДНОЙ регрессии (из старого скрипта, немного адаптирована) ---
-def run_single_ols(y_series, all_x_df, spec, config, model_id):
+    def regressor_gram(self):
+        # X'X регрессоров без константы (для VIF)
+        X = self.exog[:, [i for i, name in enumerate(self.names) if name != 'const']]
+        return X.T @ X
+
+# --- Подгонка одной спецификации через statsmodels (эталонный путь) ---
+def fit_single_ols_statsmodels(y_series, lag_matrix, spec):
+    from statsmodels.regression.linear_model import OLS
+    from statsmodels.tools.tools import add_constant
+
+    # 1. Лагированные регрессоры X для текущей спецификации - срез общей матрицы лагов
+    final_regressor_names, columns, _ = lag_matrix.select(spec.get('regressors', {}))
+    X_lagged_df = lag_matrix.frame(columns, final_regressor_names)
+
+    # 2. Объединение и очистка от NaN
+    model_data = pd.concat([y_series.rename('__Y__'), X_lagged_df], axis=1)
+    model_data_clean = model_data.dropna()
+
+    if model_data_clean.empty or len(model_data_clean) < len(final_regressor_names) + 2:
+         return None, len(model_data_clean)
+
+    Y = model_data_clean['__Y__']
+    X = model_data_clean[final_regressor_names]
+
+    # 3. Добавление константы
+    if spec.get('include_constant', True):
+        X = add_constant(X, has_constant='add')
+
+    # 4. Запуск OLS
+    model_results = OLS(Y, X).fit()
+    return StatsmodelsFit(model_results, Y, X), len(model_data_clean)
+
+# --- Метрики и тесты одной модели ---
+def calculate_mape(fit):
+    # Проверяем наличие нулей в Y перед делением; np.inf потом очистится до None
+    if np.any(fit.endog == 0):
+        return np.inf
+    return np.mean(np.abs(fit.resid / fit.endog)) * 100
+
+def check_p_values(fit, config, test_results, model_id):
+    # p-value test: все коэффициенты, кроме константы, значимы
+    test_results["p_value_ok"] = True
+    threshold = config.get('pValueThreshold', 0.05)
+    pvals_no_const = fit.pvalues[[i for i, name in enumerate(fit.names) if name != 'const']]
+    pvals_no_const = pvals_no_const[~np.isnan(pvals_no_const)]
+    # Проверяем на NaN перед сравнением
+    if pvals_no_const.size > 0 and pvals_no_const.max() > threshold:
+        test_results["p_value_ok"] = False
+    return test_results["p_value_ok"]
+
+def check_vif(fit, config, test_results, model_id):
+    test_results["vif_ok"] = True
+    regressor_names = [name for name in fit.names if name != 'const']
+    if len(regressor_names) < 2:
+        return True
     try:
-        # 1. Создание лагированных регрессоров X для текущей спецификации
-        features_to_lag = spec.get('regressors', {})
-        X_lagged_df, final_regressor_names = create_lagged_features(all_x_df, features_to_lag)
+        X_for_tests = fit.exog[:, [i for i, name in enumerate(fit.names) if name != 'const']]
+        # Проверяем на наличие NaN/inf в данных перед VIF
+        if np.any(np.isinf(X_for_tests)) or np.any(np.isnan(X_for_tests)):
+             log_warn(f"NaN/Inf found in X data for VIF calculation in {model_id}, skipping VIF.")
+             test_results["vif_ok"] = False # Считаем тест не пройденным
+        else:
+            # Все VIF из одной матрицы X'X (у движка - из кэша Z'Z); почти вырожденные - по-старому
+            vif_values = vif_from_gram(fit.regressor_gram())
+            if vif_values is None:
+                from statsmodels.stats.outliers_influence import variance_inflation_factor
+                vif_values = [variance_inflation_factor(X_for_tests, i) for i in range(X_for_tests.shape[1])]
+            else:
+                vif_values = vif_values.tolist()
+            test_results["vif_values"] = dict(zip(regressor_names, vif_values))
+            # Проверяем на inf в результатах VIF
+            if np.any(np.isinf(vif_values)) or max(vif_values) > 10:
+                test_results["vif_ok"] = False
+    except Exception as vif_e:
+         log_warn(f"VIF calculation failed for {model_id}: {vif_e}")
+         test_results["vif_ok"] = False
+    return test_results["vif_ok"]
 
-        # 2. Объединение и очистка от NaN
-        model_data = pd.concat([y_series.rename('__Y__'), X_lagged_df], axis=1)
-        model_data_clean = model_data.dropna()
+def check_heteroskedasticity(fit, config, test_results, model_id):
+    # Heteroskedasticity (Breusch-Pagan) test
+    test_results["heteroskedasticity_ok"] = True
+    if fit.exog.size == 0:
+        return True
+    try:
+        # Проверяем на NaN/Inf в остатках и экзогенных переменных
+        if np.any(np.isnan(fit.resid)) or np.any(np.isinf(fit.resid)) or \
+           np.any(np.isnan(fit.exog)) or np.any(np.isinf(fit.exog)):
+            log_warn(f"NaN/Inf found in data for Breusch-Pagan test in {model_id}, skipping test.")
+            test_results["heteroskedasticity_ok"] = False # Считаем тест не пройденным
+        else:
+            from statsmodels.stats.diagnostic import het_breuschpagan
+            bp_test = het_breuschpagan(fit.resid, fit.exog)
+            test_results["bp_pvalue"] = bp_test[1]
+            # Проверяем p-value на NaN перед сравнением
+            if not math.isnan(bp_test[1]) and bp_test[1] < 0.05:
+                test_results["heteroskedasticity_ok"] = False
+            elif math.isnan(bp_test[1]):
+                log_warn(f"Breusch-Pagan test returned NaN p-value for {model_id}.")
+                test_results["heteroskedasticity_ok"] = False # Считаем тест не пройденным
+    except Exception as bp_e:
+        log_warn(f"Breusch-Pagan test failed for {model_id}: {bp_e}")
+        test_results["heteroskedasticity_ok"] = False
+    return test_results["heteroskedasticity_ok"]
 
-        if model_data_clean.empty or len(model_data_clean) < len(final_regressor_names) + 2:
-             # Возвращаем статус 'skipped' вместо ошибки
-             return {"status": "skipped", "reason": f"Not enough observations ({len(model_data_clean)})"}
+# Тесты в порядке стоимости: (ключ в config.tests, ключ в test_results, функция)
+DIAGNOSTICS = (
+    ('pValue', 'p_value_ok', check_p_values),                    # p-values уже посчитаны при подгонке
+    ('vif', 'vif_ok', check_vif),                                # одно разложение p x p
+    ('heteroskedasticity', 'heteroskedasticity_ok', check_heteroskedasticity), # вспомогательная регрессия по n строкам
+)
 
-        Y = model_data_clean['__Y__']
-        X = model_data_clean[final_regressor_names]
+# Ключи results_data["metrics"] (все возможные)
+METRIC_KEYS = ('mae', 'mape', 'rmse', 'r_squared', 'adj_r_squared')
 
-        # 3. Добавление константы
-        include_constant = spec.get('include_constant', True)
-        if include_constant:
-            X = sm.add_constant(X, has_constant='add')
+# --- Функция для запуска ОДНОЙ регрессии (из старого скрипта, немного адаптирована) ---
+def run_single_ols(y_series, lag_matrix, spec, config, model_id, engine=None, target=0):
+    try:
+        features_to_lag = spec.get('regressors', {})
+        # Пропущенные признаки одинаковы для всех зависимых переменных - сообщаем о них один раз
+        for feature, lag, reason in (lag_matrix.select(features_to_lag)[2] if target == 0 else ()):
+            if reason == 'missing_feature':
+                log_warn(f"Feature {feature} not found in input data, skipping.")
+            else:
+                log_warn(f"Invalid lag {lag} for feature {feature}, skipping.")
 
-        # 4. Запуск OLS
-        model_results = sm.OLS(Y, X).fit()
+        # 1-4. Подгонка: через движок достаточных статистик, если он передан,
+        # иначе (или для почти вырожденных спецификаций) через statsmodels
+        with profile_stage('fit'):
+            fit = None
+            if engine is not None:
+                sample = engine.sample(features_to_lag, target)
+                if sample.n_obs == 0 or sample.n_obs < len(sample.names) + 2:
+                    return {"status": "skipped", "reason": f"Not enough observations ({sample.n_obs})"}
+                fit = engine.fit(sample, spec.get('include_constant', True))
+            if fit is None:
+                fit, n_clean = fit_single_ols_statsmodels(y_series, lag_matrix, spec)
+                if fit is None:
+                    # Возвращаем статус 'skipped' вместо ошибки
+                    return {"status": "skipped", "reason": f"Not enough observations ({n_clean})"}
 
         # 5. Сбор результатов
         results_data = {
-            "coefficients": model_results.params.to_dict(),
-            "p_values": model_results.pvalues.to_dict(),
-            "n_obs": int(model_results.nobs),
-            "rsquared": model_results.rsquared,
-            "rsquared_adj": model_results.rsquared_adj,
-            "aic": model_results.aic,
-            "bic": model_results.bic,
+            "coefficients": dict(zip(fit.names, fit.params.tolist())),
+            "p_values": dict(zip(fit.names, fit.pvalues.tolist())),
+            "n_obs": int(fit.nobs),
+            "rsquared": fit.rsquared,
+            "rsquared_adj": fit.rsquared_adj,
+            "aic": fit.aic,
+            "bic": fit.bic,
             "metrics": {},
             "test_results": {},
             "is_valid": True # Начинаем с предположения о валидности
         }
 
-        # 6. Расчет метрик
+        # 6. Расчет метрик (дорогие - MAPE - при skipTestsAfterFailure только для прошедших тесты)
         metrics_config = config.get('metrics', {})
-        predictions = model_results.predict(X)
-        residuals = Y - predictions
-        if metrics_config.get('mae'): results_data["metrics"]["mae"] = np.mean(np.abs(residuals))
-        # ИЗМЕНЕНИЕ ЗДЕСЬ: Используем np.inf, но потом очистим
-        if metrics_config.get('mape'):
-            # Проверяем наличие нулей в Y перед делением
-            if np.any(Y == 0):
-                 results_data["metrics"]["mape"] = np.inf # Или можно сразу None
-            else:
-                 results_data["metrics"]["mape"] = np.mean(np.abs(residuals / Y)) * 100
-
-        if metrics_config.get('rmse'): results_data["metrics"]["rmse"] = np.sqrt(np.mean(residuals**2))
-        if metrics_config.get('rSquared'):
-             results_data["metrics"]["r_squared"] = model_results.rsquared
-             results_data["metrics"]["adj_r_squared"] = model_results.rsquared_adj
+        skip_after_failure = config.get('skipTestsAfterFailure', False)
+        with profile_stage('metrics'):
+            if metrics_config.get('mae'): results_data["metrics"]["mae"] = np.mean(np.abs(fit.resid))
+            if metrics_config.get('mape') and not skip_after_failure:
+                results_data["metrics"]["mape"] = calculate_mape(fit)
+            if metrics_config.get('rmse'): results_data["metrics"]["rmse"] = np.sqrt(fit.ssr / fit.nobs)
+            if metrics_config.get('rSquared'):
+                 results_data["metrics"]["r_squared"] = fit.rsquared
+                 results_data["metrics"]["adj_r_squared"] = fit.rsquared_adj
 
-        # 7. Проведение тестов
+        # 7. Проведение тестов - от дешевых к дорогим; при skipTestsAfterFailure после первого
+        # проваленного теста остальные не считаются (результат None - "не проверялось")
         tests_config = config.get('tests', {})
-        X_for_tests = X.drop('const', axis=1, errors='ignore')
-
-        # p-value test
-        results_data["test_results"]["p_value_ok"] = True
-        if tests_config.get('pValue'):
-            threshold = config.get('pValueThreshold', 0.05)
-            pvals_no_const = model_results.pvalues.drop('const', errors='ignore')
-            # Проверяем на NaN перед сравнением
-            if not pvals_no_const.empty and pvals_no_const.max() > threshold:
-                results_data["test_results"]["p_value_ok"] = False
-                results_data["is_valid"] = False
-
-        # VIF test
-        results_data["test_results"]["vif_ok"] = True
-        if tests_config.get('vif') and X_for_tests.shape[1] >= 2:
-            try:
-                # Проверяем на наличие NaN/inf в данных перед VIF
-                if np.any(np.isinf(X_for_tests.values)) or np.any(np.isnan(X_for_tests.values)):
-                     log_warn(f"NaN/Inf found in X data for VIF calculation in {model_id}, skipping VIF.")
-                     results_data["test_results"]["vif_ok"] = False # Считаем тест не пройденным
-                     results_data["is_valid"] = False
-                else:
-                    vif_values = [variance_inflation_factor(X_for_tests.values, i) for i in range(X_for_tests.shape[1])]
-                    results_data["test_results"]["vif_values"] = dict(zip(X_for_tests.columns, vif_values))
-                    # Проверяем на inf в результатах VIF
-                    if np.any(np.isinf(vif_values)) or max(vif_values) > 10:
-                        results_data["test_results"]["vif_ok"] = False
-                        results_data["is_valid"] = False
-            except Exception as vif_e:
-                 log_warn(f"VIF calculation failed for {model_id}: {vif_e}")
-                 results_data["test_results"]["vif_ok"] = False
-                 results_data["is_valid"] = False
-
-        # Heteroskedasticity (Breusch-Pagan) test
-        results_data["test_results"]["heteroskedasticity_ok"] = True
-        if tests_config.get('heteroskedasticity') and not X.empty:
-             try:
-                 # Проверяем на NaN/Inf в остатках и экзогенных переменных
-                 if np.any(np.isnan(model_results.resid)) or np.any(np.isinf(model_results.resid)) or \
-                    np.any(np.isnan(model_results.model.exog)) or np.any(np.isinf(model_results.model.exog)):
-                     log_warn(f"NaN/Inf found in data for Breusch-Pagan test in {model_id}, skipping test.")
-                     results_data["test_results"]["heteroskedasticity_ok"] = False # Считаем тест не пройденным
-                     results_data["is_valid"] = False
-                 else:
-                     bp_test = het_breuschpagan(model_results.resid, model_results.model.exog)
-                     results_data["test_results"]["bp_pvalue"] = bp_test[1]
-                     # Проверяем p-value на NaN перед сравнением
-                     if not math.isnan(bp_test[1]) and bp_test[1] < 0.05:
-                         results_data["test_results"]["heteroskedasticity_ok"] = False
-                         results_data["is_valid"] = False
-                     elif math.isnan(bp_test[1]):
-                          log_warn(f"Breusch-Pagan test returned NaN p-value for {model_id}.")
-                          results_data["test_results"]["heteroskedasticity_ok"] = False # Считаем тест не пройденным
-                          results_data["is_valid"] = False
-
-             except Exception as bp_e:
-                 log_warn(f"Breusch-Pagan test failed for {model_id}: {bp_e}")
-                 results_data["test_results"]["heteroskedasticity_ok"] = False
-                 results_data["is_valid"] = False
-
-        # !!! ВАЖНО: Очищаем results_data перед возвратом !!!
-        sanitized_results_data = sanitize_for_json(results_data)
-
-        return {"status": "completed", "data": sanitized_results_data}
+        skipped_tests = []
+        for config_key, result_key, run_test in DIAGNOSTICS:
+            if not tests_config.get(config_key):
+                results_data["test_results"][result_key] = True
+            elif skip_after_failure and not results_data["is_valid"]:
+                results_data["test_results"][result_key] = None
+                skipped_tests.append(result_key)
+            else:
+                with profile_stage(f"test_{config_key}"):
+                    passed = run_test(fit, config, results_data["test_results"], model_id)
+                if not passed:
+                    results_data["is_valid"] = False
+        if skipped_tests:
+            results_data["test_results"]["skipped_tests"] = skipped_tests
+        if metrics_config.get('mape') and skip_after_failure and results_data["is_valid"]:
+            with profile_stage('metrics'):
+                results_data["metrics"]["mape"] = calculate_mape(fit)
+
+        # NaN/inf остаются как есть: в null их переводит кодировщик при выводе (json_encoding)
+        return {"status": "completed", "data": results_data}
 
     except Exception as e:
         log_error(f"Error in run_single_ols for {model_id}: {str(e)}")
         # traceback.print_exc(file=log_buffer) # Можно раскомментировать для детального трейсбека
-        # Возвращаем очищенный результат ошибки
-        return sanitize_for_json({"status": "error", "error": f"Failed OLS: {str(e)}"})
+        return {"status": "error", "error": f"Failed OLS: {str(e)}"}
+
+def run_spec(y_series, lag_matrix, spec, config, engine=None, cache=None, target=0):
+    # Результат спецификации из кэша моделей (config.modelCache), иначе - подгонка и запись в кэш
+    if cache is None:
+        return run_single_ols(y_series, lag_matrix, spec, config, spec["model_id"], engine, target)
+    with profile_stage('cache'):
+        key = cache.key(spec, target)
+        result = cache.get(key)
+    if result is None:
+        result = run_single_ols(y_series, lag_matrix, spec, config, spec["model_id"], engine, target)
+        with profile_stage('cache'):
+            cache.put(key, result)
+    return result
+
+def run_spec_targets(y_targets, lag_matrices, spec, config, engine=None, cache=None):
+    # Спецификация для всех зависимых переменных подряд (у каждой своя матрица лагов): у целей с одинаковыми
+    # датами и пропусками движок берет ту же Z'Z и тот же фактор Холецкого, на каждую цель - только решение
+    return [run_spec(y_series, lag_matrices[target], spec, config, engine, cache, target)
+            for target, y_series in enumerate(y_targets)]
+
+DEFAULT_SAMPLE_FRACTION = 0.05
+
+def resolve_spec_order(config):
+    # config.specOrder = 'gray': соседние спецификации отличаются одной колонкой, и движок
+    # обновляет фактор Холецкого за O(p^2) вместо разложения с нуля;
+    # 'promising' - сначала перспективные спецификации (spec_priority.py), по умолчанию при лимитах перебора
+    if config.get('olsEngine', 'sufficient_stats') == 'statsmodels':
+        return 'canonical'
+    if 'specOrder' in config:
+        return config['specOrder']
+    if parse_search_limits(config) and config.get('searchMode', 'exhaustive') == 'exhaustive' and not config.get('shard'):
+        return 'promising'
+    return 'canonical'
+
+def run_leaps_and_bounds(y_series, lag_matrix, space, config):
+    """
+    config.searchMode = 'leaps_and_bounds': ветви и границы по RSS на общей выборке вместо полного перебора.
+    space - пространство перебора (признаки - как у lag_matrix), по нему считаются ID моделей.
+    Возвращает (спецификации лучших config.bestPerSize моделей каждого размера, сводку поиска).
+    """
+    constant_status = space.constant_status
+    search = LeapsAndBounds(SufficientStatsOLS(y_series, lag_matrix),
+                            config.get('bestPerSize', 10), config.get('rankBy', 'aic'))
+    variants = {'include': [True], 'exclude': [False]}.get(constant_status, [True, False])
+    best = search.run(variants)
+    feature_names = lag_matrix.feature_names
+    specs = []
+    best_per_size = {}
+    for size, entries in best.items():
+        best_per_size[str(size)] = []
+        for subset, lags, include_constant, _ in entries:
+            model_id = space.model_id(subset, lags, include_constant)
+            regressors_with_lags = {feature_names[i]: lag for i, lag in zip(subset, lags)}
+            specs.append({"model_id": model_id, "regressors": regressors_with_lags, "include_constant": include_constant})
+            best_per_size[str(size)].append(model_id)
+    log_info(f"Leaps and bounds: common sample n={search.n}, nodes={search.nodes_visited}, "
+             f"leaves={search.leaves_evaluated}, pruned={search.branches_pruned}, selected={len(specs)}")
+    summary = {
+        "mode": "leaps_and_bounds",
+        "rank_by": search.rank_by,
+        "best_per_size": best_per_size, # {размер: [model_id по возрастанию критерия]}
+        "common_sample_n": search.n,
+        "nodes_visited": search.nodes_visited,
+        "leaves_evaluated": search.leaves_evaluated,
+        "branches_pruned": search.branches_pruned,
+    }
+    return specs, summary
+
+def sample_specs(space, config):
+    """
+    config.searchMode = 'sample': равномерная случайная выборка спецификаций без повторов - быстрая
+    разведка пространства перед полным перебором. Размер - config.sampleSize или доля config.sampleFraction.
+    """
+    total = space.count()
+    size = config.get('sampleSize')
+    if size is None:
+        size = math.ceil(total * config.get('sampleFraction', DEFAULT_SAMPLE_FRACTION))
+    seed = config.get('sampleSeed', 0) # Фиксированное зерно: выборка воспроизводима (и продолжаема с контрольной точки)
+    indices = space.sample_indices(size, seed)
+    log_info(f"Sampling {len(indices)} of {total} specifications (seed={seed})")
+    summary = {"mode": "sample", "sample_size": len(indices), "space_size": total, "seed": seed}
+    return (space.unrank(index) for index in indices), len(indices), summary
+
+def restrict_to_common_sample(y_series, lag_matrix):
+    """
+    config.commonSample (и searchMode 'leaps_and_bounds'): одна выборка на весь перебор - строки, где определены
+    Y и все лаги всех регрессоров (до maxLagDepth). Y вне нее заменяется на NaN, поэтому выборка любой
+    спецификации (строки без NaN в Y и ее колонках) совпадает с общей: AIC/BIC сравнимы между моделями,
+    а движку хватает одной матрицы Z'Z.
+    Возвращает (Y, сводку выборки).
+    """
+    mask = lag_matrix.common_sample_mask(y_series)
+    n_obs = int(mask.sum())
+    if n_obs == 0:
+        raise ValueError("commonSample: no rows where Y and all lagged regressors are defined.")
+    index = y_series.index[mask]
+    summary = {"n_obs": n_obs, "start": index[0].isoformat(), "end": index[-1].isoformat()}
+    return y_series.where(mask), summary
+
+def build_lag_matrices(y_targets, x_series, max_lag, feature_lags=None):
+    """
+    Матрицы лагов по зависимым переменным: X выравниваются по датам своей Y и сдвигаются по позиции
+    в них - как в задаче с одной Y и в step4_calculate_decomposition.py. Y с одинаковыми датами
+    получают одну и ту же матрицу. feature_lags - лаги каждого признака (после config.screening).
+    """
+    lag_matrices = []
+    for y_series in y_targets:
+        lag_matrix = next((matrix for matrix in lag_matrices if matrix.index.equals(y_series.index)), None)
+        if lag_matrix is None:
+            all_x_df = pd.DataFrame(index=y_series.index)
+            for name, series in x_series.items():
+                all_x_df[name] = series
+            lag_matrix = LagMatrix(all_x_df, max_lag, feature_lags)
+        lag_matrices.append(lag_matrix)
+    return lag_matrices
+
+def create_engine(y_targets, lag_matrices, config):
+    # Движок достаточных статистик: Z'Z считаются один раз на выборку поверх общей матрицы лагов
+    # (цели с разными датами - по своим матрицам, TargetGroupsOLS).
+    # config.olsEngine = 'statsmodels' включает прежний путь (sm.OLS на каждую модель)
+    if config.get('olsEngine', 'sufficient_stats') == 'statsmodels':
+        return None
+    incremental = resolve_spec_order(config) == 'gray'
+    groups = {} # Матрица лагов -> номера ее целей
+    for target, lag_matrix in enumerate(lag_matrices):
+        groups.setdefault(id(lag_matrix), []).append(target)
+    engines = [(SufficientStatsOLS([y_targets[target] for target in group], lag_matrices[group[0]], incremental), group)
+               for group in groups.values()]
+    return engines[0][0] if len(engines) == 1 else TargetGroupsOLS(engines)
+
+# --- Параллельное выполнение: шарды спецификаций в пуле процессов ---
+SHARD_SIZE = 250 # Спецификаций в одном шарде (шард i = спецификации [i*SHARD_SIZE, (i+1)*SHARD_SIZE))
+BLAS_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                        "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+_worker_state = {}
+_stop_state = {"requested": False}
+# profiler - config.profile: время стадий и память (в мастере и в каждом воркере пула свой)
+_profile_state = {"profiler": None}
+# frame_encoder - config.resultFormat = 'columnar': кодировщик кадров PROGRESS_FRAME;
+# result_stores - config.resultStore: результаты пишутся в SQLite (файл на зависимую переменную), в поток идут только счетчики
+_output_state = {"frame_encoder": None, "result_stores": []}
+
+def resolve_num_workers(config):
+    num_workers = config.get('numWorkers', 1)
+    if num_workers == 'auto':
+        return os.cpu_count() or 1
+    return max(1, int(num_workers or 1))
+
+def iter_shards(spec_iter, shard_size=SHARD_SIZE):
+    shard_index = 0
+    while True:
+        specs = list(itertools.islice(spec_iter, shard_size))
+        if not specs:
+            return
+        yield shard_index, specs
+        shard_index += 1
+
+def _init_worker(y_targets, lag_matrices, config, cache):
+    # Матрицы лагов приходят в воркер один раз, движок строится один раз на процесс, а не на шард
+    _worker_state.update(y_targets=y_targets, lag_matrices=lag_matrices, config=config,
+                         engine=create_engine(y_targets, lag_matrices, config), cache=cache)
+    profile_options = parse_profile_config(config.get('profile'))
+    _profile_state["profiler"] = StageProfiler(profile_options) if profile_options else None
+
+def _run_shard(shard):
+    shard_index, specs = shard
+    state = _worker_state
+    batch = {}
+    for spec in specs:
+        batch[spec["model_id"]] = run_spec_targets(state['y_targets'], state['lag_matrices'], spec, state['config'],
+                                                   state['engine'], state['cache'])
+    # Логи воркера возвращаем вместе с шардом, мастер допишет их в свой буфер; в кэш моделей пишет тоже мастер
+    worker_log = log_buffer.getvalue()
+    log_buffer.seek(0)
+    log_buffer.truncate()
+    cache_pending = state['cache'].drain() if state['cache'] is not None else None
+    profiler = _profile_state["profiler"]
+    profile_pending = profiler.drain() if profiler is not None else None
+    return shard_index, batch, worker_log, cache_pending, profile_pending
+
+def run_specs_parallel(spec_iter, y_targets, lag_matrices, config, num_workers, start=0, cache=None):
+    """
+    Выполняет спецификации в пуле из num_workers процессов и отдает тройки (position, model_id, результаты
+    по зависимым переменным) по мере готовности шардов. ID задаются генератором в мастере, поэтому совпадают с последовательным запуском;
+    position - номер спецификации в порядке перебора (start - позиция первой спецификации spec_iter).
+    """
+    # BLAS в каждом воркере - в один поток, иначе пул переподписывает ядра.
+    # Переменные должны быть выставлены до импорта numpy в дочернем процессе (контекст spawn).
+    saved_env = {var: os.environ.get(var) for var in BLAS_THREAD_ENV_VARS}
+    os.environ.update({var: "1" for var in BLAS_THREAD_ENV_VARS})
+    try:
+        pool = multiprocessing.get_context("spawn").Pool(
+            num_workers, initializer=_init_worker, initargs=(y_targets, lag_matrices, config, cache))
+    finally:
+        for var, value in saved_env.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+    with pool: # terminate() при выходе, в том числе при остановке задачи
+        for shard_index, batch, worker_log, cache_pending, profile_pending in pool.imap_unordered(_run_shard, iter_shards(spec_iter)):
+            log_buffer.write(worker_log)
+            if cache_pending is not None:
+                cache.absorb(cache_pending)
+            if profile_pending is not None:
+                _profile_state["profiler"].absorb(profile_pending)
+            first_position = start + shard_index * SHARD_SIZE
+            for offset, (model_id, result) in enumerate(batch.items()):
+                yield first_position + offset, model_id, result
+
+def _terminate_on_sigterm(signum, frame):
+    # SystemExit раскручивает генератор run_specs_parallel, и пул воркеров завершается вместе с мастером
+    raise SystemExit(128 + signum)
+
+def _request_stop(signum, frame):
+    # С контрольными точками останавливаемся между моделями, чтобы записать согласованное состояние
+    _stop_state["requested"] = True
+
+def print_progress_update(batch_results, total_calculated, total_models, extra=None, target=0):
+    stores = _output_state["result_stores"]
+    if stores:
+        store = stores[target]
+        with profile_stage('result_store'):
+            store.write_batch(batch_results, (extra or {}).get("evicted", ()),
+                              total_calculated=total_calculated, total_models=total_models)
+        batch_results = {}
+    encoder = _output_state["frame_encoder"]
+    if encoder is not None:
+        # Колоночный кадр: тот же апдейт, но без JSON по каждой модели
+        header = {"type": "progress", "total_calculated": total_calculated, "total_models": total_models, **(extra or {})}
+        with profile_stage('encode'):
+            line = f"{FRAME_PREFIX}{encoder.encode(batch_results, header)}"
+        with profile_stage('write'):
+            print(line, flush=True)
+        return
+    progress_update = {
+        "type": "progress",
+        "processed_batch": batch_results,
+        "total_calculated": total_calculated,
+        "total_models": total_models # Сколько моделей будет посчитано всего - для процента выполнения
+    }
+    if extra:
+        progress_update.update(extra)
+    # Печатаем JSON в stdout + НОВАЯ СТРОКА (NaN/inf -> null при кодировании, без очищенной копии батча)
+    with profile_stage('encode'):
+        line = f"PROGRESS_UPDATE:{dumps_json(progress_update)}"
+    with profile_stage('write'):
+        print(line, flush=True)
+
+def profile_stage(name):
+    # Стадия config.profile; без профилирования - общий пустой контекст
+    profiler = _profile_state["profiler"]
+    return NULL_STAGE if profiler is None else profiler.stage(name)
+
+def print_profile(total_calculated, final=False):
+    # PROFILE: время стадий и память; после итоговой записи профилирование выключается (и пишется cProfile)
+    profiler = _profile_state["profiler"]
+    if profiler is None:
+        return
+    print(f"{PROFILE_PREFIX}{dumps_json(profiler.record(total_calculated, final))}", flush=True)
+    if final:
+        _profile_state["profiler"] = None
+        profiler.stop()
+
+def finish_result_store(final_result):
+    # Итог задачи (статус, счетчики, сводки search/top_k) - в meta хранилищ
+    stores = _output_state["result_stores"]
+    _output_state["result_stores"] = []
+    job_state = {key: value for key, value in final_result.items() if key not in ("type", "total_models_calculated")}
+    for store in stores:
+        store.finish(total_calculated=final_result["total_models_calculated"], **job_state)
+
+class SearchTarget:
+    """
+    Зависимая переменная перебора: ее номер и имя, батч результатов к отправке, топ (config.topK),
+    счетчики статусов для telemetry и сводка пространства моделей (config.summary).
+    """
+
+    def __init__(self, index, name):
+        self.index = index
+        self.name = name
+        self.batch = {}
+        self.top_k = None
+        self.status_counts = StatusCounts()
+        self.summary = None
+
+    def status_fractions(self):
+        # В режиме topK результаты в батч не попадают - счетчики ведет топ
+        return self.status_counts.fractions(self.top_k.counts if self.top_k is not None else None)
+
+def send_target_updates(targets, total_calculated, total_models, multi_target, final=False, telemetry=None):
+    """
+    Отправляет батчи всех целей (в режиме topK - изменения топа), при нескольких зависимых
+    переменных - с полем target. final=True: цели без новых результатов пропускаются.
+    telemetry - общие поля скорости и прогноза (ProgressTelemetry.snapshot), к ним добавляются доли статусов цели.
+    Возвращает число отправленных результатов.
+    """
+    sent = 0
+    for target in targets:
+        extra = {"target": target.name} if multi_target else {}
+        batch, target.batch = target.batch, {}
+        if target.top_k is not None:
+            batch, evicted = target.top_k.flush()
+            # evicted - ранее отправленные модели, выпавшие из топа
+            extra.update(evicted=evicted, top_k=target.top_k.summary())
+        else:
+            target.status_counts.count_batch(batch)
+        if telemetry is not None:
+            extra["telemetry"] = {**telemetry, **target.status_fractions()}
+        if final and not (batch or extra.get("evicted")):
+            continue
+        print_progress_update(batch, total_calculated, total_models, extra or None, target.index)
+        sent += len(batch)
+    return sent
+
+def send_summaries(targets, total_calculated, total_models, multi_target, final=False):
+    # SUMMARY: сводка по каждой Y (config.summary), при нескольких Y - с полем target
+    for target in targets:
+        if target.summary is None:
+            continue
+        record = target.summary.record(total_calculated, total_models, final)
+        if multi_target:
+            record["target"] = target.name
+        with profile_stage('summary'):
+            line = f"{SUMMARY_PREFIX}{dumps_json(record)}"
+        print(line, flush=True)
+
+def parse_series(data):
+    # [[timestamp, value], ...] -> Series по возрастанию дат (без пустых и повторных дат)
+    df = pd.DataFrame(data, columns=['timestamp', 'value'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
+    df = df.dropna(subset=['timestamp']).set_index('timestamp')
+    series = df['value'].astype(float).sort_index()
+    return series[~series.index.duplicated(keep='first')]
 
 # --- Основная функция ---
-def run_regression_master(input_json_str):
+def run_regression_master(input_json_str, shard=None):
     processed_results = {}
     total_models_calculated = 0
+    master_started = time.time()
     try:
         payload = json.loads(input_json_str)
+        if shard is not None:
+            # --shard из командной строки - то же, что config.shard (входит в сигнатуру контрольной точки)
+            payload.setdefault('config', {})['shard'] = shard
         log_info("--- Starting Regression Master ---")
 
         # 1. Извлечение данных и конфигурации
-        y_spec = payload.get('dependentVariable')
+        # payload.dependentVariables - несколько зависимых переменных за один проход: матрица лагов,
+        # перечисление спецификаций и Z'Z общие, результаты отправляются отдельно по каждой цели (поле target)
+        multi_target = bool(payload.get('dependentVariables'))
+        y_specs = payload['dependentVariables'] if multi_target else [payload.get('dependentVariable')]
         all_x_spec = payload.get('regressors') # {name: [[ts, val],...], ...}
         config = payload.get('config', {})
 
-        if not y_spec or not y_spec.get('name') or not y_spec.get('data') or not all_x_spec:
+        if not all(y_spec and y_spec.get('name') and y_spec.get('data') for y_spec in y_specs) or not all_x_spec:
             raise ValueError("Invalid payload structure: missing dependentVariable or regressors.")
+        target_names = [y_spec['name'] for y_spec in y_specs]
+        if len(set(target_names)) != len(target_names):
+            raise ValueError(f"Dependent variable names must be unique, got {target_names}.")
 
-        log_info(f"Y: {y_spec['name']}")
+        # config.profile: время стадий и память, строки PROFILE: в stdout
+        profile_options = parse_profile_config(config.get('profile'))
+        if profile_options:
+            _profile_state["profiler"] = StageProfiler(profile_options)
+            _profile_state["profiler"].start()
+            log_info(f"Profiling: {profile_options}")
+
+        log_info(f"Y: {', '.join(target_names)}")
         log_info(f"Available X: {list(all_x_spec.keys())}")
         log_info(f"Config: {config}")
 
-        # 2. Подготовка данных Y
-        y_df = pd.DataFrame(y_spec['data'], columns=['timestamp', 'value'])
-        y_df['timestamp'] = pd.to_datetime(y_df['timestamp'], errors='coerce')
-        y_df = y_df.dropna(subset=['timestamp']).set_index('timestamp')
-        y_series = y_df['value'].astype(float).sort_index()
-        y_series = y_series[~y_series.index.duplicated(keep='first')]
-        if y_series.empty: raise ValueError("Dependent variable series is empty after cleaning.")
-
-        # 3. Подготовка данных X (всех)
-        all_x_df = pd.DataFrame(index=y_df.index)
-        for name, data in all_x_spec.items():
-            temp_df = pd.DataFrame(data, columns=['timestamp', 'value'])
-            temp_df['timestamp'] = pd.to_datetime(temp_df['timestamp'], errors='coerce')
-            temp_df = temp_df.dropna(subset=['timestamp']).set_index('timestamp')
-            temp_series = temp_df['value'].astype(float).sort_index()
-            temp_series = temp_series[~temp_series.index.duplicated(keep='first')]
-            all_x_df[name] = temp_series
-        all_x_df = all_x_df.reindex(y_series.index) # Выравниваем по Y
+        with profile_stage('data_prep'):
+            # 2. Подготовка данных Y
+            y_targets = []
+            for y_spec in y_specs:
+                y_series = parse_series(y_spec['data']).rename(y_spec['name'])
+                if y_series.empty: raise ValueError(f"Dependent variable '{y_spec['name']}' is empty after cleaning.")
+                y_targets.append(y_series)
+
+            # 3. Подготовка данных X (всех); по датам каждой Y они выравниваются в build_lag_matrices
+            x_series = {name: parse_series(data) for name, data in all_x_spec.items()}
 
         # 4. Генерация спецификаций и запуск моделей
         included_regressor_names = list(all_x_spec.keys())
         k = len(included_regressor_names)
         N = config.get('maxLagDepth', 0)
         constant_status = config.get('constantStatus', 'include')
-        lag_values = list(range(N + 1)) # [0, 1, ..., N]
+        num_workers = resolve_num_workers(config)
 
-        model_counter = 0
-        batch_results = {}
         last_update_time = time.time()
         models_since_last_update = 0
         UPDATE_INTERVAL_SECONDS = 1.5 # Как часто отправлять обновления (в секундах)
         UPDATE_BATCH_SIZE = 500      # Или каждые N моделей
 
-        log_info(f"Generating models: k={k}, N={N}, constant='{constant_status}'")
-
-        for m in range(k + 1): # Размер подмножества регрессоров
-            for subset_indices in itertools.combinations(range(k), m):
-                subset_names = [included_regressor_names[i] for i in subset_indices]
-
-                # Генерируем комбинации лагов для этого подмножества
-                lag_combinations = itertools.product(lag_values, repeat=m)
-
-                for lags in lag_combinations:
-                    regressors_with_lags = dict(zip(subset_names, lags))
-
-                    # Формируем спецификации в зависимости от статуса константы
-                    specs_to_run = []
-                    if constant_status == 'include':
-                        model_counter += 1
-                        specs_to_run.append({"model_id": f"m_{model_counter}", "regressors": regressors_with_lags, "include_constant": True})
-                    elif constant_status == 'exclude':
-                        if m > 0: # Не запускаем модель без регрессоров и без константы
-                            model_counter += 1
-                            specs_to_run.append({"model_id": f"m_{model_counter}", "regressors": regressors_with_lags, "include_constant": False})
-                    else: # constant_status == 'test'
-                        model_counter += 1
-                        specs_to_run.append({"model_id": f"m_{model_counter}_c", "regressors": regressors_with_lags, "include_constant": True})
-                        if m > 0: # Модель без регрессоров тестировать на константу нет смысла
-                            model_counter += 1
-                            specs_to_run.append({"model_id": f"m_{model_counter}_nc", "regressors": regressors_with_lags, "include_constant": False})
-
-                    # Запускаем OLS для каждой сформированной спецификации
-                    for current_spec in specs_to_run:
-                        model_id = current_spec["model_id"]
-                        # Запускаем OLS
-                        result = run_single_ols(y_series, all_x_df, current_spec, config, model_id)
-                        # !!! Результат уже очищен внутри run_single_ols !!!
-                        batch_results[model_id] = result # Сохраняем результат в батч
-                        total_models_calculated += 1
-                        models_since_last_update += 1
-
-                        # Проверяем, не пора ли отправить обновление прогресса
-                        current_time = time.time()
-                        if models_since_last_update >= UPDATE_BATCH_SIZE or (current_time - last_update_time) >= UPDATE_INTERVAL_SECONDS:
-                             # !!! Очищаем батч перед отправкой (хотя он уже должен быть чистым) !!!
-                             sanitized_batch = sanitize_for_json(batch_results)
-                             progress_update = {
-                                 "type": "progress",
-                                 "processed_batch": sanitized_batch, # Отправляем очищенный батч
-                                 "total_calculated": total_models_calculated
-                             }
-                             # Печатаем JSON в stdout + НОВАЯ СТРОКА
-                             # Используем allow_nan=False для дополнительной проверки, хотя sanitize_for_json должен все убрать
-                             print(f"PROGRESS_UPDATE:{json.dumps(progress_update, allow_nan=False)}", flush=True)
-                             log_info(f"Sent progress update. Batch size: {len(batch_results)}. Total calculated: {total_models_calculated}")
-                             # Сбрасываем батч и счетчики
-                             batch_results = {}
-                             models_since_last_update = 0
-                             last_update_time = current_time
+        spec_order = resolve_spec_order(config)
+        log_info(f"Generating models: k={k}, N={N}, constant='{constant_status}', workers={num_workers}, order='{spec_order}'")
+        space = SpecSpace(included_regressor_names, N, constant_status)
+        total_models = space.count()
+        spec_iter = space.iter_specs(spec_order)
+
+        # Все k*(N+1) лагированных колонок строятся один раз на задачу (при нескольких Y с разными датами -
+        # на каждый набор дат); lag_matrix - матрица первой Y, имена признаков и колонок у всех матриц общие
+        with profile_stage('lag_matrix'):
+            lag_matrices = build_lag_matrices(y_targets, x_series, N)
+            lag_matrix = lag_matrices[0]
+            log_info(f"Built lag matrix: {lag_matrix.values.shape[0]} rows x {lag_matrix.values.shape[1]} columns"
+                     + (f", distinct date ranges of Y: {len(set(map(id, lag_matrices)))}" if multi_target else ""))
+
+        # config.screening: путь elastic net по всей матрице лагов, перебор - только по лучшим колонкам
+        # (признак со своими отобранными лагами), ID моделей - как в полном пространстве
+        screening_options = parse_screening_config(config.get('screening'))
+        if screening_options:
+            screening_started = time.time()
+            with profile_stage('screening'):
+                screening_report, screened_lags = run_screening(y_targets, lag_matrices, screening_options)
+            models_before = total_models
+            space = space.restrict(screened_lags)
+            included_regressor_names = space.regressor_names
+            k = space.k
+            N = space.max_lag
+            total_models = space.count()
+            spec_iter = space.iter_specs(spec_order)
+            with profile_stage('lag_matrix'):
+                lag_matrices = build_lag_matrices(y_targets, {name: x_series[name] for name in included_regressor_names},
+                                                  N, screened_lags)
+                lag_matrix = lag_matrices[0]
+            screening_report.update(models_before=models_before, models_after=total_models,
+                                    elapsed_seconds=round(time.time() - screening_started, 4))
+            print(f"{SCREENING_PREFIX}{dumps_json(screening_report)}", flush=True)
+            log_info(f"Screening kept {len(screening_report['selected'])} of {screening_report['columns_total']} columns: "
+                     f"k={k}, N={N}, models {models_before} -> {total_models}")
+
+        search_mode = config.get('searchMode', 'exhaustive')
+        # leaps_and_bounds ранжирует спецификации на общей выборке - на ней же они и считаются,
+        # иначе AIC/BIC результатов могут противоречить best_per_size
+        common_samples = None
+        if config.get('commonSample') or search_mode == 'leaps_and_bounds':
+            common_samples = {}
+            with profile_stage('sample'):
+                for i, y_series in enumerate(y_targets):
+                    y_targets[i], common_sample = restrict_to_common_sample(y_series, lag_matrices[i])
+                    common_samples[y_series.name] = common_sample
+                    log_info(f"Common sample of {y_series.name}: {common_sample['n_obs']} rows, "
+                             f"{common_sample['start']} .. {common_sample['end']}")
+        targets = [SearchTarget(i, name) for i, name in enumerate(target_names)]
+
+        result_format = config.get('resultFormat', 'json')
+        if result_format == 'columnar':
+            _output_state["frame_encoder"] = ResultFrameEncoder(
+                lag_matrix.feature_names, N, METRIC_KEYS, [key for _, key, _ in DIAGNOSTICS])
+        elif result_format != 'json':
+            raise ValueError(f"Unknown resultFormat '{result_format}'")
+
+        search_summary = None
+        if search_mode == 'leaps_and_bounds':
+            if len(targets) > 1:
+                raise ValueError("searchMode 'leaps_and_bounds' selects specifications per Y and supports a single dependent variable.")
+            # Отобранных моделей немного - считаем их последовательно
+            with profile_stage('leaps_and_bounds'):
+                spec_iter, search_summary = run_leaps_and_bounds(y_targets[0], lag_matrix, space, config)
+            total_models = len(spec_iter)
+            num_workers = 1
+        elif search_mode == 'sample':
+            spec_iter, total_models, search_summary = sample_specs(space, config)
+        elif search_mode != 'exhaustive':
+            raise ValueError(f"Unknown searchMode '{search_mode}'")
+
+        # specOrder = 'promising': порядок зависит от данных и (при одном процессе) от уже посчитанных моделей
+        spec_priority = None
+        if spec_order == 'promising' and search_mode == 'exhaustive':
+            if config.get('shard'):
+                raise ValueError("specOrder 'promising' depends on the results of earlier models and cannot be sharded.")
+            spec_priority = PromisingOrder(space, y_targets, lag_matrices, adaptive=num_workers == 1)
+            spec_iter = spec_priority.iter_specs()
+            log_info(f"Promising-first order: adaptive={spec_priority.adaptive}, "
+                     f"top features {[included_regressor_names[i] for i in np.argsort(-spec_priority.feature_ranks(), kind='stable')[:5]]}")
+
+        # config.shard = 'i/n' (--shard i/n): i-я из n непрерывных частей перебора для запуска на нескольких
+        # машинах. Позиции и ID моделей - как при запуске целиком, части объединяет merge_shards.py
+        job_shard = None
+        shard_start = 0
+        if config.get('shard'):
+            if search_mode == 'leaps_and_bounds':
+                raise ValueError("searchMode 'leaps_and_bounds' is a single search over the whole space and cannot be sharded.")
+            shard_index, shard_count = parse_shard(config['shard'])
+            shard_start, shard_stop = shard_range(total_models, shard_index, shard_count)
+            if search_mode == 'exhaustive':
+                spec_iter = space.iter_specs(spec_order, start=shard_start, stop=shard_stop)
+            else:
+                spec_iter = itertools.islice(spec_iter, shard_start, shard_stop)
+            # Сведения о пространстве нужны merge_shards.py, чтобы проверить, что части от одной задачи;
+            # признаки и глубина лагов - полного пространства, в нем считаются ID (и после config.screening)
+            job_shard = {"index": shard_index, "count": shard_count, "start": shard_start, "stop": shard_stop,
+                         "job_models": total_models, "features": space.id_space.regressor_names, "max_lag": space.id_space.max_lag,
+                         "constant_status": constant_status, "targets": target_names}
+            log_info(f"Shard {shard_index}/{shard_count}: positions [{shard_start}, {shard_stop}) of {total_models}")
+            total_models = shard_stop - shard_start
+        log_info(f"Models to calculate: {total_models}")
+
+        # config.timeBudgetSeconds / maxModels / stopAfterValid: перебор останавливается между моделями (truncated)
+        search_budget = None
+        search_limits = parse_search_limits(config)
+        if search_limits:
+            search_budget = SearchBudget(search_limits, master_started, target_names)
+            log_info(f"Search limits: {search_limits}")
+
+        # config.topK: держим только K лучших моделей (своих для каждой Y), в поток идут лишь изменения топа
+        top_k_mode = bool(config.get('topK'))
+        if top_k_mode:
+            for target in targets:
+                target.top_k = TopKResults(config['topK'], config.get('topKCriterion', 'aic'), config.get('topKValidFirst', True))
+            top_k = targets[0].top_k
+            if top_k.criterion == 'rmse' and not config.get('metrics', {}).get('rmse'):
+                log_warn("topKCriterion 'rmse' requires metrics.rmse, enabling it.")
+                config = {**config, 'metrics': {**config.get('metrics', {}), 'rmse': True}}
+            log_info(f"Top-K mode: K={top_k.k}, criterion='{top_k.criterion}', valid_first={top_k.valid_first}")
+
+        # config.summary: счетчики, гистограммы, частоты признаков и лучшие модели по размеру (SUMMARY:)
+        summary_options = parse_summary_config(config.get('summary'), config.get('topKCriterion', 'aic'))
+        if summary_options:
+            if summary_options["criterion"] == 'rmse' and not config.get('metrics', {}).get('rmse'):
+                log_warn("Summary criterion 'rmse' requires metrics.rmse, enabling it.")
+                config = {**config, 'metrics': {**config.get('metrics', {}), 'rmse': True}}
+            for target in targets:
+                target.summary = ModelSpaceSummary(lag_matrix.feature_names, N, summary_options)
+            log_info(f"Model space summary: bins={summary_options['bins']}, criterion='{summary_options['criterion']}'")
+
+        # Контрольные точки (config.checkpointDir) и продолжение с последней из них (payload.resume)
+        checkpointer = None
+        start_position = shard_start # Позиция первой спецификации, которую надо посчитать
+        replayed_results = [] # Сохраненные результаты до курсора: заново отправляем в Node (там новая задача)
+        checkpoint_state = None
+        resume = payload.get('resume')
+        checkpoint_dir = resume if isinstance(resume, str) else config.get('checkpointDir')
+        if resume and not checkpoint_dir:
+            raise ValueError("resume requires config.checkpointDir or a checkpoint directory path.")
+        if checkpoint_dir:
+            store_results = bool(config.get('checkpointResults', False))
+            if store_results and top_k_mode:
+                log_warn("checkpointResults is ignored in top-K mode: the checkpoint keeps the top-K heap instead.")
+                store_results = False
+            checkpointer = Checkpointer(checkpoint_dir, job_signature(payload, spec_order),
+                                        config.get('checkpointIntervalSeconds', DEFAULT_INTERVAL_SECONDS), store_results)
+            checkpoint_state = checkpointer.load() if resume else None
+            if checkpoint_state is None:
+                if resume:
+                    log_warn(f"No checkpoint found in '{checkpoint_dir}', starting from the beginning.")
+                checkpointer.start_fresh(shard_start)
+            else:
+                start_position = checkpointer.cursor
+                total_models_calculated = checkpoint_state["total_models_calculated"]
+                if top_k_mode and checkpoint_state.get("top_k"):
+                    # Несколько Y - список состояний по номеру цели
+                    top_k_states = checkpoint_state["top_k"] if multi_target else [checkpoint_state["top_k"]]
+                    for target, top_k_state in zip(targets, top_k_states):
+                        target.top_k.restore(top_k_state)
+                summary_states = checkpoint_state.get("summary")
+                if summary_options and summary_states:
+                    for target, summary_state in zip(targets, summary_states if multi_target else [summary_states]):
+                        target.summary.restore(summary_state)
+                if search_budget is not None and checkpoint_state.get("search_limits"):
+                    search_budget.restore(checkpoint_state["search_limits"])
+                if spec_priority is not None:
+                    if checkpoint_state.get("spec_order"):
+                        spec_priority.restore(checkpoint_state["spec_order"])
+                    spec_iter = spec_priority.iter_specs(start=start_position)
+                elif search_mode == 'exhaustive':
+                    # Без прохода по посчитанному префиксу
+                    spec_iter = space.iter_specs(spec_order, start=start_position, stop=shard_start + total_models)
+                else:
+                    spec_iter = itertools.islice(spec_iter, start_position - shard_start, None)
+                replayed_results = checkpointer.stored_results()
+                log_info(f"Resuming from checkpoint: cursor={start_position}, replaying {len(replayed_results)} stored results")
+            log_info(f"Checkpoints: dir='{checkpoint_dir}', every {checkpointer.interval_seconds}s, store results={store_results}")
+
+        if config.get('resultStore'):
+            # При продолжении с контрольной точки строки, записанные до курсора, остаются в базе
+            for target in targets:
+                if multi_target:
+                    store_path = target_store_path(config['resultStore'], target.index)
+                    _output_state["result_stores"].append(ResultStore(store_path, space.id_space, fresh=start_position == shard_start, target=target.name))
+                else:
+                    store_path = config['resultStore']
+                    _output_state["result_stores"].append(ResultStore(store_path, space.id_space, fresh=start_position == shard_start))
+                log_info(f"Result store: '{store_path}'")
+        # Сводка без сохраненного состояния (контрольная точка записана без config.summary) - по сохраненным результатам
+        replay_summary = bool(summary_options) and not (checkpoint_state or {}).get("summary")
+        for i in range(0, len(replayed_results), UPDATE_BATCH_SIZE):
+            for target in targets:
+                # Несколько Y - сохранен список результатов по номеру цели
+                target.batch = {model_id: stored[target.index] if multi_target else stored
+                                for model_id, stored in replayed_results[i:i + UPDATE_BATCH_SIZE]}
+                if replay_summary:
+                    for model_id, result in target.batch.items():
+                        target.summary.add(model_id, result)
+            send_target_updates(targets, total_models_calculated, total_models, multi_target)
+
+        # config.modelCache: результаты моделей, уже посчитанных на тех же данных (в том числе другими задачами)
+        model_cache = None
+        if config.get('modelCache'):
+            model_cache = ModelCache(config['modelCache'], y_targets, lag_matrices, config)
+            log_info(f"Model cache: '{config['modelCache']}', limit {model_cache.max_bytes // (1024 * 1024)} MB")
+
+        if num_workers > 1:
+            signal.signal(signal.SIGTERM, _terminate_on_sigterm)
+            model_results = run_specs_parallel(spec_iter, y_targets, lag_matrices, config, num_workers, start_position, model_cache)
+        else:
+            engine = create_engine(y_targets, lag_matrices, config)
+            if engine is not None:
+                log_info("Using sufficient-statistics OLS engine")
+            # Запускаем OLS для каждой сформированной спецификации (по всем зависимым переменным)
+            model_results = ((position, spec["model_id"],
+                              run_spec_targets(y_targets, lag_matrices, spec, config, engine, model_cache))
+                             for position, spec in enumerate(spec_iter, start_position))
+        if checkpointer is not None:
+            # Курсор покрывает только непрерывный префикс - учитываем результаты строго по порядку
+            model_results = iter_in_order(model_results, start_position)
+            signal.signal(signal.SIGTERM, _request_stop)
+
+        def current_checkpoint_state():
+            top_k_state = None
+            if top_k_mode:
+                top_k_states = [target.top_k.state() for target in targets]
+                top_k_state = top_k_states if multi_target else top_k_states[0]
+            summary_state = None
+            if summary_options:
+                summary_states = [target.summary.state() for target in targets]
+                summary_state = summary_states if multi_target else summary_states[0]
+            return {"total_models_calculated": total_models_calculated, "top_k": top_k_state, "summary": summary_state,
+                    "search_limits": search_budget.state() if search_budget is not None else None,
+                    "spec_order": spec_priority.state() if spec_priority is not None else None}
+
+        # Скорость и прогноз окончания в апдейтах (поле telemetry) - по моделям, посчитанным этим процессом
+        progress_telemetry = ProgressTelemetry(master_started, total_models_calculated)
+        stopped = False
+        for position, model_id, results in model_results:
+            # !!! Результат уже очищен внутри run_single_ols !!!
+            for target in targets:
+                if target.summary is not None:
+                    with profile_stage('summary'):
+                        target.summary.add(model_id, results[target.index])
+                if target.top_k is not None:
+                    with profile_stage('top_k'):
+                        target.top_k.offer(model_id, results[target.index]) # В батч попадет, только если войдет в топ
+                else:
+                    target.batch[model_id] = results[target.index] # Сохраняем результат в батч
+            if search_budget is not None:
+                search_budget.count(results)
+            if spec_priority is not None and spec_priority.adaptive:
+                with profile_stage('spec_order'):
+                    spec_priority.observe(results)
+            total_models_calculated += 1
+            models_since_last_update += 1
+            if checkpointer is not None:
+                with profile_stage('checkpoint'):
+                    checkpointer.advance(position, model_id, results if multi_target else results[0])
+
+            # Проверяем, не пора ли отправить обновление прогресса
+            current_time = time.time()
+            if models_since_last_update >= UPDATE_BATCH_SIZE or (current_time - last_update_time) >= UPDATE_INTERVAL_SECONDS:
+                 batch_size = send_target_updates(targets, total_models_calculated, total_models, multi_target,
+                                                  telemetry=progress_telemetry.snapshot(total_models_calculated, total_models))
+                 if model_cache is not None:
+                     with profile_stage('cache'):
+                         model_cache.flush()
+                 send_summaries(targets, total_models_calculated, total_models, multi_target)
+                 log_info(f"Sent progress update. Batch size: {batch_size}. Total calculated: {total_models_calculated}")
+                 if _profile_state["profiler"] is not None and _profile_state["profiler"].due():
+                     print_profile(total_models_calculated)
+                 # Сбрасываем счетчики
+                 models_since_last_update = 0
+                 last_update_time = current_time
+
+            if checkpointer is not None:
+                with profile_stage('checkpoint'):
+                    checkpointer.maybe_save(current_checkpoint_state)
+                if _stop_state["requested"]:
+                    stopped = True
+                    break
+            if search_budget is not None and search_budget.exhausted(total_models_calculated, total_models):
+                log_info(f"Search limit reached ({search_budget.stop_reason}): "
+                         f"{total_models_calculated} of {total_models} models calculated")
+                break
+        truncated = search_budget is not None and search_budget.stop_reason is not None
+        if stopped or truncated:
+            model_results.close() # Закрывает генераторы, пул воркеров завершается
+        if checkpointer is not None:
+            checkpointer.maybe_save(current_checkpoint_state, force=True)
+            log_info(f"Checkpoint saved: cursor={checkpointer.cursor}")
 
         # Отправляем оставшиеся результаты, если они есть
-        if batch_results:
-            # !!! Очищаем финальный батч перед отправкой !!!
-            sanitized_batch = sanitize_for_json(batch_results)
-            progress_update = {
-                "type": "progress",
-                "processed_batch": sanitized_batch, # Отправляем очищенный батч
-                "total_calculated": total_models_calculated
-            }
-            print(f"PROGRESS_UPDATE:{json.dumps(progress_update, allow_nan=False)}", flush=True)
-            log_info(f"Sent final batch update. Batch size: {len(batch_results)}. Total calculated: {total_models_calculated}")
+        final_telemetry = progress_telemetry.snapshot(total_models_calculated, total_models)
+        batch_size = send_target_updates(targets, total_models_calculated, total_models, multi_target, final=True,
+                                         telemetry=final_telemetry)
+        send_summaries(targets, total_models_calculated, total_models, multi_target, final=True)
+        log_info(f"Sent final batch update. Batch size: {batch_size}. Total calculated: {total_models_calculated}")
 
         # Финальное сообщение
         final_result = {
             "type": "final",
-            "status": "finished",
+            "status": "stopped" if stopped else "finished",
             "total_models_calculated": total_models_calculated,
-            "message": "Regression search finished successfully."
+            "total_models": total_models,
+            "message": "Regression search stopped, checkpoint saved." if stopped else
+                       f"Regression search finished early: {search_budget.stop_reason} limit reached." if truncated else
+                       "Regression search finished successfully.",
+            # Перебор с лимитами: посчитана только часть пространства (самые перспективные модели при specOrder 'promising')
+            "truncated": truncated,
+            "coverage": round(total_models_calculated / total_models, 6) if total_models else 1.0,
+        }
+        if search_budget is not None:
+            final_result["limits"] = search_budget.summary()
+        if search_summary is not None:
+            final_result["search"] = search_summary
+        # Итог telemetry: время работы, средняя скорость этого процесса и доли статусов (при нескольких Y - по целям)
+        fractions = {target.name: target.status_fractions() for target in targets}
+        final_result["telemetry"] = {
+            "elapsed_seconds": final_telemetry["elapsed_seconds"],
+            "models_per_second": progress_telemetry.average_rate(total_models_calculated),
+            **({"by_target": fractions} if multi_target else fractions[target_names[0]]),
         }
-        # !!! Очищаем финальный результат перед отправкой !!!
-        sanitized_final_result = sanitize_for_json(final_result)
-        print(f"FINAL_RESULT:{json.dumps(sanitized_final_result, allow_nan=False)}", flush=True)
+        if job_shard is not None:
+            final_result["shard"] = job_shard
+        # Сводки по целям: при нескольких Y - словари {имя Y: сводка}
+        if multi_target:
+            final_result["targets"] = target_names
+        if common_samples is not None:
+            final_result["common_sample"] = common_samples if multi_target else common_samples[target_names[0]]
+        if model_cache is not None:
+            model_cache.close()
+            final_result["model_cache"] = model_cache.stats
+            log_info(f"Model cache: {model_cache.stats}")
+        if top_k_mode:
+            top_k_results = {target.name: {**target.top_k.summary(), "ranking": target.top_k.ranking()} for target in targets}
+            final_result["top_k"] = top_k_results if multi_target else top_k_results[target_names[0]]
+        finish_result_store(final_result)
+        print_profile(total_models_calculated, final=True)
+        print(f"FINAL_RESULT:{dumps_json(final_result)}", flush=True)
         log_info("Regression Master Finished.")
 
     except Exception as e:
@@ -338,10 +1002,16 @@ def run_regression_master(input_json_str):
             "total_models_calculated": total_models_calculated,
             "error": f"Master script failed: {str(e)}"
         }
-        # !!! Очищаем результат ошибки перед отправкой !!!
-        sanitized_error_result = sanitize_for_json(error_result)
+        try:
+            finish_result_store(error_result)
+        except Exception as store_e:
+            log_error(f"Failed to record the error in the result store: {store_e}")
+        try:
+            print_profile(total_models_calculated, final=True)
+        except Exception as profile_e:
+            log_error(f"Failed to write the profile: {profile_e}")
         # Печатаем ошибку в stdout, чтобы Node.js ее получил как финальный результат
-        print(f"FINAL_RESULT:{json.dumps(sanitized_error_result, allow_nan=False)}", flush=True)
+        print(f"FINAL_RESULT:{dumps_json(error_result)}", flush=True)
 
     finally:
         # Выводим все логи в stderr в самом конце
@@ -350,5 +1020,8 @@ def run_regression_master(input_json_str):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regression search master: payload JSON on stdin, results on stdout.")
+    parser.add_argument("--shard", help="run only part i of n of the search (e.g. 2/8), see merge_shards.py")
+    args = parser.parse_args()
     input_json_str = sys.stdin.read()
-    run_regression_master(input_json_str)
\ No newline at end of file
+    run_regression_master(input_json_str, args.shard)
\ No newline at end of file
@@ -3,11 +3,11 @@ import sys
 import json
 import traceback
 import pandas as pd
-import numpy as np
-import statsmodels.api as sm
+from statsmodels.regression.linear_model import OLS
+from statsmodels.tools.tools import add_constant
 import io
-import math
-from datetime import datetime
+from lag_matrix import LagMatrix
+from json_encoding import dumps as dumps_json, series_pairs
 
 # --- Функции логирования (пишем в буфер, выводим в stderr в конце) ---
 log_buffer = io.StringIO()
@@ -15,27 +15,6 @@ def log_error(message): print(f"ERROR_DECOMP: {message}", file=log_buffer)
 def log_info(message): print(f"INFO_DECOMP: {message}", file=log_buffer)
 def log_warn(message): print(f"WARN_DECOMP: {message}", file=log_buffer)
 
-# --- Функция для очистки данных от невалидных JSON значений (NaN/inf) ---
-def sanitize_for_json(data):
-    if isinstance(data, dict):
-        return {k: sanitize_for_json(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [sanitize_for_json(item) for item in data]
-    elif isinstance(data, float):
-        if math.isinf(data) or math.isnan(data):
-            return None
-        return data
-    elif isinstance(data, (np.float_, np.float16, np.float32, np.float64)):
-        if np.isinf(data) or np.isnan(data):
-            return None
-        return float(data)
-    elif isinstance(data, (np.int_, np.intc, np.intp, np.int8, np.int16, np.int32, np.int64, np.uint8, np.uint16, np.uint32, np.uint64)):
-         return int(data)
-    elif isinstance(data, (datetime, pd.Timestamp)):
-         # Преобразуем datetime в ISO строку для JSON
-         return data.isoformat()
-    return data
-
 # --- Функция для преобразования Series в формат [[timestamp_iso, value]] ---
 def series_to_list(series):
     # Убедимся, что индекс - это DatetimeIndex
@@ -47,14 +26,8 @@ def series_to_list(series):
             log_error(f"Failed to convert series index to DatetimeIndex: {e}")
             return [] # Возвращаем пустой список в случае ошибки
 
-    # Заменяем NaN/inf на None перед преобразованием
-    series_clean = series.replace([np.inf, -np.inf], np.nan).where(pd.notna(series), None)
-
-    # Преобразуем в нужный формат
-    return [
-        [timestamp.isoformat(), value]
-        for timestamp, value in series_clean.items()
-    ]
+    # NaN/inf -> None и ISO-даты - одним проходом по массиву, без поэлементной очистки
+    return series_pairs(series)
 
 # --- Основная функция расчета декомпозиции ---
 def calculate_decomposition(payload):
@@ -105,22 +78,30 @@ def calculate_decomposition(payload):
 
         log_info(f"Prepared all X DataFrame, shape: {all_x_df.shape}")
 
-        # 4. Создание лагированных признаков для *конкретной* модели
-        X_lagged_df = pd.DataFrame(index=y_series.index)
-        final_regressor_names = []
-        for feature, lag in regressors_with_lags.items():
-            if feature in all_x_df.columns:
-                lagged_col_name = f"{feature}_L{lag}"
-                if lag == 0:
-                    X_lagged_df[lagged_col_name] = all_x_df[feature]
-                elif lag > 0:
-                    X_lagged_df[lagged_col_name] = all_x_df[feature].shift(lag)
-                else:
-                    log_warn(f"Invalid lag {lag} for feature {feature} in specification, skipping.")
-                    continue # Пропускаем этот регрессор
-                final_regressor_names.append(lagged_col_name)
-            else:
+        # 4. Лагированные признаки для *конкретной* модели - срез матрицы лагов
+        max_lag = max((lag for lag in regressors_with_lags.values() if isinstance(lag, int) and lag >= 0), default=0)
+        lag_matrix = LagMatrix(all_x_df, max_lag)
+        final_regressor_names, lag_columns, skipped = lag_matrix.select(regressors_with_lags)
+        for feature, lag, reason in skipped:
+            if reason == 'missing_feature':
                 log_warn(f"Feature '{feature}' specified in model but not found in available regressors, skipping.")
+            else:
+                log_warn(f"Invalid lag {lag} for feature {feature} in specification, skipping.")
+        X_lagged_df = lag_matrix.frame(lag_columns, final_regressor_names)
+
+        # Задача с config.commonSample: модель оценивалась на общей выборке перебора (Y и все регрессоры
+        # на всех лагах до maxLagDepth), декомпозиция считается на тех же строках. С config.screening
+        # перебор шел только по отобранным колонкам - {признак: лаги} приходят в commonSampleLags
+        common_sample_lag = payload.get('commonSampleMaxLag')
+        if common_sample_lag is not None:
+            common_lags = payload.get('commonSampleLags')
+            if common_lags is None:
+                common_matrix = LagMatrix(all_x_df, int(common_sample_lag))
+            else:
+                common_matrix = LagMatrix(all_x_df[list(common_lags)], int(common_sample_lag), common_lags)
+            y_series = y_series.where(common_matrix.common_sample_mask(y_series))
+            log_info(f"Restricted Y to the common sample ({len(common_matrix.column_names)} lagged columns, "
+                     f"maxLagDepth={common_sample_lag}): {int(y_series.notna().sum())} rows")
 
         log_info(f"Created lagged X for model, shape: {X_lagged_df.shape}, columns: {final_regressor_names}")
 
@@ -137,14 +118,14 @@ def calculate_decomposition(payload):
 
         # 6. Добавление константы
         if include_constant:
-            X_final = sm.add_constant(X_clean, has_constant='add')
+            X_final = add_constant(X_clean, has_constant='add')
             log_info("Added constant to X.")
         else:
             X_final = X_clean
 
         # 7. Запуск OLS
         log_info("Fitting OLS model...")
-        model_results = sm.OLS(Y_clean, X_final).fit()
+        model_results = OLS(Y_clean, X_final).fit()
         log_info("OLS fitting complete.")
 
         # 8. Получение коэффициентов
@@ -175,16 +156,13 @@ def calculate_decomposition(payload):
             "contributions": {name: series_to_list(series) for name, series in contributions.items()}
         }
 
-        # 12. Очистка результата перед выводом
-        sanitized_output = sanitize_for_json(output_data)
         log_info("Decomposition calculation finished successfully.")
-        return sanitized_output
+        return output_data
 
     except Exception as e:
         log_error(f"Error during decomposition calculation: {str(e)}")
         traceback.print_exc(file=log_buffer)
-        # Возвращаем очищенный результат ошибки
-        return sanitize_for_json({"error": f"Decomposition failed: {str(e)}"})
+        return {"error": f"Decomposition failed: {str(e)}"}
 
     finally:
         # Выводим все логи в stderr в самом конце
@@ -206,9 +184,8 @@ if __name__ == "__main__":
         # Выполняем расчет
         result_data = calculate_decomposition(payload)
 
-        # Печатаем результат (JSON) в stdout
-        # Используем allow_nan=False для доп. проверки, хотя sanitize должен все убрать
-        print(json.dumps(result_data, allow_nan=False))
+        # Печатаем результат (JSON) в stdout; NaN/inf -> null при кодировании
+        print(dumps_json(result_data))
 
     except json.JSONDecodeError as json_err:
         # Ошибка парсинга JSON
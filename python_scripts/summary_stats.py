@@ -0,0 +1,171 @@
+# python_scripts/summary_stats.py
+"""
+Сводка пространства моделей для дашборда (config.summary): считается в мастере по мере готовности
+моделей, в stdout уходит компактной записью SUMMARY:{json} вместе с апдейтами и один раз в конце
+(final: true). Сводка не зависит от числа моделей, и дашборду не нужно сканировать все результаты.
+
+В записи:
+  counts       - completed / valid / invalid / skipped / error;
+  histograms   - R2, adj. R2 и AIC завершенных моделей: config.summary.bins корзин одной ширины.
+                 Диапазон растет удвоением ширины (соседние корзины сливаются), поэтому гистограмма
+                 точна для всех уже учтенных моделей без второго прохода;
+  inclusion    - сколько валидных моделей включают признак (и с каким лагом), доля от валидных;
+  best_by_size - лучшая модель для каждого числа регрессоров по config.summary.criterion
+                 (по умолчанию topKCriterion или aic), валидные раньше невалидных - как в режиме topK.
+config.summary = true или словарь {bins, criterion}.
+"""
+import numpy as np
+
+from lag_matrix import LagMatrix
+from top_k import TOP_K_CRITERIA, TopKResults
+
+SUMMARY_PREFIX = "SUMMARY:"
+DEFAULT_BINS = 20
+# Поле результата -> начальный диапазон гистограммы (None - по первым значениям)
+HISTOGRAM_FIELDS = {"rsquared": (0.0, 1.0), "rsquared_adj": (0.0, 1.0), "aic": None}
+
+
+def parse_summary_config(value, default_criterion="aic"):
+    """config.summary -> словарь настроек или None (сводка выключена)."""
+    if not value:
+        return None
+    options = value if isinstance(value, dict) else {}
+    bins = max(2, int(options.get('bins', DEFAULT_BINS)))
+    criterion = options.get('criterion', default_criterion)
+    if criterion not in TOP_K_CRITERIA:
+        raise ValueError(f"Unknown summary criterion '{criterion}', expected one of {TOP_K_CRITERIA}")
+    return {"bins": bins + bins % 2, # Четное число: при удвоении ширины корзины сливаются попарно
+            "criterion": criterion}
+
+
+class AdaptiveHistogram:
+    """Гистограмма с фиксированным числом корзин одной ширины; диапазон расширяется удвоением ширины."""
+
+    def __init__(self, bins, initial_range=None):
+        self.bins = bins
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.start = self.width = None
+        self.min = self.max = None
+        if initial_range is not None:
+            self.start = initial_range[0]
+            self.width = (initial_range[1] - initial_range[0]) / bins
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+        low, high = float(values.min()), float(values.max())
+        if self.start is None:
+            self.start = low
+            self.width = (high - low) / self.bins if high > low else 1.0
+        half = self.bins // 2
+        while low < self.start:
+            # Влево: старые корзины попарно сливаются в правую половину
+            self.counts = np.concatenate([np.zeros(half, dtype=np.int64), self.counts.reshape(half, 2).sum(axis=1)])
+            self.start -= self.bins * self.width
+            self.width *= 2
+        while high > self.start + self.bins * self.width:
+            self.counts = np.concatenate([self.counts.reshape(half, 2).sum(axis=1), np.zeros(half, dtype=np.int64)])
+            self.width *= 2
+        positions = np.clip(((values - self.start) / self.width).astype(np.int64), 0, self.bins - 1)
+        self.counts += np.bincount(positions, minlength=self.bins)
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def to_dict(self):
+        return {"start": self.start, "width": self.width, "counts": self.counts.tolist(),
+                "min": self.min, "max": self.max}
+
+    def restore(self, state):
+        self.start, self.width, self.min, self.max = state["start"], state["width"], state["min"], state["max"]
+        self.counts = np.array(state["counts"], dtype=np.int64)
+
+
+class ModelSpaceSummary:
+    def __init__(self, feature_names, max_lag, options):
+        self.feature_names = list(feature_names)
+        self.max_lag = max_lag
+        self.bins = options["bins"]
+        self.criterion = options["criterion"]
+        # Имя коэффициента -> (признак, лаг); имена как в LagMatrix.column_name
+        self._columns = {LagMatrix.column_name(feature, lag): (feature, lag)
+                         for feature in self.feature_names for lag in range(max_lag + 1)}
+        self.counts = {"completed": 0, "valid": 0, "invalid": 0, "skipped": 0, "error": 0}
+        self.histograms = {field: AdaptiveHistogram(self.bins, initial_range)
+                           for field, initial_range in HISTOGRAM_FIELDS.items()}
+        self.inclusion = {feature: [0] * (max_lag + 1) for feature in self.feature_names} # Лаг -> число валидных моделей
+        self.best_by_size = {} # Число регрессоров -> TopKResults(1)
+        self._pending_values = {field: [] for field in HISTOGRAM_FIELDS}
+
+    def add(self, model_id, result):
+        status = result.get("status")
+        if status != "completed":
+            self.counts["error" if status == "error" else "skipped"] += 1
+            return
+        data = result["data"]
+        self.counts["completed"] += 1
+        for field, values in self._pending_values.items():
+            value = data.get(field)
+            if value is not None:
+                values.append(value)
+        regressors = [self._columns[name] for name in data.get("coefficients", {}) if name in self._columns]
+        if data.get("is_valid"):
+            self.counts["valid"] += 1
+            for feature, lag in regressors:
+                self.inclusion[feature][lag] += 1
+        else:
+            self.counts["invalid"] += 1
+        best = self.best_by_size.get(len(regressors))
+        if best is None:
+            best = self.best_by_size[len(regressors)] = TopKResults(1, self.criterion)
+        best.offer(model_id, result)
+
+    def _flush_histograms(self):
+        # Значения копятся списком и раскладываются по корзинам одним вызовом numpy на отправку
+        for field, values in self._pending_values.items():
+            if values:
+                self.histograms[field].add(values)
+                values.clear()
+
+    def record(self, total_calculated, total_models, final=False):
+        self._flush_histograms()
+        valid = self.counts["valid"]
+        inclusion = {}
+        for feature, lag_counts in self.inclusion.items():
+            count = sum(lag_counts)
+            inclusion[feature] = {"count": count, "share": round(count / valid, 4) if valid else None, "lags": lag_counts}
+        best_by_size = {}
+        for size, best in sorted(self.best_by_size.items()):
+            entry = best.best()
+            if entry is None:
+                continue
+            model_id, result = entry
+            data = result["data"]
+            value = data.get("rsquared_adj") if self.criterion == "adj_r2" else \
+                data.get("metrics", {}).get("rmse") if self.criterion == "rmse" else data.get(self.criterion)
+            best_by_size[str(size)] = {"model_id": model_id, "value": value, "is_valid": bool(data.get("is_valid")),
+                                       "regressors": [name for name in data.get("coefficients", {}) if name != "const"]}
+        return {"type": "summary", "final": final, "total_calculated": total_calculated, "total_models": total_models,
+                "counts": dict(self.counts), "criterion": self.criterion,
+                "histograms": {field: histogram.to_dict() for field, histogram in self.histograms.items()},
+                "inclusion": inclusion, "best_by_size": best_by_size}
+
+    # --- Контрольные точки (checkpoint.py) ---
+    def state(self):
+        self._flush_histograms()
+        return {"counts": dict(self.counts),
+                "histograms": {field: histogram.to_dict() for field, histogram in self.histograms.items()},
+                "inclusion": self.inclusion,
+                "best_by_size": {str(size): best.state() for size, best in self.best_by_size.items()}}
+
+    def restore(self, state):
+        self.counts = dict(state["counts"])
+        for field, histogram_state in state["histograms"].items():
+            self.histograms[field].restore(histogram_state)
+        self.inclusion = {feature: list(lag_counts) for feature, lag_counts in state["inclusion"].items()}
+        self.best_by_size = {}
+        for size, best_state in state["best_by_size"].items():
+            best = self.best_by_size[int(size)] = TopKResults(1, self.criterion)
+            best.restore(best_state)
+
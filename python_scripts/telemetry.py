@@ -0,0 +1,76 @@
+# python_scripts/telemetry.py
+"""
+Скорость и прогноз окончания перебора step3_run_regression_master.py - поле telemetry апдейтов.
+
+Скорость - по скользящему окну (WINDOW_SECONDS) из отметок (время, посчитано моделей), которые
+ставятся при каждой отправке апдейта, а не на каждую модель. До первой полной отметки окна - средняя
+скорость с начала перебора этим процессом (после продолжения с контрольной точки префикс не считается).
+Доли skipped/error/valid считаются по результатам, уже прошедшим через батчи (в режиме topK - по
+счетчикам топа), поэтому цикл по моделям не меняется.
+"""
+import collections
+import time
+from datetime import datetime, timedelta, timezone
+
+WINDOW_SECONDS = 30
+
+
+class ProgressTelemetry:
+    def __init__(self, started, calculated_at_start=0):
+        self.started = started # Время запуска мастера (time.time())
+        self._start_mark = (time.time(), calculated_at_start)
+        self._marks = collections.deque([self._start_mark])
+
+    def snapshot(self, total_calculated, total_models):
+        """Общие для всех зависимых переменных поля: прошедшее время, скорость, остаток и прогноз."""
+        now = time.time()
+        marks = self._marks
+        marks.append((now, total_calculated))
+        # Оставляем одну отметку старше окна: скорость считается ровно за последние WINDOW_SECONDS
+        while len(marks) > 2 and marks[1][0] <= now - WINDOW_SECONDS:
+            marks.popleft()
+        first_time, first_calculated = marks[0]
+        rate = (total_calculated - first_calculated) / (now - first_time) if now > first_time else None
+        remaining = max(0, total_models - total_calculated)
+        eta = remaining / rate if rate else None
+        if remaining == 0:
+            eta = 0.0
+        return {
+            "elapsed_seconds": round(now - self.started, 3),
+            "models_per_second": None if rate is None else round(rate, 2),
+            "window_seconds": round(now - first_time, 3),
+            "remaining": remaining,
+            "eta_seconds": None if eta is None else round(eta, 1),
+            "finish_at": None if eta is None else
+                (datetime.now(timezone.utc) + timedelta(seconds=eta)).isoformat(timespec="seconds"),
+        }
+
+    def average_rate(self, total_calculated):
+        """Средняя скорость с начала перебора этим процессом."""
+        start_time, start_calculated = self._start_mark
+        elapsed = time.time() - start_time
+        return round((total_calculated - start_calculated) / elapsed, 2) if elapsed > 0 else None
+
+
+class StatusCounts:
+    """Счетчики результатов одной зависимой переменной по статусу и валидности."""
+
+    def __init__(self):
+        self.counts = {"completed": 0, "valid": 0, "skipped": 0, "error": 0}
+
+    def count_batch(self, batch):
+        counts = self.counts
+        for result in batch.values():
+            status = result.get("status")
+            if status in counts:
+                counts[status] += 1
+            if status == "completed" and result.get("data", {}).get("is_valid"):
+                counts["valid"] += 1
+
+    def fractions(self, counts=None):
+        """Доли от учтенных результатов; counts - готовые счетчики (режим topK)."""
+        counts = self.counts if counts is None else counts
+        counted = counts["completed"] + counts["skipped"] + counts["error"]
+        return {"counted": counted,
+                **{f"{key}_fraction": round(counts[key] / counted, 4) if counted else None
+                   for key in ("valid", "skipped", "error")}}
@@ -0,0 +1,105 @@
+# python_scripts/top_k.py
+"""
+Режим config.topK для step3_run_regression_master.py: хранятся только K лучших моделей.
+
+Куча из K результатов по критерию (config.topKCriterion: aic, bic, adj_r2, rmse), валидные модели
+(is_valid) по умолчанию идут раньше невалидных. В поток уходят только изменения кучи: новые
+результаты, попавшие в топ, и ID ранее отправленных, но вытесненных моделей. Остальное - счетчики.
+Память O(K) независимо от размера перебора.
+"""
+import heapq
+import math
+
+TOP_K_CRITERIA = ("aic", "bic", "adj_r2", "rmse")
+
+
+class TopKResults:
+    def __init__(self, k, criterion="aic", valid_first=True):
+        if criterion not in TOP_K_CRITERIA:
+            raise ValueError(f"Unknown topKCriterion '{criterion}', expected one of {TOP_K_CRITERIA}")
+        self.k = max(1, int(k))
+        self.criterion = criterion
+        self.valid_first = valid_first
+        # Куча "худший сверху": элементы (-invalid, -значение, -порядковый номер, model_id, результат)
+        self._heap = []
+        self._pending = {}  # Попали в топ после последней отправки
+        self._sent = set()  # Уже отправлены и пока в топе
+        self._evicted = []  # Отправлены раньше, теперь вытеснены
+        self._offered = 0
+        self.counts = {"completed": 0, "valid": 0, "skipped": 0, "error": 0, "discarded": 0}
+
+    def _value(self, data):
+        # Меньше - лучше; отсутствующее значение (None после очистки, NaN в колоночном формате) - хуже любого
+        if self.criterion == "adj_r2":
+            value = data.get("rsquared_adj")
+            return math.inf if value is None or math.isnan(value) else -value
+        if self.criterion == "rmse":
+            value = data.get("metrics", {}).get("rmse")
+        else:
+            value = data.get(self.criterion)
+        return math.inf if value is None or math.isnan(value) else value
+
+    def offer(self, model_id, result):
+        """Учитывает результат модели; в топ попадают только завершенные ('completed')."""
+        self._offered += 1
+        status = result.get("status")
+        if status != "completed":
+            self.counts["error" if status == "error" else "skipped"] += 1
+            return
+        data = result["data"]
+        self.counts["completed"] += 1
+        if data.get("is_valid"):
+            self.counts["valid"] += 1
+        invalid = 0 if (data.get("is_valid") or not self.valid_first) else 1
+        entry = (-invalid, -self._value(data), -self._offered, model_id, result)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:3] > self._heap[0][:3]:
+            # Новая модель лучше худшей в топе (при равенстве остается более ранняя)
+            self._forget(heapq.heapreplace(self._heap, entry)[3])
+        else:
+            self.counts["discarded"] += 1
+            return
+        self._pending[model_id] = result
+
+    def _forget(self, model_id):
+        self.counts["discarded"] += 1
+        if self._pending.pop(model_id, None) is None and model_id in self._sent:
+            self._sent.discard(model_id)
+            self._evicted.append(model_id)
+
+    def flush(self):
+        """(новые результаты в топе, вытесненные ранее отправленные ID) с момента прошлого вызова."""
+        batch, evicted = self._pending, self._evicted
+        self._sent.update(batch)
+        self._pending, self._evicted = {}, []
+        return batch, evicted
+
+    # --- Контрольные точки (checkpoint.py) ---
+    def state(self):
+        return {"entries": [list(entry) for entry in self._heap], "offered": self._offered, "counts": dict(self.counts)}
+
+    def restore(self, state):
+        """Восстанавливает топ из контрольной точки; все его модели снова будут отправлены (новая задача в Node)."""
+        self._heap = [tuple(entry) for entry in state["entries"]]
+        heapq.heapify(self._heap)
+        self._offered = state["offered"]
+        self.counts = dict(state["counts"])
+        self._pending = {entry[3]: entry[4] for entry in self._heap}
+        self._sent = set()
+        self._evicted = []
+
+    def summary(self):
+        return {"k": self.k, "criterion": self.criterion, "valid_first": self.valid_first,
+                "retained": len(self._heap), "offered": self._offered, **self.counts}
+
+    def ranking(self):
+        """ID моделей в топе, от лучшей к худшей."""
+        return [entry[3] for entry in sorted(self._heap, reverse=True)]
+
+    def best(self):
+        """(model_id, результат) лучшей модели в топе или None, если топ пуст."""
+        if not self._heap:
+            return None
+        entry = max(self._heap)
+        return entry[3], entry[4]
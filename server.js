@@ -12,6 +12,10 @@ const multer = require('multer');         // For handling file uploads
 // CONFIGURATION READING
 // -----------------------------------------------------------------------------
 let pythonCommand = 'python3'; // Default value
+let usePythonWorker = true; // Serve runPythonScript calls from warm Python processes (python_scripts/python_worker.py)
+let pythonWorkerPoolSize = 2; // Warm workers; a call that finds all of them busy spawns its script directly
+let pythonWorkerTimeoutMs = 120000; // A script running longer in a warm worker (start-up of a new worker included)
+                                    // kills the worker; the call falls back to spawn
 const configPath = path.join(__dirname, 'server_config.json');
 
 try {
@@ -24,6 +28,15 @@ try {
         } else {
             console.warn(`Config file found, but 'pythonExecutablePath' is missing or invalid. Using default: ${pythonCommand}`);
         }
+        if (typeof config.usePythonWorker === 'boolean') {
+            usePythonWorker = config.usePythonWorker;
+        }
+        if (Number.isInteger(config.pythonWorkerPoolSize) && config.pythonWorkerPoolSize >= 0) {
+            pythonWorkerPoolSize = config.pythonWorkerPoolSize;
+        }
+        if (typeof config.pythonWorkerTimeoutMs === 'number' && config.pythonWorkerTimeoutMs > 0) {
+            pythonWorkerTimeoutMs = config.pythonWorkerTimeoutMs;
+        }
     } else {
         console.warn(`Config file not found at ${configPath}. Using default Python command: ${pythonCommand}`);
         // Optionally create a default config file if it doesn't exist
@@ -54,6 +67,10 @@ app.use(express.urlencoded({ limit: '50mb', extended: true }));
 // MULTER CONFIGURATION (for File Uploads)
 // -----------------------------------------------------------------------------
 const uploadDir = 'uploads/';
+// On-disk result stores of regression jobs (config.resultStore), one SQLite file per job: <jobId>.sqlite
+const resultStoreDir = path.join(__dirname, 'result_stores');
+// Cross-job cache of fitted models (config.modelCache = true), shared by all jobs of this server
+const modelCachePath = path.join(__dirname, 'model_cache', 'models.sqlite');
 // Ensure upload directory exists
 if (!fs.existsSync(uploadDir)){
     try {
@@ -81,7 +98,61 @@ const upload = multer({ storage: storage });
 // -----------------------------------------------------------------------------
 // HELPER FUNCTION FOR RUNNING PYTHON SCRIPTS (Uses configured pythonCommand)
 // -----------------------------------------------------------------------------
-function runPythonScript(scriptPath, args = [], inputData = null) {
+// Turns a finished script run (exit code, stdout, stderr) into the resolved JSON result or a rejection.
+// Shared by the spawned-process and the warm-worker paths, so both report errors the same way.
+function settleScriptResult(scriptPath, code, scriptOutput, errorOutput, resolve, reject) {
+    if (code !== 0) {
+        // --- Process Failed (Non-zero exit code) ---
+        console.error(`${path.basename(scriptPath)} exited with error code ${code}. Full Stderr: ${errorOutput}`);
+
+        // Check specifically for ModuleNotFoundError in the accumulated stderr
+         if (errorOutput.includes("ModuleNotFoundError")) {
+             const moduleMatch = errorOutput.match(/No module named '([^']+)'/);
+             const missingModule = moduleMatch ? moduleMatch[1] : 'unknown';
+             return reject(new Error(`Script failed (${path.basename(scriptPath)}): ModuleNotFoundError: No module named '${missingModule}'. Please ensure required packages are installed in the Python environment specified by '${pythonCommand}'.`));
+         }
+        // Try to parse a structured error from the *entire* stderr output
+        try {
+            // Attempt to parse the whole stderr in case the error JSON is there
+            const structuredError = JSON.parse(errorOutput);
+            if (structuredError.error) {
+                return reject(new Error(`Script error (${path.basename(scriptPath)}): ${structuredError.error}`));
+            }
+        } catch (e) { /* Ignore if stderr is not valid JSON */ }
+
+        // If no specific error found, return a generic error message
+        reject(new Error(`Script failed (${path.basename(scriptPath)}, code ${code}). Stderr: ${errorOutput.substring(0, 250)}... Check logs.`));
+
+    } else {
+         // --- Process Succeeded (Zero exit code) ---
+        try {
+            // Case 1: Script produced output to stdout (expected case)
+            if (scriptOutput) {
+                // Attempt to parse JSON from stdout
+                const result = JSON.parse(scriptOutput);
+                resolve(result);
+            }
+            // Case 2: Script produced NO output to stdout, but might have logged INFO/WARN to stderr
+            else if (errorOutput.includes("INFO_") || errorOutput.includes("WARN_")) {
+               console.warn(`${path.basename(scriptPath)} succeeded (code 0) but produced no JSON output to stdout (only logs in stderr).`);
+               // Resolve with a warning structure, indicating success but no primary data
+               resolve({ warning: `Script ${path.basename(scriptPath)} produced no primary output to stdout. Check logs in stderr for details.`, data: null });
+            }
+            // Case 3: Script produced NO output to stdout and NO indicative logs in stderr
+            else {
+                 console.warn(`Script ${path.basename(scriptPath)} produced no output to stdout.`);
+                 // Resolve with a warning or potentially empty data structure, depending on script's expected behavior
+                 resolve({ warning: `Script ${path.basename(scriptPath)} produced no output.`, data: null });
+            }
+        } catch (e) {
+            // Error parsing the JSON output from stdout
+            console.error(`Error parsing ${path.basename(scriptPath)} stdout JSON:`, e, `Raw stdout: ${scriptOutput}`);
+            reject(new Error(`Failed to parse script output (${path.basename(scriptPath)}). Raw: ${scriptOutput.substring(0, 250)}...`));
+        }
+    }
+}
+
+function spawnPythonScript(scriptPath, args = [], inputData = null) {
     return new Promise((resolve, reject) => {
         // Use the pythonCommand read from the config file (or default)
         console.log(`Running Python script: ${path.basename(scriptPath)} using command '${pythonCommand}' with args: [${args.join(', ')}]`);
@@ -104,56 +175,7 @@ function runPythonScript(scriptPath, args = [], inputData = null) {
         // Handle process exit
         pythonProcess.on('close', (code) => {
             console.log(`${path.basename(scriptPath)} finished with code ${code}`);
-
-            if (code !== 0) {
-                // --- Process Failed (Non-zero exit code) ---
-                console.error(`${path.basename(scriptPath)} exited with error code ${code}. Full Stderr: ${errorOutput}`);
-
-                // Check specifically for ModuleNotFoundError in the accumulated stderr
-                 if (errorOutput.includes("ModuleNotFoundError")) {
-                     const moduleMatch = errorOutput.match(/No module named '([^']+)'/);
-                     const missingModule = moduleMatch ? moduleMatch[1] : 'unknown';
-                     return reject(new Error(`Script failed (${path.basename(scriptPath)}): ModuleNotFoundError: No module named '${missingModule}'. Please ensure required packages are installed in the Python environment specified by '${pythonCommand}'.`));
-                 }
-                // Try to parse a structured error from the *entire* stderr output
-                try {
-                    // Attempt to parse the whole stderr in case the error JSON is there
-                    const structuredError = JSON.parse(errorOutput);
-                    if (structuredError.error) {
-                        return reject(new Error(`Script error (${path.basename(scriptPath)}): ${structuredError.error}`));
-                    }
-                } catch (e) { /* Ignore if stderr is not valid JSON */ }
-
-                // If no specific error found, return a generic error message
-                reject(new Error(`Script failed (${path.basename(scriptPath)}, code ${code}). Stderr: ${errorOutput.substring(0, 250)}... Check logs.`));
-
-            } else {
-                 // --- Process Succeeded (Zero exit code) ---
-                try {
-                    // Case 1: Script produced output to stdout (expected case)
-                    if (scriptOutput) {
-                        // Attempt to parse JSON from stdout
-                        const result = JSON.parse(scriptOutput);
-                        resolve(result);
-                    }
-                    // Case 2: Script produced NO output to stdout, but might have logged INFO/WARN to stderr
-                    else if (errorOutput.includes("INFO_") || errorOutput.includes("WARN_")) {
-                       console.warn(`${path.basename(scriptPath)} succeeded (code 0) but produced no JSON output to stdout (only logs in stderr).`);
-                       // Resolve with a warning structure, indicating success but no primary data
-                       resolve({ warning: `Script ${path.basename(scriptPath)} produced no primary output to stdout. Check logs in stderr for details.`, data: null });
-                    }
-                    // Case 3: Script produced NO output to stdout and NO indicative logs in stderr
-                    else {
-                         console.warn(`Script ${path.basename(scriptPath)} produced no output to stdout.`);
-                         // Resolve with a warning or potentially empty data structure, depending on script's expected behavior
-                         resolve({ warning: `Script ${path.basename(scriptPath)} produced no output.`, data: null });
-                    }
-                } catch (e) {
-                    // Error parsing the JSON output from stdout
-                    console.error(`Error parsing ${path.basename(scriptPath)} stdout JSON:`, e, `Raw stdout: ${scriptOutput}`);
-                    reject(new Error(`Failed to parse script output (${path.basename(scriptPath)}). Raw: ${scriptOutput.substring(0, 250)}...`));
-                }
-            }
+            settleScriptResult(scriptPath, code, scriptOutput, errorOutput, resolve, reject);
         });
 
         // Handle errors during the spawn process itself (e.g., command not found)
@@ -183,6 +205,99 @@ function runPythonScript(scriptPath, args = [], inputData = null) {
     });
 }
 
+// --- Warm Python workers: long-lived processes run the scripts without re-importing pandas/statsmodels ---
+// Each worker runs one script at a time. Calls that find every worker busy spawn the script in its own process,
+// so a slow decomposition never queues sheet listings or transforms behind it.
+const pythonWorkerPath = path.join(__dirname, 'python_scripts', 'python_worker.py');
+const pythonWorkers = []; // [{ process, stdoutBuffer, request: { id, resolve, reject, timer } | null, fail }]
+let nextWorkerRequestId = 1;
+
+function startPythonWorker() {
+    const workerProcess = spawn(pythonCommand, [pythonWorkerPath]);
+    const worker = { process: workerProcess, stdoutBuffer: '', request: null };
+    // Worker gone: it leaves the pool, its current call is rejected and falls back to spawning the script directly
+    worker.fail = (error) => {
+        const index = pythonWorkers.indexOf(worker);
+        if (index >= 0) pythonWorkers.splice(index, 1);
+        const request = worker.request;
+        worker.request = null;
+        if (request) {
+            clearTimeout(request.timer);
+            request.reject(error);
+        }
+    };
+    workerProcess.stdout.on('data', (data) => {
+        worker.stdoutBuffer += data.toString(); // Responses are ASCII-only JSON lines
+        let newlineIndex;
+        while ((newlineIndex = worker.stdoutBuffer.indexOf('\n')) >= 0) {
+            const line = worker.stdoutBuffer.substring(0, newlineIndex);
+            worker.stdoutBuffer = worker.stdoutBuffer.substring(newlineIndex + 1);
+            if (!line.trim()) continue;
+            try {
+                const response = JSON.parse(line);
+                const request = worker.request;
+                if (request && request.id === response.id) {
+                    clearTimeout(request.timer);
+                    worker.request = null; // Idle again
+                    request.resolve(response);
+                }
+            } catch (e) {
+                console.error('Error parsing Python worker response:', e, `Line: ${line.substring(0, 200)}...`);
+            }
+        }
+    });
+    workerProcess.stderr.on('data', (data) => console.error(`python_worker stderr: ${data.toString().trim()}`));
+    workerProcess.stdin.on('error', (err) => worker.fail(new Error(`Python worker stdin error: ${err.message}`)));
+    workerProcess.on('error', (err) => worker.fail(new Error(`Python worker failed to start: ${err.message}`)));
+    workerProcess.on('close', (code) => {
+        console.warn(`Python worker (PID: ${workerProcess.pid}) exited with code ${code}`);
+        worker.fail(new Error(`Python worker exited (code ${code})`));
+    });
+    pythonWorkers.push(worker);
+    console.log(`Started warm Python worker (PID: ${workerProcess.pid}) using command '${pythonCommand}'`);
+    return worker;
+}
+
+// An idle warm worker, a new one while the pool is below pythonWorkerPoolSize, or null (all busy)
+function acquirePythonWorker() {
+    const idle = pythonWorkers.find(worker => !worker.request);
+    if (idle) return idle;
+    return pythonWorkers.length < pythonWorkerPoolSize ? startPythonWorker() : null;
+}
+
+// Resolves with the worker's { code, stdout, stderr } for the script; rejects if the worker fails or times out
+function runInPythonWorker(worker, scriptPath, args, inputData) {
+    return new Promise((resolve, reject) => {
+        const id = nextWorkerRequestId++;
+        const timer = setTimeout(() => {
+            // A hung script would hold the worker forever: kill it and start a fresh one in its place
+            console.error(`${path.basename(scriptPath)} did not finish within ${pythonWorkerTimeoutMs} ms in warm worker ` +
+                          `(PID: ${worker.process.pid}); restarting the worker.`);
+            worker.fail(new Error(`${path.basename(scriptPath)} timed out in the warm Python worker`));
+            worker.process.kill('SIGKILL');
+            if (pythonWorkers.length < pythonWorkerPoolSize) startPythonWorker();
+        }, pythonWorkerTimeoutMs);
+        worker.request = { id, resolve, reject, timer }; // Busy until the response, failure or timeout
+        const input = inputData !== null ? JSON.stringify(inputData) : null;
+        console.log(`Running Python script: ${path.basename(scriptPath)} in warm worker (PID: ${worker.process.pid}) with args: [${args.join(', ')}]`);
+        worker.process.stdin.write(JSON.stringify({ id, script: scriptPath, args, input }) + '\n');
+    });
+}
+
+function runPythonScript(scriptPath, args = [], inputData = null) {
+    const worker = usePythonWorker ? acquirePythonWorker() : null;
+    if (!worker) return spawnPythonScript(scriptPath, args, inputData); // Workers off or all busy: run concurrently
+    return runInPythonWorker(worker, scriptPath, args, inputData).then(
+        ({ code, stdout, stderr }) => new Promise((resolve, reject) => {
+            console.log(`${path.basename(scriptPath)} finished with code ${code} (warm worker)`);
+            if (stderr) console.error(`${path.basename(scriptPath)} stderr: ${stderr.trim()}`);
+            settleScriptResult(scriptPath, code, stdout, stderr, resolve, reject);
+        }),
+        (workerError) => {
+            console.warn(`${workerError.message}. Spawning ${path.basename(scriptPath)} directly.`);
+            return spawnPythonScript(scriptPath, args, inputData);
+        });
+}
 
 // --- In-memory storage for active regression jobs ---
 const activeJobs = {};
@@ -191,10 +306,13 @@ const activeJobs = {};
         status: 'starting' | 'running' | 'paused' | 'stopped' | 'finished' | 'error',
         config: {}, // Original config from the request
         dependentVariable: {}, // Original Y data (for reference)
+        dependentVariables: [] | null, // Several Y searched in one pass (request.dependentVariables), else null
         regressors: {}, // Original X data (for reference) - { name: [[ts, val],...], ... }
         results: { model_id: { status: 'completed'|'error'|'skipped', data?: {}, error?: string, reason?: string } }, // Accumulated results from Python
+                 // With dependentVariables: { targetName: { model_id: {...} } }; topK is keyed by target name the same way
         progress: 0, // Number of models processed by Python script
         totalModels: null, // Estimated total models (can be null initially)
+        resultStore: string | null, // SQLite result store path (config.resultStore); results are then queried, not kept in memory
         startTime: number, // Timestamp of job start
         pythonProcess: ChildProcess | null, // Reference to the running Python process object
         stdoutBuffer: string, // Buffer for accumulating stdout data from Python
@@ -203,6 +321,82 @@ const activeJobs = {};
 */
 // ---
 
+// --- Decoder for columnar result frames (PROGRESS_FRAME:<base64>, config.resultFormat = 'columnar') ---
+// Frame layout is documented in python_scripts/result_frames.py. Returns an object of the same shape
+// as a parsed PROGRESS_UPDATE, so both go through the same merge code.
+const FRAME_STAT_KEYS = ['rsquared', 'rsquared_adj', 'aic', 'bic'];
+const FRAME_ID_SUFFIXES = ['', '_c', '_nc'];
+const FRAME_TEST_VALUES = [false, true, null]; // Code 3 = key absent
+
+function decodeResultFrame(encoded) {
+    // Copy into a fresh ArrayBuffer: typed-array views need aligned offsets (Buffer may be pooled)
+    const buffer = new Uint8Array(Buffer.from(encoded, 'base64')).buffer;
+    const headerLength = new DataView(buffer).getUint32(0, true);
+    const header = JSON.parse(Buffer.from(buffer, 4, headerLength).toString('utf8'));
+    const { n, features, metrics: metricKeys, tests: testKeys, other, ...update } = header;
+    const k = features.length, M = metricKeys.length, T = testKeys.length;
+    const words = Math.max(1, Math.ceil(k / 32));
+    let offset = 4 + headerLength;
+    offset += (8 - (offset % 8)) % 8;
+    const take = (ArrayType, length) => {
+        const array = new ArrayType(buffer, offset, length);
+        offset += array.byteLength;
+        return array;
+    };
+    const modelNumber = take(Float64Array, n);
+    const stats = take(Float64Array, n * FRAME_STAT_KEYS.length);
+    const metrics = take(Float64Array, n * M);
+    const coefficients = take(Float64Array, n * (1 + k));
+    const pValues = take(Float64Array, n * (1 + k));
+    const vifValues = take(Float64Array, n * k);
+    const bpPvalue = take(Float64Array, n);
+    const nObs = take(Int32Array, n);
+    const regressorMask = take(Uint32Array, n * words);
+    const flags = take(Uint8Array, n);
+    const metricMask = take(Uint8Array, n);
+    const tests = take(Uint8Array, n * T);
+    const lags = take(Uint8Array, n * k);
+
+    const finite = (value) => (Number.isFinite(value) ? value : null); // NaN/inf -> null, as in the JSON path
+    const batch = {};
+    for (let i = 0; i < n; i++) {
+        const coefs = {}, pvals = {}, vifs = {};
+        if (flags[i] & 4) {
+            coefs.const = finite(coefficients[i * (1 + k)]);
+            pvals.const = finite(pValues[i * (1 + k)]);
+        }
+        for (let j = 0; j < k; j++) {
+            if ((regressorMask[i * words + (j >> 5)] >>> (j & 31)) & 1) {
+                const name = `${features[j]}_L${lags[i * k + j]}`;
+                coefs[name] = finite(coefficients[i * (1 + k) + 1 + j]);
+                pvals[name] = finite(pValues[i * (1 + k) + 1 + j]);
+                vifs[name] = finite(vifValues[i * k + j]);
+            }
+        }
+        const data = { coefficients: coefs, p_values: pvals, n_obs: nObs[i] };
+        FRAME_STAT_KEYS.forEach((key, s) => { data[key] = finite(stats[i * FRAME_STAT_KEYS.length + s]); });
+        data.metrics = {};
+        metricKeys.forEach((key, m) => {
+            if ((metricMask[i] >> m) & 1) data.metrics[key] = finite(metrics[i * M + m]);
+        });
+        data.test_results = {};
+        const skippedTests = [];
+        testKeys.forEach((key, t) => {
+            const code = tests[i * T + t];
+            if (code !== 3) data.test_results[key] = FRAME_TEST_VALUES[code];
+            if (code === 2) skippedTests.push(key);
+            // Test details follow their flag, as in run_single_ols
+            if (key === 'vif_ok' && (flags[i] & 16)) data.test_results.vif_values = vifs;
+            if (key === 'heteroskedasticity_ok' && (flags[i] & 32)) data.test_results.bp_pvalue = finite(bpPvalue[i]);
+        });
+        if (skippedTests.length) data.test_results.skipped_tests = skippedTests;
+        data.is_valid = Boolean(flags[i] & 8);
+        batch[`m_${modelNumber[i]}${FRAME_ID_SUFFIXES[flags[i] & 3]}`] = { status: 'completed', data };
+    }
+    Object.assign(batch, other); // Skipped/error results travel as JSON in the header
+    return { ...update, processed_batch: batch };
+}
+
 // --- Helper function for delays (used in older versions, might be useful later) ---
 // function sleep(ms) {
 //   return new Promise(resolve => setTimeout(resolve, ms));
@@ -458,10 +652,19 @@ app.post('/api/transform_series', async (req, res) => {
 // --- Endpoint to START the regression model search (using the master Python script) ---
 app.post('/api/start_regression_search', async (req, res) => {
     console.log("\nPOST /api/start_regression_search received (Master Script Version)");
-    const { dependentVariable, regressors, config } = req.body;
+    const { dependentVariable, dependentVariables, regressors, config, resume } = req.body; // resume: true or checkpoint dir (config.checkpointDir)
 
     // --- Input Validation ---
-    if (!dependentVariable || !dependentVariable.name || !dependentVariable.data || !Array.isArray(dependentVariable.data)) {
+    // dependentVariables: several Y searched against the same regressors in one pass (results tagged by target)
+    const isValidSeries = (y) => y && y.name && Array.isArray(y.data);
+    if (dependentVariables !== undefined) {
+        if (!Array.isArray(dependentVariables) || dependentVariables.length === 0 || !dependentVariables.every(isValidSeries)) {
+            return res.status(400).json({ error: 'Invalid dependentVariables: expected a non-empty array of { name, data }.' });
+        }
+        if (new Set(dependentVariables.map(y => y.name)).size !== dependentVariables.length) {
+            return res.status(400).json({ error: 'Dependent variable names must be unique.' });
+        }
+    } else if (!isValidSeries(dependentVariable)) {
         return res.status(400).json({ error: 'Invalid or missing dependentVariable data.' });
     }
     if (!regressors || typeof regressors !== 'object') {
@@ -479,7 +682,7 @@ app.post('/api/start_regression_search', async (req, res) => {
 
     const includedRegressorNames = Object.keys(regressors);
     console.log("Received Configuration:");
-    console.log(`  Dependent Variable: ${dependentVariable.name}`);
+    console.log(`  Dependent Variable: ${dependentVariables ? dependentVariables.map(y => y.name).join(', ') : dependentVariable.name}`);
     console.log(`  Regressors: ${includedRegressorNames.join(', ') || 'None'}`);
     console.log(`  Config:`, JSON.stringify(config));
 
@@ -488,11 +691,23 @@ app.post('/api/start_regression_search', async (req, res) => {
     activeJobs[generatedJobId] = {
         status: 'starting', // Initial status before process spawn
         config: config,
-        dependentVariable: dependentVariable, // Store for reference
+        dependentVariable: dependentVariables ? dependentVariables[0] : dependentVariable, // Store for reference
+        dependentVariables: dependentVariables || null, // All targets of a multi-Y search
         regressors: regressors, // Store for reference
         results: {}, // Accumulate results here { model_id: { status, data/error } }
         progress: 0, // Counter for processed models
         totalModels: null, // Will be updated if Python reports it
+        search: null,      // Summary of a non-exhaustive search mode (e.g. leaps_and_bounds), from FINAL_RESULT
+        topK: null,        // Top-K mode counters (config.topK): retained/discarded/valid..., ranking at the end
+        telemetry: null,   // Throughput/ETA of the running search, from progress updates
+        summary: null,     // Latest SUMMARY record (config.summary)
+        screening: null,   // SCREENING record: columns kept by the elastic-net pre-screening (config.screening)
+        truncated: false,  // Search stopped by config.timeBudgetSeconds / maxModels / stopAfterValid, from FINAL_RESULT
+        coverage: null,    // Fraction of the model space calculated, from FINAL_RESULT
+        limits: null,      // Search limits and the stop reason, from FINAL_RESULT
+        // config.resultStore: the master writes results to this SQLite file and streams only counters;
+        // pages of results come from POST /api/search_results/:jobId
+        resultStore: config.resultStore ? path.join(resultStoreDir, `${generatedJobId}.sqlite`) : null,
         startTime: Date.now(),
         pythonProcess: null, // Reference to the spawned process
         stdoutBuffer: '',    // Buffer for stdout data
@@ -527,22 +742,69 @@ app.post('/api/start_regression_search', async (req, res) => {
 
             if (!line) continue; // Skip empty lines
 
-            // Check for PROGRESS_UPDATE marker
-            if (line.startsWith('PROGRESS_UPDATE:')) {
+            // Check for PROGRESS_UPDATE (JSON) or PROGRESS_FRAME (columnar, config.resultFormat = 'columnar') marker
+            if (line.startsWith('PROGRESS_UPDATE:') || line.startsWith('PROGRESS_FRAME:')) {
                 try {
-                    const jsonString = line.substring('PROGRESS_UPDATE:'.length);
-                    const update = JSON.parse(jsonString);
+                    const update = line.startsWith('PROGRESS_FRAME:')
+                        ? decodeResultFrame(line.substring('PROGRESS_FRAME:'.length))
+                        : JSON.parse(line.substring('PROGRESS_UPDATE:'.length));
                     if (update.type === 'progress' && update.processed_batch) {
-                        // Merge the batch results into the job's results object
-                        Object.assign(job.results, update.processed_batch);
+                        // Merge the batch results into the job's results object (per target for a multi-Y search)
+                        const results = update.target != null
+                            ? (job.results[update.target] = job.results[update.target] || {})
+                            : job.results;
+                        Object.assign(results, update.processed_batch);
+                        // Top-K mode: drop models that fell out of the retained top, keep the counters
+                        if (Array.isArray(update.evicted)) {
+                            for (const modelId of update.evicted) delete results[modelId];
+                        }
+                        if (update.top_k) {
+                            if (update.target != null) job.topK = { ...job.topK, [update.target]: update.top_k };
+                            else job.topK = update.top_k;
+                        }
+                        // Rolling throughput, remaining count, ETA and status fractions (per target for a multi-Y search)
+                        if (update.telemetry) {
+                            if (update.target != null) job.telemetry = { ...job.telemetry, [update.target]: update.telemetry };
+                            else job.telemetry = update.telemetry;
+                        }
                         // Update the progress counter
                         job.progress = update.total_calculated || job.progress;
+                        if (update.total_models != null) job.totalModels = update.total_models; // Exact size of this run
                         // console.log(`[${generatedJobId}] Progress update. Total: ${job.progress}. Batch: ${Object.keys(update.processed_batch).length}`); // Debug log
                     } else {
                          console.warn(`[${generatedJobId}] Received PROGRESS_UPDATE with unexpected structure:`, update);
                     }
                 } catch (e) {
-                    console.error(`[${generatedJobId}] Error parsing progress update JSON:`, e, `Line: ${line.substring(0, 200)}...`);
+                    console.error(`[${generatedJobId}] Error parsing progress update:`, e, `Line: ${line.substring(0, 200)}...`);
+                }
+            }
+            // config.summary: running model-space aggregates (counts, histograms, inclusion, best per size),
+            // the latest record is kept so summary views cost O(1) per poll (per target for a multi-Y search)
+            else if (line.startsWith('SUMMARY:')) {
+                try {
+                    const summary = JSON.parse(line.substring('SUMMARY:'.length));
+                    if (summary.target != null) job.summary = { ...job.summary, [summary.target]: summary };
+                    else job.summary = summary;
+                } catch (e) {
+                    console.error(`[${generatedJobId}] Error parsing summary record:`, e, `Line: ${line.substring(0, 200)}...`);
+                }
+            }
+            // config.screening: emitted once before any results; the search space is restricted to its columns
+            else if (line.startsWith('SCREENING:')) {
+                try {
+                    job.screening = JSON.parse(line.substring('SCREENING:'.length));
+                    console.log(`[${generatedJobId}] Screening kept columns ${job.screening.selected.map(c => c.column).join(', ')}: ` +
+                                `${job.screening.models_before} -> ${job.screening.models_after} models`);
+                } catch (e) {
+                    console.error(`[${generatedJobId}] Error parsing screening record:`, e, `Line: ${line.substring(0, 200)}...`);
+                }
+            }
+            // config.profile: per-stage timings and memory of the master, the latest record is kept
+            else if (line.startsWith('PROFILE:')) {
+                try {
+                    job.profile = JSON.parse(line.substring('PROFILE:'.length));
+                } catch (e) {
+                    console.error(`[${generatedJobId}] Error parsing profile record:`, e, `Line: ${line.substring(0, 200)}...`);
                 }
             }
             // Check for FINAL_RESULT marker
@@ -553,6 +815,16 @@ app.post('/api/start_regression_search', async (req, res) => {
                     // Set final job status ('finished' or 'error')
                     job.status = finalData.status || 'finished';
                     job.progress = finalData.total_models_calculated || job.progress; // Update final count
+                    if (finalData.total_models != null) job.totalModels = finalData.total_models;
+                    if (finalData.search) job.search = finalData.search; // best_per_size etc. for searchMode runs
+                    if (finalData.top_k) job.topK = finalData.top_k; // Final counters and ranking of the retained models
+                    if (finalData.model_cache) job.modelCache = finalData.model_cache; // Cache hits/misses/stored/evicted
+                    if (finalData.telemetry) job.telemetry = finalData.telemetry; // Elapsed time, average rate, status fractions
+                    if (finalData.coverage != null) { // A limited search finishes early with truncated: true
+                        job.truncated = !!finalData.truncated;
+                        job.coverage = finalData.coverage;
+                    }
+                    if (finalData.limits) job.limits = finalData.limits;
                     if(finalData.error) {
                         job.error = finalData.error; // Store error message
                         console.error(`[${generatedJobId}] Master script finished with error: ${finalData.error}`);
@@ -640,7 +912,13 @@ app.post('/api/start_regression_search', async (req, res) => {
 
     // --- Send Payload to Python Script via stdin ---
     try {
-        const payloadString = JSON.stringify({ dependentVariable, regressors, config });
+        // Results come back as PROGRESS_UPDATE JSON (the master's default); clients opt in to binary frames
+        // with config.resultFormat = 'columnar'
+        const masterConfig = { ...config };
+        if (activeJobs[generatedJobId].resultStore) masterConfig.resultStore = activeJobs[generatedJobId].resultStore;
+        if (config.modelCache) masterConfig.modelCache = modelCachePath; // Clients switch the cache on, the server owns its location
+        const yPayload = dependentVariables ? { dependentVariables } : { dependentVariable };
+        const payloadString = JSON.stringify({ ...yPayload, regressors, config: masterConfig, ...(resume ? { resume } : {}) });
         pythonProcess.stdin.write(payloadString);
         pythonProcess.stdin.end(); // Close stdin to signal end of input
         console.log(`[${generatedJobId}] Payload sent to master script stdin.`);
@@ -768,6 +1046,18 @@ app.get('/api/search_progress/:jobId', (req, res) => {
         status: job.status,
         progress: job.progress,
         totalModels: job.totalModels, // May be null initially
+        search: job.search,           // Search-mode summary (null for exhaustive search)
+        topK: job.topK,               // Top-K counters (null unless config.topK)
+        resultStore: Boolean(job.resultStore), // true: results stay empty here, page them via /api/search_results
+        modelCache: job.modelCache || null,   // Model cache counters of a finished job (config.modelCache)
+        profile: job.profile || null,         // Latest PROFILE record: stage timings and memory (config.profile)
+        telemetry: job.telemetry,     // models_per_second, remaining, eta_seconds, finish_at, status fractions
+        summary: job.summary,         // Model-space aggregates computed by the master (config.summary)
+        screening: job.screening,     // Pre-screening report: selected columns, lambda path, timings (config.screening)
+        truncated: job.truncated,     // Finished early on a search limit (timeBudgetSeconds, maxModels, stopAfterValid)
+        coverage: job.coverage,       // Fraction of the model space calculated (set when the job finishes)
+        limits: job.limits,           // Search limits and stop_reason
+        targets: job.dependentVariables ? job.dependentVariables.map(y => y.name) : null, // Multi-Y search: results/topK keys
         results: job.results,         // Accumulated model results
         config: job.config,           // Original job configuration
         startTime: job.startTime,
@@ -776,12 +1066,57 @@ app.get('/api/search_progress/:jobId', (req, res) => {
 });
 // ---
 
+// --- Endpoint to Query Stored Results (jobs started with config.resultStore) ---
+// Body: { filters?: { status, isValid, includeConstant, regressors, includes, excludes, lags,
+//                     minRegressors, maxRegressors, ranges: { column: { min, max } } },
+//         sortBy?: 'aic' | 'bic' | 'rsquared' | ..., descending?: bool, limit?: number, offset?: number,
+//         target?: name or index of the dependent variable (multi-Y search) }
+// Returns { total, offset, limit, sortBy, descending, results: { model_id: result }, job: {...} }.
+// The store is a file, so it can be queried after a server restart as long as the job ID is known
+// (for a multi-Y search the target is then given by index).
+app.post('/api/search_results/:jobId', async (req, res) => {
+    const jobId = req.params.jobId;
+    const job = activeJobs[jobId];
+    let storePath = job ? job.resultStore : null;
+    if (!job && /^job_\d+_[a-z0-9]+$/.test(jobId)) {
+        storePath = path.join(resultStoreDir, `${jobId}.sqlite`); // Job from before a restart
+    }
+    const target = (req.body || {}).target;
+    if (storePath && (job ? job.dependentVariables : target != null)) {
+        // One store per dependent variable: <job>.t<index>.sqlite (result_store.target_store_path)
+        const index = job && job.dependentVariables && typeof target === 'string'
+            ? job.dependentVariables.findIndex(y => y.name === target)
+            : Number(target == null ? 0 : target);
+        if (!Number.isInteger(index) || index < 0) {
+            return res.status(400).json({ error: `Unknown target '${target}' for job ${jobId}.` });
+        }
+        storePath = storePath.replace(/\.sqlite$/, `.t${index}.sqlite`);
+    }
+    if (!storePath || !fs.existsSync(storePath)) {
+        return res.status(404).json({ error: `No result store for job ${jobId}. Start the search with config.resultStore = true.` });
+    }
+
+    const { filters, sortBy, descending, limit, offset } = req.body || {};
+    const scriptPath = path.join(__dirname, 'python_scripts', 'result_store.py');
+    try {
+        const result = await runPythonScript(scriptPath, [], { store: storePath, filters, sortBy, descending, limit, offset });
+        if (result && result.error) {
+            return res.status(400).json({ error: result.error });
+        }
+        res.json(result);
+    } catch (error) {
+        console.error(`[Results] Error querying result store of job ${jobId}:`, error.message);
+        res.status(500).json({ error: error.message || `Failed to query results of job ${jobId}.` });
+    }
+});
+// ---
+
 // +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 // +++ NEW ENDPOINT: Get Model Decomposition Data +++
 // +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 app.post('/api/get_model_decomposition/:jobId/:modelId', async (req, res) => {
     const { jobId, modelId } = req.params;
-    const { modelSpecification } = req.body; // Expecting { regressors_with_lags: {...}, include_constant: true/false }
+    const { modelSpecification, target } = req.body; // Expecting { regressors_with_lags: {...}, include_constant: true/false }, target for a multi-Y job
 
     console.log(`\nPOST /api/get_model_decomposition/${jobId}/${modelId} received.`);
 
@@ -809,13 +1144,32 @@ app.post('/api/get_model_decomposition/:jobId/:modelId', async (req, res) => {
          modelSpecification.include_constant = true; // Default if not provided
     }
 
+    // Multi-Y job: the model belongs to one of the targets (by name, the first one by default)
+    const dependentVariable = job.dependentVariables && target != null
+        ? job.dependentVariables.find(y => y.name === target)
+        : job.dependentVariable;
+    if (!dependentVariable) {
+        return res.status(400).json({ error: `Unknown target '${target}' for job ${jobId}.` });
+    }
+
     // --- Prepare Payload for Python Script ---
     const payload = {
         model_id: modelId, // Pass model ID for logging in Python
-        dependentVariable: job.dependentVariable, // Get Y data from the stored job
+        dependentVariable: dependentVariable, // Get Y data from the stored job
         regressors: job.regressors, // Get ALL original X data from the stored job
         modelSpecification: modelSpecification // Get the specific model details from the request body
     };
+    // searchMode 'leaps_and_bounds' always fits its models on the common sample as well
+    if (job.config && (job.config.commonSample || job.config.searchMode === 'leaps_and_bounds')) {
+        // Models of a commonSample job were fitted on one sample for the whole search; refit on the same rows.
+        // With config.screening that sample is built from the screened columns only: {feature: lags}
+        if (job.screening) {
+            payload.commonSampleLags = job.screening.lags;
+            payload.commonSampleMaxLag = job.screening.max_lag;
+        } else {
+            payload.commonSampleMaxLag = job.config.maxLagDepth || 0;
+        }
+    }
 
     // --- Run Python Script ---
     const scriptPath = path.join(__dirname, 'python_scripts', 'step4_calculate_decomposition.py');